@@ -0,0 +1,194 @@
+"""Server calls made by the Semeru booking flow, replayed against recorded responses.
+
+A local mock answers each request with the response recorded for it in
+``RECORDED`` (site pages plus the JSON shapes ``/website/booking/action``
+returns), keeping just enough state to pick the right one: the current
+``secret`` and the members registered under it. Scenarios:
+
+    fresh      new secret, no members yet (the common path)
+    retry      second attempt on the same secret after do_booking failed,
+               so the members of the first attempt are still there
+    leftover   members from an attempt this process never saw (another
+               process / the browser) already sit under the secret
+    stranger   like leftover, but with other identity numbers: nothing in
+               the responses gives them away, only the grid shows them
+
+For each scenario ``do_booking_flow_semeru`` runs once and the calls the mock
+received are counted per action; ``booked_members`` is how many members sat
+under the secret when ``do_booking`` went through (should equal ``--members``). ``--compare REV`` runs the flow of
+``bot-semeru.py`` at git revision REV next to it (e.g. the last revision
+before ``SemeruBookingMachine``).
+
+    python bench/bench_booking_calls.py --members 3 --compare <rev>
+"""
+import argparse
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+_PAGE = "<html><body>" + "<p>halaman</p>" * 200 + "</body></html>"
+RECORDED = {
+    "GET /": _PAGE,
+    "GET /peraturan/semeru": _PAGE,
+    "GET /booking/site/semeru": "<html><body><div class='cnt-page'>{tokens}</div>" + "<p>form</p>" * 200 + "</body></html>",
+    "update_hash": {"status": True, "message": "Hash diperbarui"},
+    "validate_booking": {"status": True, "message": "Valid"},
+    "member_update": {"status": True, "message": "Data anggota berhasil disimpan"},
+    "member_update ganda": {"status": False, "message": "Nomor identitas ganda"},
+    "member_update penuh": {"status": False, "message": "Maksimal 9 anggota"},
+    "member_delete": {"status": True, "message": "Data berhasil dihapus"},
+    "do_booking": {"status": True, "message": "Booking berhasil, silakan lakukan pembayaran",
+                   "booking_link": "https://bromotenggersemeru.id/booking/detail?code=SMR-2509300001"},
+    "do_booking gagal": {"status": False, "message": "Sistem sibuk, silakan coba lagi"},
+    "do_booking ganda": {"status": False, "message": "Nomor identitas ganda"},
+    "do_booking kurang": {"status": False, "message": "Minimal 2 anggota"},
+    "kapasitas": "<table class='table'><tbody>" + "".join(
+        f"<tr><td>Selasa, {d} September 2025</td><td>25 Kuota</td></tr>" for d in range(1, 31)) + "</tbody></table>",
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    rtt_s = 0.0
+    log: list = []
+    state: dict = {}
+
+    def _send(self, body, ctype: str = "application/json"):
+        if isinstance(body, dict):
+            body = json.dumps(body)
+        body = body.encode()
+        time.sleep(self.rtt_s)
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        type(self).log.append(f"GET {path}")
+        body = RECORDED.get(f"GET {path}", _PAGE)
+        if "{tokens}" in body:
+            tokens = json.dumps({"booking": {"secret": self.state["secret"], "form_hash": "fh01"}})
+            body = body.replace("{tokens}", tokens)
+        self._send(body, "text/html")
+
+    def do_POST(self):
+        n = int(self.headers.get("Content-Length") or 0)
+        form = {k: v[0] for k, v in parse_qs(self.rfile.read(n).decode()).items()}
+        path = urlsplit(self.path).path
+        st = self.state
+        members = st["members"].setdefault(st["secret"], {})
+        if path.endswith("/get_view"):
+            type(self).log.append("POST kapasitas")
+            return self._send(RECORDED["kapasitas"], "text/html")
+        if path.endswith("/grid"):
+            type(self).log.append("POST grid")
+            rows = [{"id": k, "identity_no": k, "nama": v, "secret": st["secret"], "date_depart": st["iso"]}
+                    for k, v in members.items()]
+            return self._send({"data": rows})
+        action = form.get("action", "")
+        type(self).log.append(f"POST {action}")
+        if action == "member_update":
+            if form["identity_no"] in members:
+                return self._send(RECORDED["member_update ganda"])
+            if len(members) >= 9:
+                return self._send(RECORDED["member_update penuh"])
+            members[form["identity_no"]] = form["nama"]
+        elif action == "member_delete":
+            members.pop(form["id"], None)
+        elif action == "do_booking":
+            if st.pop("fail_booking", False):
+                return self._send(RECORDED["do_booking gagal"])
+            if not members:
+                return self._send(RECORDED["do_booking kurang"])
+            st["booked"] = len(members)
+        self._send(RECORDED.get(action, {"status": True, "message": "-"}))
+
+    def log_message(self, *args):
+        pass
+
+
+def load_bot(base: str, source: str | None = None):
+    """``bot-semeru.py`` (or ``source`` text of another revision) pointed at the mock."""
+    os.chdir(tempfile.mkdtemp(prefix="bench-calls-"))
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    path = os.path.join(ROOT, "bot-semeru.py")
+    if source is not None:
+        path = os.path.join(os.getcwd(), "bot_semeru_rev.py")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(source)
+    spec = importlib.util.spec_from_file_location(f"bot_semeru_{len(sys.modules)}", path)
+    bot = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(bot)
+    bot.BASE = base
+    bot.CAP_URL = f"{base}/website/home/get_view"
+    bot.ACTION_URL = f"{base}/website/booking/action"
+    return bot
+
+
+def run_scenario(bot, scenario: str, members: int, tag: str) -> dict:
+    iso = "2025-09-30"
+    leader = {"name": "Ketua", "hp": "0812"}
+    people = [{"nama": f"Anggota {i}", "identity_no": f"35{i:014d}"} for i in range(1, members + 1)]
+    _Handler.state = {"secret": f"{tag}-{scenario}", "iso": iso, "members": {}}
+    if scenario == "retry":
+        _Handler.state["fail_booking"] = True
+        bot.do_booking_flow_semeru("", iso, leader, people)  # percobaan pertama: anggota masuk, do_booking gagal
+    elif scenario == "leftover":
+        _Handler.state["members"][_Handler.state["secret"]] = {p["identity_no"]: p["nama"] for p in people}
+    elif scenario == "stranger":
+        _Handler.state["members"][_Handler.state["secret"]] = {f"99{i:014d}": f"Lain {i}" for i in range(1, 3)}
+    mark = len(_Handler.log)
+    t0 = time.perf_counter()
+    ok, _, _, _ = bot.do_booking_flow_semeru("", iso, leader, people)
+    calls = _Handler.log[mark:]
+    return {"ok": ok, "calls": len(calls), "ms": round((time.perf_counter() - t0) * 1000, 1),
+            "booked_members": _Handler.state.get("booked"), "by_action": dict(Counter(calls))}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--members", type=int, default=3)
+    ap.add_argument("--rtt-ms", type=float, default=0)
+    ap.add_argument("--compare", metavar="REV", help="git revision whose bot-semeru.py flow runs alongside")
+    args = ap.parse_args()
+
+    _Handler.rtt_s = args.rtt_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    flows = {"current": load_bot(base)}
+    if args.compare:
+        source = subprocess.run(["git", "-C", ROOT, "show", f"{args.compare}:bot-semeru.py"],
+                                check=True, capture_output=True, text=True).stdout
+        flows[args.compare] = load_bot(base, source)
+    res = {"members": args.members, "scenarios": {}}
+    try:
+        for scenario in ("fresh", "retry", "leftover", "stranger"):
+            res["scenarios"][scenario] = {name: run_scenario(bot, scenario, args.members, name)
+                                          for name, bot in flows.items()}
+    finally:
+        server.shutdown()
+        for bot in flows.values():
+            bot.HTTP.close()
+            bot.storage.close()
+    print(json.dumps(res, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Simulated request count and detection latency of the capacity poller cadence.
+
+Replays one day of polling for a single (site, month) poller in simulated
+time, with quota opening at a random moment shortly after the release time
+(16:00 WIB by default), and compares:
+
+    fixed      the old ``run_repeating`` every 60 s
+    adaptive   ``cadence.Cadence`` as configured in ``bot-semeru.py``
+
+reporting requests per day and how long after the quota opened the poller
+noticed it. ``--slow-from/--slow-to`` make the simulated site answer slowly
+with 503s inside that window to show the backoff.
+
+    python bench/bench_cadence.py --runs 200
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from cadence import Cadence, nearest_release, parse_release_times  # noqa: E402
+
+DAY = datetime(2025, 9, 1)
+
+
+def simulate(next_delay, opens_at: datetime, slow: tuple[datetime, datetime] | None) -> dict:
+    t = DAY
+    requests = errors = 0
+    detected = None
+    while t < DAY + timedelta(days=1):
+        requests += 1
+        failing = slow is not None and slow[0] <= t < slow[1]
+        errors += failing
+        if detected is None and not failing and t >= opens_at:
+            detected = (t - opens_at).total_seconds()
+        t += timedelta(seconds=next_delay(t, failing))
+    return {"requests": requests, "errors": errors, "detect_s": detected}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--release", default="16:00")
+    ap.add_argument("--open-within-s", type=float, default=600, help="quota opens uniformly in [release, +n s]")
+    ap.add_argument("--runs", type=int, default=100)
+    ap.add_argument("--slow-from", help="HH:MM, site answers 503 from here")
+    ap.add_argument("--slow-to", help="HH:MM")
+    args = ap.parse_args()
+
+    times = parse_release_times(args.release)
+    release = DAY.replace(hour=times[0].hour, minute=times[0].minute)
+    slow = None
+    if args.slow_from and args.slow_to:
+        a, b = parse_release_times(args.slow_from)[0], parse_release_times(args.slow_to)[0]
+        slow = (DAY.replace(hour=a.hour, minute=a.minute), DAY.replace(hour=b.hour, minute=b.minute))
+    rng = random.Random(1)
+    random.seed(1)  # jitter Cadence
+
+    out = {}
+    for name in ("fixed", "adaptive"):
+        runs = []
+        for _ in range(args.runs):
+            opens_at = release + timedelta(seconds=rng.uniform(0, args.open_within_s))
+            if name == "fixed":
+                res = simulate(lambda t, failing: 60.0, opens_at, slow)
+            else:
+                # sama dengan _capacity_cadence() di bot-semeru.py, tanpa RateBudget (satu poller)
+                c = Cadence(hot=10, far=300, before=timedelta(minutes=5), after=timedelta(minutes=15))
+
+                def step(t, failing, c=c):
+                    c.observe(status=503 if failing else 200, elapsed=8.0 if failing else 0.3)
+                    return c.next_delay(t, nearest_release(t, times, timedelta(minutes=15)))
+
+                res = simulate(step, opens_at, slow)
+            runs.append(res)
+        det = sorted(r["detect_s"] for r in runs if r["detect_s"] is not None)
+        out[name] = {
+            "requests_per_day": round(statistics.mean(r["requests"] for r in runs), 1),
+            "errors_per_day": round(statistics.mean(r["errors"] for r in runs), 1),
+            "detect_p50_s": round(det[len(det) // 2], 1) if det else None,
+            "detect_max_s": round(det[-1], 1) if det else None,
+        }
+    print(json.dumps(out, indent=2))
+
+
+if __name__ == "__main__":
+    main()
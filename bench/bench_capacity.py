@@ -0,0 +1,139 @@
+"""Parser micro-benchmark for the ``kapasitas`` response in ``bot-semeru.py``.
+
+Compares answering every date of a month from one response:
+
+    legacy     BeautifulSoup over the whole body, then ``find_quota_for_date``
+               as it was (linear walk, ``parse_date_indo_to_iso`` + except per row)
+               once per date
+    snapshot   ``MonthCapacity.parse`` once, then a dict lookup per date
+
+and checks both give the same answer for every date. Pass a saved response
+with ``--html``; without it a month table in the site's markup (wrapped in
+a page-sized body) is generated.
+
+    python bench/bench_capacity.py --html saved_kapasitas.html --year-month 2025-09
+"""
+import argparse
+import importlib.util
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+
+from bs4 import BeautifulSoup
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+DAYS_ID = ["Senin", "Selasa", "Rabu", "Kamis", "Jumat", "Sabtu", "Minggu"]
+
+
+def synthetic_response(year_month: str, seed: int = 1) -> str:
+    rng = random.Random(seed)
+    y, m = map(int, year_month.split("-"))
+    month_name = ["Januari", "Februari", "Maret", "April", "Mei", "Juni", "Juli", "Agustus", "September",
+                  "Oktober", "November", "Desember"][m - 1]
+    rows = []
+    for d in range(1, 32 if m in (1, 3, 5, 7, 8, 10, 12) else 31 if m != 2 else 29):
+        if rng.random() < 0.2:
+            cell = "Kuota Penuh <br><small>Sisa 0</small>"
+        elif rng.random() < 0.1:
+            cell = "Tutup"
+        else:
+            cell = f"{rng.randrange(0, 600)} <small>kuota</small>"
+        rows.append(f"<tr>\n  <td><span>{DAYS_ID[d % 7]},</span> {d} {month_name} {y}</td>\n"
+                    f"  <td class=\"text-center\">{cell}</td>\n  <td><a href=\"#\">Detail</a></td>\n</tr>")
+    table = ("<table class=\"table table-bordered table-striped\">\n<thead><tr><th>Tanggal</th><th>Kuota</th>"
+             "<th></th></tr></thead>\n<tbody>\n" + "\n".join(rows) + "\n</tbody>\n</table>")
+    filler = "".join(f"<div class=\"col\"><p>Informasi pendakian {i}</p></div>\n" for i in range(300))
+    return (f"<html><head><meta name=\"csrf\" content=\"{rng.getrandbits(64):x}\"></head><body>"
+            f"{filler}<div class=\"table-responsive\">{table}</div>{filler}</body></html>")
+
+
+def load_bot():
+    os.chdir(tempfile.mkdtemp(prefix="bench-capacity-"))
+    sys.path.insert(0, ROOT)
+    spec = importlib.util.spec_from_file_location("bot_semeru", os.path.join(ROOT, "bot-semeru.py"))
+    bot = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(bot)
+    return bot
+
+
+def legacy_find_quota_for_date(bot, rows, iso_date: str):
+    for tr in rows:
+        tds = tr.find_all("td")
+        if len(tds) < 2:
+            continue
+        tanggal_text = " ".join(tds[0].stripped_strings)
+        try:
+            iso_from_cell = bot.parse_date_indo_to_iso(tanggal_text)
+        except Exception:
+            continue
+        if iso_from_cell == iso_date:
+            parts = list(tds[1].stripped_strings)
+            quota = bot.extract_int(" ".join(parts))
+            first_part = parts[0] if parts else ""
+            if re.search(r"\d", first_part):
+                status = "Tersedia" if quota > 0 else "Habis / Tidak tersedia"
+            else:
+                status = first_part
+            return {"tanggal_cell": tanggal_text, "quota": quota, "status": status}
+    return None
+
+
+def _timed(fn, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return {"median_ms": round(statistics.median(samples), 3), "max_ms": round(max(samples), 3), "n": repeat}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--html", help="saved kapasitas response body")
+    ap.add_argument("--year-month", default="2025-09")
+    ap.add_argument("--repeat", type=int, default=50)
+    args = ap.parse_args()
+
+    if args.html:
+        with open(args.html, "r", encoding="utf-8") as f:
+            html = f.read()
+    else:
+        html = synthetic_response(args.year_month)
+    bot = load_bot()
+    snap = bot.MonthCapacity.parse(html, args.year_month)
+    if snap is None:
+        sys.exit("tabel kapasitas tidak ditemukan di respons")
+    dates = sorted(snap.days)
+
+    def legacy():
+        rows = BeautifulSoup(html, "lxml").select("table.table tbody tr")
+        return {iso: legacy_find_quota_for_date(bot, rows, iso) for iso in dates}
+
+    def snapshot():
+        s = bot.MonthCapacity.parse(html, args.year_month)
+        return {iso: s.get(iso) for iso in dates}
+
+    same = legacy() == snapshot()
+    res = {
+        "body_bytes": len(html.encode("utf-8")),
+        "dates": len(dates),
+        "same_answers": same,
+        "legacy_all_dates": _timed(legacy, args.repeat),
+        "snapshot_all_dates": _timed(snapshot, args.repeat),
+        "legacy_one_date": _timed(lambda: legacy_find_quota_for_date(
+            bot, BeautifulSoup(html, "lxml").select("table.table tbody tr"), dates[-1]), args.repeat),
+        "snapshot_one_date": _timed(lambda: bot.MonthCapacity.parse(html).get(dates[-1]), args.repeat),
+    }
+    bot.storage.close()
+    print(json.dumps(res, indent=2))
+    if not same:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Firing error at a target instant: plain event-loop wake vs ``precision.fire_at``.
+
+For each trial a target a little in the future is picked and measured two
+ways:
+
+    loop       ``asyncio.sleep`` until the target, as a JobQueue callback wakes
+               (the bot then still runs the capacity check before booking)
+    precise    wake ``--lead-ms`` early on the loop, then ``precision.fire_at``
+
+Error is how late the "first request" callable was entered (perf_counter).
+``--busy-threads`` CPU-bound threads and a chatty event loop stand in for a
+bot that is polling and parsing at the same time.
+
+    python bench/bench_fire.py --trials 50 --busy-threads 2
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from precision import fire_at  # noqa: E402
+
+
+def _busy(stop: threading.Event):
+    x = 0
+    while not stop.is_set():
+        for i in range(10_000):
+            x += i * i  # kerja CPU murni: memegang GIL
+
+
+async def _chatter(stop: asyncio.Event):
+    while not stop.is_set():
+        sum(range(20_000))  # callback loop lain (parse, kirim pesan)
+        await asyncio.sleep(0.001)
+
+
+def _summary(errors_ms: list[float]) -> dict:
+    errors_ms = sorted(errors_ms)
+    return {"p50_ms": round(statistics.median(errors_ms), 3),
+            "p99_ms": round(errors_ms[min(len(errors_ms) - 1, int(len(errors_ms) * 0.99))], 3),
+            "max_ms": round(errors_ms[-1], 3)}
+
+
+async def run(trials: int, lead_ms: float) -> dict:
+    stop = asyncio.Event()
+    chatter = asyncio.create_task(_chatter(stop))
+    loop_err, precise_err = [], []
+    for _ in range(trials):
+        wall = time.time() + 0.3
+        target = time.perf_counter() + (wall - time.time())
+        await asyncio.sleep(max(0.0, wall - time.time()))
+        loop_err.append((time.perf_counter() - target) * 1000)
+
+        wall = time.time() + 0.3
+        target = time.perf_counter() + (wall - time.time())
+        await asyncio.sleep(max(0.0, wall - lead_ms / 1000 - time.time()))
+        entered = []
+        fire, _ = await asyncio.wrap_future(fire_at(wall, lambda: entered.append(time.perf_counter())))
+        precise_err.append((entered[0] - target) * 1000)
+    stop.set()
+    await chatter
+    return {"loop": _summary(loop_err), "precise": _summary(precise_err)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--trials", type=int, default=30)
+    ap.add_argument("--lead-ms", type=float, default=400)
+    ap.add_argument("--busy-threads", type=int, default=1)
+    args = ap.parse_args()
+
+    stop = threading.Event()
+    for _ in range(args.busy_threads):
+        threading.Thread(target=_busy, args=(stop,), daemon=True).start()
+    try:
+        res = asyncio.run(run(args.trials, args.lead_ms))
+    finally:
+        stop.set()
+    res.update(trials=args.trials, busy_threads=args.busy_threads, lead_ms=args.lead_ms)
+    print(json.dumps(res, indent=2))
+
+
+if __name__ == "__main__":
+    main()
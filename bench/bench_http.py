@@ -0,0 +1,198 @@
+"""Connection-reuse benchmark for the HTTP client registry.
+
+Starts a local HTTP/1.1 keep-alive server that counts accepted TCP
+connections, then replays a burst of requests the way the bots issue them
+(capacity checks plus per-job cookie sessions, several jobs sharing one
+cookie set) twice:
+
+    per-call   a new ``requests.Session`` / bare ``requests.post`` per call (old code)
+    registry   a ``network_opt.ClientRegistry``: one pooled capacity session, a fresh
+               cookie session per booking flow on the shared connection pool
+
+and reports handshakes (accepted connections) and wall time for each.
+A polling pass hits the capacity endpoint from several worker threads through
+``AsyncTransport.request_sync`` (how bot-bromo's ``check_capacity`` runs); the async pass runs hundreds of concurrent
+polls as coroutines on one thread through ``network_opt.AsyncTransport``.
+
+    python bench/bench_http.py
+    python bench/bench_http.py --jobs 200 --jobs-per-cookie 5 --rounds 3
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from network_opt import AsyncTransport, ClientRegistry, no_cookie_jar  # noqa: E402
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # ratusan koneksi serentak dari pass async
+
+    def __init__(self, addr, handler):
+        super().__init__(addr, handler)
+        self.accepted = 0
+        self._count_lock = threading.Lock()
+
+    def process_request(self, request, client_address):
+        with self._count_lock:
+            self.accepted += 1
+        super().process_request(request, client_address)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True  # header dan body ditulis terpisah; tanpa ini tiap respons tertahan ~40 ms
+
+    def _reply(self):
+        n = int(self.headers.get("Content-Length") or 0)
+        if n:
+            self.rfile.read(n)
+        body = b'{"status":true,"data":[]}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Set-Cookie", "ci_session=server; Path=/")
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _reply
+    do_POST = _reply
+
+    def log_message(self, *args):
+        pass
+
+
+def _workload(jobs: int, per_cookie: int) -> list[tuple[str, dict]]:
+    """(kind, cookies) per request: one capacity check and one booking GET per job."""
+    out = []
+    for i in range(jobs):
+        cookies = {"_ga": f"GA1.1.{i // per_cookie}", "ci_session": f"{i // per_cookie:040x}"}
+        out.append(("capacity", {}))
+        out.append(("booking", cookies))
+    return out
+
+
+def run_per_call(base: str, work, rounds: int):
+    for _ in range(rounds):
+        for kind, cookies in work:
+            if kind == "capacity":
+                requests.post(f"{base}/capacity", data={"bulan": "10"}, timeout=10)
+            else:
+                sess = requests.Session()
+                for k, v in cookies.items():
+                    sess.cookies.set(k, v)
+                sess.get(f"{base}/member/booking", timeout=10)
+
+
+def run_registry(base: str, work, rounds: int) -> dict:
+    clients = ClientRegistry()
+    try:
+        for _ in range(rounds):
+            for kind, cookies in work:
+                if kind == "capacity":
+                    clients.session(("capacity",), no_cookie_jar).post(
+                        f"{base}/capacity", data={"bulan": "10"}, timeout=10)
+                else:
+                    def setup(sess, cookies=cookies):
+                        for k, v in cookies.items():
+                            sess.cookies.set(k, v)
+
+                    # seperti make_session_with_cookies: session sendiri, koneksi dari pool bersama
+                    clients.ephemeral(setup).get(f"{base}/member/booking", timeout=10)
+        return clients.stats
+    finally:
+        clients.close()
+
+
+def run_capacity_polling(base: str, threads: int, polls: int) -> dict:
+    transport = AsyncTransport(retries=3, backoff=0.6, timeout=(7, 12))
+
+    def poller():
+        for _ in range(polls):
+            transport.request_sync("POST", f"{base}/capacity", data={"bulan": "10"}).raise_for_status()
+
+    try:
+        workers = [threading.Thread(target=poller) for _ in range(threads)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        return transport.stats
+    finally:
+        transport.close()
+
+
+def run_async_polling(base: str, concurrency: int, polls: int) -> dict:
+    transport = AsyncTransport(timeout=(7, 12))
+    threads = set()
+
+    async def poller():
+        for _ in range(polls):
+            resp = await transport.post(f"{base}/capacity", data={"bulan": "10"})
+            resp.raise_for_status()
+            threads.add(threading.get_ident())
+
+    async def run() -> float:
+        try:
+            await transport.get(base)  # bangun client (SSL context, pool) di luar pengukuran
+            t0 = time.perf_counter()
+            await asyncio.gather(*(poller() for _ in range(concurrency)))
+            return (time.perf_counter() - t0) * 1000
+        finally:
+            await transport.aclose()
+
+    polls_ms = asyncio.run(run())
+    return {**transport.stats, "concurrency": concurrency, "polls_ms": round(polls_ms, 1),
+            "client_threads": len(threads)}
+
+
+def measure(server: _Server, fn, *args) -> dict:
+    before = server.accepted
+    t0 = time.perf_counter()
+    extra = fn(*args)
+    res = {"handshakes": server.accepted - before, "wall_ms": round((time.perf_counter() - t0) * 1000, 1)}
+    if extra:
+        res["client"] = extra
+    return res
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--jobs", type=int, default=100)
+    ap.add_argument("--jobs-per-cookie", type=int, default=5)
+    ap.add_argument("--rounds", type=int, default=3)
+    ap.add_argument("--poll-threads", type=int, default=4)
+    ap.add_argument("--polls", type=int, default=100)
+    ap.add_argument("--async-concurrency", type=int, default=500)
+    args = ap.parse_args()
+
+    server = _Server(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    work = _workload(args.jobs, args.jobs_per_cookie)
+    try:
+        res = {
+            "requests": len(work) * args.rounds,
+            "jobs": args.jobs,
+            "jobs_per_cookie": args.jobs_per_cookie,
+            "per_call": measure(server, run_per_call, base, work, args.rounds),
+            "registry": measure(server, run_registry, base, work, args.rounds),
+            "capacity_polling": measure(server, run_capacity_polling, base, args.poll_threads, args.polls),
+            "async_polling": measure(server, run_async_polling, base, args.async_concurrency, 4),
+        }
+    finally:
+        server.shutdown()
+    print(json.dumps(res, indent=2))
+
+
+if __name__ == "__main__":
+    main()
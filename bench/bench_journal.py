@@ -0,0 +1,102 @@
+"""Journal replay benchmark for ``store.JsonStore``.
+
+Writes N random mutations (put/del/session) through a journaled JsonStore,
+then checks that snapshot + journal replay rebuilds exactly the dict that
+``load_storage()`` would read from a fully rewritten ``storage.json``.
+
+    python bench/bench_journal.py            # 100k ops
+    python bench/bench_journal.py --ops 20000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from store import JsonStore, load_snapshot  # noqa: E402
+
+
+def make_record(rng: random.Random, i: int) -> dict:
+    day = 1 + i % 28
+    return {
+        "site": "semeru",
+        "booking_iso": f"2025-08-{day:02d}",
+        "exec_iso": f"2025-08-{max(1, day - 7):02d}",
+        "time": "16:00:00",
+        "reminder_minutes": 15,
+        "created_at": "2025-07-20T10:00:00+07:00",
+        "chat_id": 1000 + i % 50,
+        "profile": {"_leader": {"name": f"User {i}", "identity_no": str(rng.randrange(10**15, 10**16))},
+                    "_members": []},
+        "cookies": {"ci_session": f"{rng.getrandbits(128):032x}"},
+    }
+
+
+def main(n_ops: int = 100_000):
+    rng = random.Random(42)
+    workdir = tempfile.mkdtemp(prefix="bench-journal-")
+    snap = os.path.join(workdir, "storage.json")
+    journal = snap + ".journal"
+    ref: dict = {}
+
+    # threshold besar: semua op tetap di journal, tidak ada compaction di tengah
+    st = JsonStore(snap, flush_interval=3600, journal_path=journal, journal_max_bytes=1 << 40)
+    users = [str(100000 + u) for u in range(200)]
+    t0 = time.perf_counter()
+    for i in range(n_ops):
+        uid = rng.choice(users)
+        r = rng.random()
+        if r < 0.7:
+            name = f"semeru-{rng.randrange(500)}"
+            rec = make_record(rng, i)
+            st.jobs(uid)[name] = rec
+            ref.setdefault(uid, {}).setdefault("jobs", {})[name] = rec
+        elif r < 0.9:
+            name = f"semeru-{rng.randrange(500)}"
+            st.jobs(uid).pop(name, None)
+            ref.get(uid, {}).get("jobs", {}).pop(name, None)
+        else:
+            ci = f"{rng.getrandbits(64):016x}"
+            st.set_ci(uid, ci)
+            ref.setdefault(uid, {})["ci_session"] = ci
+        st.commit()
+    append_s = time.perf_counter() - t0
+    journal_bytes = st.stats["journal_bytes"]
+    # simulasi crash: tutup file journal tanpa compaction, lepas kunci pemilik
+    st._journal.close()
+    st._lockfile.close()
+
+    t0 = time.perf_counter()
+    replayed = load_snapshot(snap, journal)
+    replay_s = time.perf_counter() - t0
+    assert replayed == ref, "replay berbeda dari referensi"
+
+    t0 = time.perf_counter()
+    st2 = JsonStore(snap, flush_interval=3600, journal_path=journal)  # replay + compaction
+    boot_s = time.perf_counter() - t0
+    st2.close()
+    with open(snap, "r", encoding="utf-8") as f:
+        assert json.load(f) == ref, "snapshot hasil compaction berbeda"
+    assert os.path.getsize(journal) == 0 and not os.path.exists(journal + ".old")
+
+    result = {
+        "ops": n_ops,
+        "append_total_s": round(append_s, 3),
+        "append_us_per_op": round(append_s / n_ops * 1e6, 2),
+        "journal_bytes": journal_bytes,
+        "replay_s": round(replay_s, 3),
+        "boot_with_compaction_s": round(boot_s, 3),
+        "snapshot_bytes": os.path.getsize(snap),
+    }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--ops", type=int, default=100_000, help="number of random mutations")
+    args = ap.parse_args()
+    main(args.ops)
@@ -0,0 +1,137 @@
+"""Micro-benchmark of Semeru booking payload preparation in ``bot-semeru.py``.
+
+Per attempt the flow sends ``do_booking`` plus one ``member_update`` per
+member. Compares preparing those request bodies:
+
+    dict       the old way: build each dict from ``leader.get``/``m.get``,
+               then ``requests`` url-encodes it (``_encode_params``)
+    compiled   ``compile_semeru_payloads`` once at schedule time, then
+               ``FormTemplate.render(secret=..., form_hash=...)`` per attempt
+
+``*_prepare`` adds ``requests.Request(...).prepare()`` on top, i.e. all the
+client-side work before bytes hit the socket. Both produce identical bodies
+(checked).
+
+    python bench/bench_payload.py --members 9 --repeat 2000
+"""
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import requests
+from requests.models import RequestEncodingMixin
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def load_bot():
+    os.chdir(tempfile.mkdtemp(prefix="bench-payload-"))
+    sys.path.insert(0, ROOT)
+    spec = importlib.util.spec_from_file_location("bot_semeru", os.path.join(ROOT, "bot-semeru.py"))
+    bot = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(bot)
+    return bot
+
+
+def legacy_bodies(bot, booking_iso, leader, members, secret, form_hash) -> list[dict]:
+    """Dict payload persis seperti ``_do_booking``/``_add_member`` lama."""
+    out = []
+    for m in members:
+        out.append({
+            "action": "member_update", "id": "", "secret": secret, "form_hash": form_hash or "",
+            "nama": m.get("nama", ""), "birthdate": m.get("birthdate", ""),
+            "anggota_setuju": m.get("anggota_setuju", "1"), "id_gender": m.get("id_gender", "1"),
+            "alamat": m.get("alamat", ""), "id_identity": m.get("id_identity", "1"),
+            "identity_no": m.get("identity_no", ""), "hp_member": m.get("hp_member", ""),
+            "hp_keluarga": m.get("hp_keluarga", ""), "id_job": m.get("id_job", "6"),
+            "id_country": m.get("id_country", "99"),
+        })
+    try:
+        arr_iso = (datetime.fromisoformat(booking_iso) + timedelta(days=1)).date().isoformat()
+    except Exception:
+        arr_iso = booking_iso
+    bank_norm = {"qris": "qris", "va-mandiri": "VA-Mandiri", "va-bni": "VA-BNI"} \
+        .get((leader.get("bank") or "qris").strip().lower(), "qris")
+    out.append({
+        "action": "do_booking", "secret": secret, "form_hash": form_hash or "",
+        "id_sector": bot.SEMERU_SECTOR_ID, "id_site": bot.SEMERU_SITE_ID, "site": bot.SEMERU_SITE_LABEL,
+        "date_depart": booking_iso, "date_arrival": arr_iso,
+        "pendamping": leader.get("pendamping", "0"), "organisasi": leader.get("organisasi", ""),
+        "name": leader.get("name", ""), "id_country": leader.get("id_country", "99"),
+        "birthdate": leader.get("birthdate", ""), "leader_setuju": leader.get("leader_setuju", "1"),
+        "id_gender": leader.get("id_gender", "1"), "id_identity": leader.get("id_identity", "1"),
+        "identity_no": leader.get("identity_no", ""), "address": leader.get("address", ""),
+        "id_province": leader.get("id_province", ""), "id_district": leader.get("id_district", ""),
+        "hp": leader.get("hp", ""), "table-member_length": "10", "bank": bank_norm, "termsCheckbox": "on",
+    })
+    return out
+
+
+def _timed(fn, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1e6)
+    return {"median_us": round(statistics.median(samples), 1), "p99_us": round(sorted(samples)[int(repeat * 0.99)], 1)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--members", type=int, default=9)
+    ap.add_argument("--repeat", type=int, default=2000)
+    args = ap.parse_args()
+
+    bot = load_bot()
+    leader = {"name": "Budi Santoso", "birthdate": "1990-01-02", "identity_no": "3578010101900001",
+              "address": "Jl. Mawar No. 5, Surabaya", "id_province": "35", "id_district": "3578",
+              "hp": "081234567890", "bank": "va-bni", "organisasi": "Mapala & Co"}
+    members = [{"nama": f"Anggota Ke-{i}", "birthdate": "1995-05-05", "alamat": f"Jl. Melati {i}/RT 0{i}",
+                "identity_no": f"35780101950000{i:02d}", "hp_member": "0812", "hp_keluarga": "0813"}
+               for i in range(1, args.members + 1)]
+    iso, secret, form_hash = "2025-09-30", "a1b2+c3/d4==", "f0rm-h4sh"
+    url = bot.ACTION_URL
+
+    payloads = bot.compile_semeru_payloads(iso, leader, members)
+    templates = [*payloads.members, payloads.booking]
+
+    def dict_encode():
+        return [RequestEncodingMixin._encode_params(d) for d in legacy_bodies(bot, iso, leader, members, secret, form_hash)]
+
+    def compiled_render():
+        return [t.render(secret=secret, form_hash=form_hash) for t in templates]
+
+    def dict_prepare():
+        return [requests.Request("POST", url, data=d).prepare()
+                for d in legacy_bodies(bot, iso, leader, members, secret, form_hash)]
+
+    def compiled_prepare():
+        return [requests.Request("POST", url, data=t.render(secret=secret, form_hash=form_hash),
+                                 headers=bot.FormTemplate.HEADERS).prepare() for t in templates]
+
+    same = [b.encode() for b in dict_encode()] == compiled_render()
+    res = {
+        "members": args.members,
+        "requests_per_attempt": len(templates),
+        "identical_bodies": same,
+        "compile_once": _timed(lambda: bot.compile_semeru_payloads(iso, leader, members), max(1, args.repeat // 10)),
+        "dict_encode": _timed(dict_encode, args.repeat),
+        "compiled_render": _timed(compiled_render, args.repeat),
+        "dict_prepare": _timed(dict_prepare, args.repeat),
+        "compiled_prepare": _timed(compiled_prepare, args.repeat),
+    }
+    bot.HTTP.close()
+    bot.storage.close()
+    print(json.dumps(res, indent=2))
+    if not same:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Critical-path round-trips of the Semeru booking flow, with and without pre-arm.
+
+Serves a mock of the site locally (home, rules page, booking page carrying
+the ``cnt-page`` tokens, the ``action``/``grid`` endpoints and the capacity
+view), each response delayed by ``--rtt-ms`` to stand in for the network.
+Then it runs ``do_booking_flow_semeru`` from T0 twice:
+
+    full       the flow as-is: capacity check, token priming, cleanup, members, booking
+    prearmed   ``prearm_semeru`` before T0, then the flow with ``armed=``
+
+and reports the requests and wall time between T0 and the flow returning
+(including the flow's own 0.2 s pauses between members, the same in both
+modes), plus what the pre-arm stage did ahead of T0. ``stages`` is the
+flow's own timeline summary (``timeline.Timeline``).
+
+    python bench/bench_prearm.py --rtt-ms 80 --members 3
+"""
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    rtt_s = 0.0
+    log: list = []
+
+    def _send(self, body: bytes, ctype: str):
+        time.sleep(self.rtt_s)
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        type(self).log.append(("GET", path, ""))
+        if path.startswith("/booking/site/semeru"):
+            tokens = json.dumps({"booking": {"secret": "s3cr3t", "form_hash": "fh01"}})
+            body = f"<html><body><div class='cnt-page'>{tokens}</div>{'<p>form</p>' * 500}</body></html>"
+        else:
+            body = "<html><body>" + "<p>halaman</p>" * 500 + "</body></html>"
+        self._send(body.encode(), "text/html")
+
+    def do_POST(self):
+        n = int(self.headers.get("Content-Length") or 0)
+        form = {k: v[0] for k, v in parse_qs(self.rfile.read(n).decode()).items()}
+        path = urlsplit(self.path).path
+        action = form.get("action", "")
+        type(self).log.append(("POST", path, action))
+        if path.endswith("/get_view"):
+            rows = "".join(f"<tr><td>Selasa, {d} September 2025</td><td>25 Kuota</td></tr>" for d in range(1, 31))
+            self._send(f"<table class='table'><tbody>{rows}</tbody></table>".encode(), "text/html")
+        elif path.endswith("/grid"):
+            self._send(b'{"data": []}', "application/json")
+        else:
+            self._send(json.dumps({"status": True, "message": f"{action} ok"}).encode(), "application/json")
+
+    def log_message(self, *args):
+        pass
+
+
+def load_bot(base: str):
+    os.chdir(tempfile.mkdtemp(prefix="bench-prearm-"))
+    sys.path.insert(0, ROOT)
+    spec = importlib.util.spec_from_file_location("bot_semeru", os.path.join(ROOT, "bot-semeru.py"))
+    bot = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(bot)
+    bot.BASE = base
+    bot.CAP_URL = f"{base}/website/home/get_view"
+    bot.ACTION_URL = f"{base}/website/booking/action"
+    return bot
+
+
+def _calls(since: int) -> dict:
+    return dict(Counter(f"{m} {p}{' ' + a if a else ''}" for m, p, a in _Handler.log[since:]))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--rtt-ms", type=float, default=80)
+    ap.add_argument("--members", type=int, default=3)
+    args = ap.parse_args()
+
+    _Handler.rtt_s = args.rtt_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    bot = load_bot(f"http://127.0.0.1:{server.server_address[1]}")
+
+    iso = "2025-09-30"
+    leader = {"name": "Ketua", "hp": "0812"}
+    members = [{"nama": f"Anggota {i}", "identity_no": f"35{i:014d}"} for i in range(1, args.members + 1)]
+    cookies = {"ci_session": "bench"}
+    res = {"rtt_ms": args.rtt_ms, "members": args.members}
+    try:
+        for mode in ("full", "prearmed"):
+            armed = None
+            if mode == "prearmed":
+                mark = len(_Handler.log)
+                t0 = time.perf_counter()
+                armed = bot.prearm_semeru("", iso, cookies, "bench-job")
+                res["prearm_stage"] = {"requests": len(_Handler.log) - mark,
+                                       "ms": round((time.perf_counter() - t0) * 1000, 1),
+                                       "reported_round_trips": armed["round_trips"]}
+            mark = len(_Handler.log)
+            t0 = time.perf_counter()
+            tl = bot.Timeline("semeru")
+            ok, msg, _, _ = bot.do_booking_flow_semeru("", iso, leader, members, job_cookies=cookies, armed=armed,
+                                                       timeline=tl)
+            res[mode] = {"ok": ok, "critical_requests": len(_Handler.log) - mark,
+                         "critical_ms": round((time.perf_counter() - t0) * 1000, 1), "calls": _calls(mark),
+                         "stages": tl.summary()}
+    finally:
+        server.shutdown()
+        bot.HTTP.close()
+        bot.storage.close()
+    res["round_trips_removed"] = res["full"]["critical_requests"] - res["prearmed"]["critical_requests"]
+    print(json.dumps(res, indent=2))
+
+
+if __name__ == "__main__":
+    main()
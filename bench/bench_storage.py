@@ -0,0 +1,257 @@
+"""Storage benchmark for ``bot-semeru.py`` at growing job counts.
+
+Generates a synthetic legacy ``storage.json`` (records shaped like the ones
+``schedule_semeru_confirm`` writes, spread over many users plus one heavy
+user), boots the bot module on it in a fresh subprocess per size/backend
+(once for the first boot, which includes the SQLite migration, then again
+for the steady state), and times the storage paths the handlers use:
+
+    load_storage, save_storage, get_jobs_store, _render_jobs_table,
+    resolve_job_selector, trigger_next_cookie_job
+
+Results go to stdout and to a JSON file so runs can be diffed.
+
+    python bench/bench_storage.py                          # 10, 1k, 10k, 100k; sqlite + json
+    python bench/bench_storage.py --sizes 1000 10000 --backends sqlite --out before.json
+"""
+import argparse
+import importlib.util
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+JOBS_PER_USER = 20
+HEAVY_SHARE = 0.1  # porsi job milik satu user "berat" (yang /jobs-nya diukur)
+JOBS_PER_COOKIE = 5  # beberapa job berbagi satu sesi → rantai trigger_next_cookie_job
+
+
+def _digits(rng: random.Random, n: int) -> str:
+    return "".join(rng.choice("0123456789") for _ in range(n))
+
+
+def make_leader(rng: random.Random, i: int) -> dict:
+    return {
+        "id_country": "99",
+        "id_gender": rng.choice("12"),
+        "id_identity": "1",
+        "name": f"Pendaki {i}",
+        "identity_no": _digits(rng, 16),
+        "hp": "08" + _digits(rng, 10),
+        "birthdate": f"19{rng.randrange(70, 100)}-0{rng.randrange(1, 10)}-1{rng.randrange(0, 10)}",
+        "address": f"Jl. Contoh No. {rng.randrange(1, 300)}, Malang",
+        "id_province": "35",
+        "id_district": "3507",
+        "pendamping": "0",
+        "organisasi": "",
+        "leader_setuju": "1",
+        "bank": "qris",
+    }
+
+
+def make_member(rng: random.Random, i: int, k: int) -> dict:
+    return {
+        "nama": f"Anggota {i}-{k}",
+        "birthdate": f"19{rng.randrange(70, 100)}-1{rng.randrange(0, 3)}-0{rng.randrange(1, 10)}",
+        "id_gender": rng.choice("12"),
+        "alamat": f"Jl. Anggota No. {rng.randrange(1, 300)}, Surabaya",
+        "id_identity": "1",
+        "identity_no": _digits(rng, 16),
+        "hp_member": "08" + _digits(rng, 10),
+        "hp_keluarga": "08" + _digits(rng, 10),
+        "id_job": str(rng.randrange(1, 10)),
+        "id_country": "99",
+        "anggota_setuju": "1",
+    }
+
+
+def make_storage(n_jobs: int, seed: int = 42) -> tuple[dict, str]:
+    """Legacy ``storage.json`` dict with ``n_jobs`` semeru jobs; returns (data, heavy_uid)."""
+    rng = random.Random(seed)
+    n_users = max(1, n_jobs // JOBS_PER_USER)
+    heavy_uid = "100000"
+    heavy_jobs = max(1, int(n_jobs * HEAVY_SHARE)) if n_users > 1 else n_jobs
+    now = datetime.now()
+    data: dict = {}
+    for i in range(n_jobs):
+        uid = heavy_uid if i < heavy_jobs else str(100001 + rng.randrange(n_users - 1 or 1))
+        user = data.setdefault(uid, {"ci_session": f"{rng.getrandbits(128):032x}", "jobs": {}})
+        run_at = now + timedelta(minutes=rng.randrange(30, 60 * 24 * 30))
+        booking = run_at + timedelta(days=7)
+        time_s = run_at.strftime("%H:%M:%S")
+        name = f"semeru-{uid}-pendaki{i}-{booking:%Y-%m-%d}-{run_at:%Y-%m-%d}-{time_s.replace(':', '')}"
+        session = i // JOBS_PER_COOKIE
+        user["jobs"][name] = {
+            "booking_iso": booking.strftime("%Y-%m-%d"),
+            "exec_iso": run_at.strftime("%Y-%m-%d"),
+            "time": time_s,
+            "profile": {
+                "_leader": make_leader(rng, i),
+                "_members": [make_member(rng, i, k) for k in range(rng.randrange(0, 6))],
+            },
+            "cookies": {
+                "_ga": f"GA1.1.{session:010d}.1720000000",
+                "_ga_TMVP85FKW9": f"GS1.1.1720000000.{session}.1.1720000000.0.0.0",
+                "ci_session": f"{session:040x}",
+            },
+            "reminder_minutes": rng.choice([None, 10, 15, 30]),
+            "created_at": now.isoformat(),
+            "chat_id": int(uid),
+        }
+    return data, heavy_uid
+
+
+def _timed(fn, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return {"median_ms": round(statistics.median(samples), 3), "max_ms": round(max(samples), 3), "n": repeat}
+
+
+def _rss_mb() -> float | None:
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+class _FakeJobQueue:
+    """Just enough JobQueue for trigger_next_cookie_job: every name is live, run_once is recorded."""
+
+    def __init__(self):
+        self.ran: list[str] = []
+
+    def get_jobs_by_name(self, name):
+        return [SimpleNamespace(schedule_removal=lambda: None)]
+
+    def run_once(self, callback, when, name=None, data=None, chat_id=None):
+        self.ran.append(name)
+
+
+def run_one(workdir: str, backend: str, heavy_uid: str, repeat: int, boot_only: bool = False) -> dict:
+    """Measure one size/backend; runs inside its own process (module-level store)."""
+    os.chdir(workdir)
+    os.environ["STORAGE_BACKEND"] = backend
+    os.environ["STORAGE_DB"] = os.path.join(workdir, "storage.db")
+    sys.path.insert(0, ROOT)
+    rss0 = _rss_mb()
+
+    t0 = time.perf_counter()
+    spec = importlib.util.spec_from_file_location("bot_semeru", os.path.join(ROOT, "bot-semeru.py"))
+    bot = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(bot)  # open_store: migrasi (sqlite) / load snapshot (json) + JobIndex
+    boot_ms = (time.perf_counter() - t0) * 1000
+    res: dict = {"boot_ms": round(boot_ms, 1), "rss_boot_mb": _rss_mb(), "rss_before_mb": rss0}
+    if boot_only:
+        bot.storage.close()
+        return res
+
+    jobs = bot.get_jobs_store(heavy_uid)
+    names = jobs.ordered_names()
+    res["heavy_user_jobs"] = len(names)
+    rng = random.Random(7)
+
+    res["load_storage"] = _timed(bot.load_storage, max(1, repeat // 10))
+
+    def save():
+        name = rng.choice(names)
+        rec = jobs[name]
+        jobs[name] = rec.replace(reminder_minutes=rng.choice([10, 15, 30]))
+        bot.save_storage(bot.storage)
+
+    res["save_storage"] = _timed(save, repeat)
+    if backend == "json":
+        res["json_snapshot"] = _timed(lambda: bot.storage._persister.flush(force=True), max(1, repeat // 10))
+
+    res["get_jobs_store_len"] = _timed(lambda: len(bot.get_jobs_store(heavy_uid)), repeat)
+    res["get_jobs_store_record"] = _timed(lambda: bot.get_jobs_store(heavy_uid).get(rng.choice(names)), repeat)
+    res["render_jobs_table"] = _timed(lambda: bot._render_jobs_table(bot.get_jobs_store(heavy_uid), set()),
+                                      max(1, repeat // 10))
+    res["resolve_job_selector_index"] = _timed(
+        lambda: bot.resolve_job_selector(heavy_uid, str(rng.randrange(1, len(names) + 1))), repeat)
+    res["resolve_job_selector_name"] = _timed(lambda: bot.resolve_job_selector(heavy_uid, rng.choice(names)), repeat)
+
+    jq = _FakeJobQueue()
+    ctx = SimpleNamespace(application=SimpleNamespace(job_queue=jq))
+
+    def trigger():
+        name = rng.choice(names)
+        rec = jobs.header(name)
+        bot.CONSUMED_EARLY.clear()
+        bot.trigger_next_cookie_job(ctx, heavy_uid, name, rec.get("cookies"), int(heavy_uid), "semeru")
+
+    res["trigger_next_cookie_job"] = _timed(trigger, repeat)
+    res["trigger_chained"] = len(jq.ran)
+    res["rss_end_mb"] = _rss_mb()
+    bot.storage.close()
+    return res
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10, 1_000, 10_000, 100_000])
+    ap.add_argument("--backends", nargs="+", default=["sqlite", "json"], choices=["sqlite", "json"])
+    ap.add_argument("--repeat", type=int, default=200)
+    ap.add_argument("--out", default="bench_storage.json")
+    ap.add_argument("--one", nargs=3, metavar=("WORKDIR", "BACKEND", "HEAVY_UID"), help=argparse.SUPPRESS)
+    ap.add_argument("--boot-only", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.one:
+        workdir, backend, heavy_uid = args.one
+        print(json.dumps(run_one(workdir, backend, heavy_uid, args.repeat, args.boot_only)))
+        return
+
+    def child(workdir: str, backend: str, heavy_uid: str, *extra: str) -> dict:
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--repeat", str(args.repeat),
+             "--one", workdir, backend, heavy_uid, *extra],
+            capture_output=True, text=True, check=True,
+        )
+        return json.loads(out.stdout.strip().splitlines()[-1])
+
+    results = {"started_at": datetime.now().isoformat(timespec="seconds"), "python": sys.version.split()[0],
+               "runs": []}
+    for n in args.sizes:
+        data, heavy_uid = make_storage(n)
+        src = tempfile.mkdtemp(prefix=f"bench-storage-{n}-")
+        snap = os.path.join(src, "storage.json")
+        t0 = time.perf_counter()
+        with open(snap, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        gen = {"users": len(data), "json_write_ms": round((time.perf_counter() - t0) * 1000, 1),
+               "json_bytes": os.path.getsize(snap)}
+        del data
+        for backend in args.backends:
+            workdir = tempfile.mkdtemp(prefix=f"bench-storage-{n}-{backend}-")
+            shutil.copy(snap, os.path.join(workdir, "storage.json"))
+            first = child(workdir, backend, heavy_uid, "--boot-only")
+            run = {"jobs": n, "backend": backend, **gen,
+                   "first_boot_ms": first["boot_ms"], "rss_first_boot_mb": first["rss_boot_mb"],
+                   **child(workdir, backend, heavy_uid)}
+            results["runs"].append(run)
+            print(json.dumps(run), flush=True)
+            shutil.rmtree(workdir, ignore_errors=True)
+        shutil.rmtree(src, ignore_errors=True)
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"hasil: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
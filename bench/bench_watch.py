@@ -0,0 +1,174 @@
+"""Event-loop lag of the watch engine (``poll_get_view_job``) in ``bot-semeru.py``.
+
+Serves the capacity view from a local HTTP server (a rotating token and
+timestamp on every response; the watched date's quota opens after a few
+polls), drives ``poll_get_view_job`` tick by tick with a fake
+JobQueue, and samples event-loop lag (how late a 5 ms ``asyncio.sleep``
+wakes up) the whole time. When the view changes the job fires the
+booking attempt; the booking flow is replaced by a stub that blocks for
+``--flow-s`` seconds per attempt, as a real flow does on the network.
+
+    python bench/bench_watch.py
+    python bench/bench_watch.py --bot /tmp/bot-semeru-old.py   # compare another revision
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SAMPLE_S = 0.005
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    flip_after = 3  # setelah GET ke-n, kuota tanggal yang dipantau dibuka
+    hits = 0
+
+    def do_GET(self):
+        type(self).hits += 1
+        quota = 0 if self.hits <= self.flip_after else 25
+        rows = "".join(
+            f"<tr><td>Selasa, {day} September 2025</td><td>{quota if day == 30 else 0} Kuota</td></tr>"
+            for day in range(1, 31)
+        )
+        # token & timestamp berubah tiap request: bukan rilis kuota
+        body = (f"<html><meta name='csrf' content='{os.urandom(8).hex()}'><p>{time.time()}</p>"
+                f"<table class='table'><tbody>{rows}</tbody></table>" + "<p>padding</p>" * 2000 + "</html>").encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _FakeJob:
+    def __init__(self, name: str, data: dict):
+        self.name = name
+        self.data = data
+        self.chat_id = 1
+        self.interval = None
+        self.removed = False
+        self.next_run_times = []
+        self.job = SimpleNamespace(modify=self._modify)  # APScheduler job di balik telegram.ext.Job
+
+    def _modify(self, next_run_time=None, **kwargs):
+        self.next_run_times.append(next_run_time)
+
+    def schedule_removal(self):
+        self.removed = True
+
+
+class _FakeJobQueue:
+    def get_jobs_by_name(self, name):
+        return []
+
+
+class _FakeBot:
+    def __init__(self):
+        self.sent: list[str] = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append(text)
+
+
+def load_bot(path: str):
+    os.chdir(tempfile.mkdtemp(prefix="bench-watch-"))
+    sys.path.insert(0, ROOT)
+    spec = importlib.util.spec_from_file_location("bot_semeru", path)
+    bot = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(bot)
+    return bot
+
+
+async def run(bot, base: str, ticks: int, flow_s: float) -> dict:
+    bot.CAP_URL = f"{base}/website/home/get_view"
+    attempts = []
+
+    def flow_stub(*args, **kwargs):
+        attempts.append(time.perf_counter())
+        time.sleep(flow_s)  # flow booking asli: request blocking berturut-turut
+        return False, "mock flow", flow_s, None
+
+    bot.do_booking_flow_semeru = flow_stub
+    bot.do_booking_flow_bromo = flow_stub
+
+    job = _FakeJob("watch-bench", {
+        "job_name": "watch-bench", "site": "semeru", "iso": "2025-09-30", "user_id": 1, "chat_id": 1,
+        "profile": {"_leader": {"name": "A"}, "_members": []}, "cookies": {"ci_session": "x"},
+    })
+    tg = _FakeBot()
+    ctx = SimpleNamespace(job=job, bot=tg, application=SimpleNamespace(job_queue=_FakeJobQueue()),
+                          job_queue=_FakeJobQueue())
+
+    lags: list[float] = []
+    stop = asyncio.Event()
+
+    async def monitor():
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            await asyncio.sleep(SAMPLE_S)
+            lags.append((time.perf_counter() - t0 - SAMPLE_S) * 1000)
+
+    mon = asyncio.create_task(monitor())
+    tick_ms = []
+    triggered_ms = None
+    for _ in range(ticks):
+        if job.removed:
+            break
+        t0 = time.perf_counter()
+        await bot.poll_get_view_job(ctx)
+        ms = (time.perf_counter() - t0) * 1000
+        tick_ms.append(round(ms, 1))
+        if job.removed:
+            triggered_ms = round(ms, 1)
+        await asyncio.sleep(0.05)
+    stop.set()
+    await mon
+    lags.sort()
+    return {
+        "ticks": len(tick_ms),
+        "tick_ms": tick_ms,
+        "triggered_tick_ms": triggered_ms,
+        "booking_attempts": len(attempts),
+        "loop_lag_samples": len(lags),
+        "loop_lag_p50_ms": round(lags[len(lags) // 2], 2) if lags else None,
+        "loop_lag_p99_ms": round(lags[int(len(lags) * 0.99)], 2) if lags else None,
+        "loop_lag_max_ms": round(lags[-1], 2) if lags else None,
+        "messages": tg.sent,
+        "job_data_bytes": sum(len(v) for v in job.data.values() if isinstance(v, (str, bytes))),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--bot", default=os.path.join(ROOT, "bot-semeru.py"))
+    ap.add_argument("--ticks", type=int, default=8)
+    ap.add_argument("--flow-s", type=float, default=0.5)
+    args = ap.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    bot = load_bot(os.path.abspath(args.bot))
+    try:
+        res = asyncio.run(run(bot, f"http://127.0.0.1:{server.server_address[1]}", args.ticks, args.flow_s))
+    finally:
+        server.shutdown()
+        bot.storage.close()
+    print(json.dumps(res, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
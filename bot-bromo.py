@@ -11,6 +11,8 @@ from telegram.ext import (
 )
 from telegram.error import TelegramError
 from dotenv import load_dotenv
+from network_opt import CLIENTS, AsyncTransport
+from store import JobsView, open_store
 
 # Load .env dari working directory
 load_dotenv()
@@ -26,7 +28,13 @@ ID_SITE   = "4"      # Bromo
 ID_SECTOR = "1"      # Gunung Bromo
 SITE_LABEL = "Bromo"
 
-STORAGE_FILE = "storage.json"   # { "<user_id>": {"ci_session": "...", "jobs": {...}} }
+STORAGE_FILE = "storage.json"   # format lama { "<user_id>": {"ci_session": "...", "jobs": {...}} }
+# Store dibagi dengan bot-semeru.py (lihat store.py); default SQLite agar dua proses aman
+STORAGE_DB = os.getenv("STORAGE_DB", "storage.db")
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "sqlite").strip().lower()
+STORAGE_FLUSH_MS = int(os.getenv("STORAGE_FLUSH_MS", "500"))
+STORAGE_JOURNAL_MAX_KB = int(os.getenv("STORAGE_JOURNAL_MAX_KB", "4096"))
+STORAGE_PROFILE_CACHE = int(os.getenv("STORAGE_PROFILE_CACHE", "256"))
 
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger("bromo-bot")
@@ -43,18 +51,23 @@ def load_storage():
             return json.load(f)
     return {}
 def save_storage(data):
-    with open(STORAGE_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-storage = load_storage()
+    # per-key: hanya job/sesi yang berubah yang di-commit, bukan seluruh dokumen
+    data.commit()
+storage = open_store(
+    STORAGE_BACKEND,
+    db_path=STORAGE_DB,
+    json_path=STORAGE_FILE,
+    flush_interval=STORAGE_FLUSH_MS / 1000,
+    journal_max_bytes=STORAGE_JOURNAL_MAX_KB * 1024,
+    profile_cache=STORAGE_PROFILE_CACHE,
+)
 def get_ci(uid: str) -> str:
-    return storage.get(uid, {}).get("ci_session", "")
+    return storage.get_ci(uid)
 def set_ci(uid: str, ci: str):
-    storage.setdefault(uid, {})["ci_session"] = ci
+    storage.set_ci(uid, ci)
     save_storage(storage)
-def get_jobs_store(uid: str) -> dict:
-    storage.setdefault(uid, {})
-    storage[uid].setdefault("jobs", {})
-    return storage[uid]["jobs"]
+def get_jobs_store(uid: str) -> JobsView:
+    return storage.jobs(uid)
 
 # =================== HELPERS ===================
 def parse_date_indo_to_iso(date_str: str) -> str:
@@ -107,15 +120,22 @@ def find_quota_for_date(rows, iso_date: str):
             return {"tanggal_cell": tanggal_text, "quota": quota, "status": status, "iso_date": iso_date, "url": url_detail}
     return None
 
+# transport anonim (tanpa cookie jar) untuk cek kapasitas, sama dengan bot-semeru:
+# retry 3x backoff 0.6 untuk 429/502/503/504, timeout (connect, read) = (7, 12)
+HTTP = AsyncTransport(retries=3, backoff=0.6, timeout=(7, 12))
+
+
 def check_capacity(iso_date: str) -> dict | None:
     year_month = year_month_from_iso(iso_date)
     payload = {"action": "kapasitas", "year_month": year_month, "id_site": ID_SITE}
     headers = {"User-Agent": "Mozilla/5.0"}
-    resp = requests.post(CAP_URL, data=payload, headers=headers, timeout=30)
+    # dipanggil dari thread worker (asyncio.to_thread): request jalan di loop jembatan HTTP
+    resp = HTTP.request_sync("POST", CAP_URL, data=payload, headers=headers)
     log.info(
-        "check_capacity response iso=%s status=%s body=%s",
+        "check_capacity response iso=%s status=%s conns=%d body=%s",
         iso_date,
         resp.status_code,
+        HTTP.connections_opened,
         resp.text,
     )
     soup = BeautifulSoup(resp.text, "lxml")
@@ -123,25 +143,27 @@ def check_capacity(iso_date: str) -> dict | None:
     return find_quota_for_date(rows, iso_date)
 
 def make_session_with_cookies(ci_session: str, extra_cookies: dict | None = None):
-    sess = requests.Session()
-    ua = ('Mozilla/5.0 (Linux; Android 6.0; Nexus 5 Build/MRA58N) '
-          'AppleWebKit/537.36 (KHTML, like Gecko) '
-          'Chrome/139.0.0.0 Mobile Safari/537.36 Edg/139.0.0.0')
-    sess.headers.update({"User-Agent": ua, "Accept": "*/*", "Accept-Language": "id,en;q=0.9,en-GB;q=0.8,en-US;q=0.7"})
-
-    # set cookies per-job
-    if extra_cookies:
-        if extra_cookies.get("_ga"):
-            sess.cookies.set("_ga", extra_cookies["_ga"], domain=".bromotenggersemeru.id", path="/")
-        if extra_cookies.get("_ga_TMVP85FKW9"):
-            sess.cookies.set("_ga_TMVP85FKW9", extra_cookies["_ga_TMVP85FKW9"], domain=".bromotenggersemeru.id", path="/")
-        if extra_cookies.get("ci_session"):
-            sess.cookies.set("ci_session", extra_cookies["ci_session"], domain="bromotenggersemeru.id", path="/")
-
-    # fallback dari user-level (global) jika job-level kosong
-    if ci_session and not sess.cookies.get("ci_session"):
-        sess.cookies.set("ci_session", ci_session, domain="bromotenggersemeru.id", path="/")
-    return sess
+    def setup(sess: requests.Session):
+        ua = ('Mozilla/5.0 (Linux; Android 6.0; Nexus 5 Build/MRA58N) '
+              'AppleWebKit/537.36 (KHTML, like Gecko) '
+              'Chrome/139.0.0.0 Mobile Safari/537.36 Edg/139.0.0.0')
+        sess.headers.update({"User-Agent": ua, "Accept": "*/*", "Accept-Language": "id,en;q=0.9,en-GB;q=0.8,en-US;q=0.7"})
+
+        # set cookies per-job
+        if extra_cookies:
+            if extra_cookies.get("_ga"):
+                sess.cookies.set("_ga", extra_cookies["_ga"], domain=".bromotenggersemeru.id", path="/")
+            if extra_cookies.get("_ga_TMVP85FKW9"):
+                sess.cookies.set("_ga_TMVP85FKW9", extra_cookies["_ga_TMVP85FKW9"], domain=".bromotenggersemeru.id", path="/")
+            if extra_cookies.get("ci_session"):
+                sess.cookies.set("ci_session", extra_cookies["ci_session"], domain="bromotenggersemeru.id", path="/")
+
+        # fallback dari user-level (global) jika job-level kosong
+        if ci_session and not sess.cookies.get("ci_session"):
+            sess.cookies.set("ci_session", ci_session, domain="bromotenggersemeru.id", path="/")
+
+    # session (jar & header) sendiri per flow; koneksi ke server tetap dari pool bersama
+    return CLIENTS.ephemeral(setup)
 
 def add_or_update_members(sess: requests.Session, secret: str, male: int, female: int, id_country: str = "99"):
     if male < 0 or female < 0: return
@@ -680,7 +702,7 @@ def trigger_next_cookie_job(context: ContextTypes.DEFAULT_TYPE, uid: str, curren
     now = datetime.now(ASIA_JAKARTA)
     jobs = get_jobs_store(uid)
     candidates = []
-    for name, rec in jobs.items():
+    for name, rec in jobs.headers().items():
         if name == current_name:
             continue
         if rec.get("cookies") == job_cookies and jq.get_jobs_by_name(name):
@@ -692,7 +714,10 @@ def trigger_next_cookie_job(context: ContextTypes.DEFAULT_TYPE, uid: str, curren
     if not candidates:
         return
     candidates.sort(key=lambda x: x[0])
-    _, next_name, rec = candidates[0]
+    _, next_name, _ = candidates[0]
+    rec = jobs.get(next_name)  # profile baru dibaca untuk job yang benar-benar dijalankan
+    if not rec:
+        return
     for j in jq.get_jobs_by_name(next_name):
         j.schedule_removal()
     jq.run_once(
@@ -752,12 +777,13 @@ async def jobs_list(update: Update, context: ContextTypes.DEFAULT_TYPE):
             if j.name and j.chat_id:
                 live_names.add(j.name)
 
-    names = sorted(jobs_store.keys())
+    headers = jobs_store.headers()  # tanpa profile; nama ketua sudah ada di header
+    names = sorted(headers)
     lines = []
     for i, name in enumerate(names, start=1):
-        rec = jobs_store[name]
+        rec = headers[name]
         status = "AKTIF" if name in live_names else "TIDAK AKTIF"
-        leader = rec['profile'].get('name','-')
+        leader = rec.leader or '-'
         lines.append(
             f"{i}. {name}  [{status}]  "
             f"Booking: {rec['booking_iso']}  Eksekusi: {rec['exec_iso']} {rec['time']}  Ketua: {leader}"
@@ -793,7 +819,7 @@ async def job_detail(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "exec_iso": rec["exec_iso"],
         "time": rec["time"],
         "reminder_minutes": rec.get("reminder_minutes"),
-        "profile": rec["profile"],
+        "profile": rec["profile"].to_dict(),
         "cookies": safe_ck,
         "created_at": rec.get("created_at","-"),
         "chat_id": rec.get("chat_id","-")
@@ -943,10 +969,7 @@ async def job_edit_time(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     # update storage
-    jobs_store.pop(job_name, None)
-    rec["exec_iso"] = exec_iso
-    rec["time"] = hhmm
-    jobs_store[new_name] = rec
+    jobs_store.rename(job_name, new_name, rec.replace(exec_iso=exec_iso, time=hhmm))
     save_storage(storage)
     await update.message.reply_text(f"Job diubah waktunya ✅\nLama: {job_name}\nBaru: {new_name}")
 
@@ -975,7 +998,7 @@ async def job_edit_fields(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     # cookies edit
-    cookies = rec.get("cookies", {}).copy()
+    cookies = dict(rec.get("cookies") or {})
     if "_ga" in kv: cookies["_ga"] = kv["_ga"]
     if "_ga_TMVP85FKW9" in kv: cookies["_ga_TMVP85FKW9"] = kv["_ga_TMVP85FKW9"]
     if "ci_session" in kv: cookies["ci_session"] = kv["ci_session"]
@@ -1012,12 +1035,8 @@ async def job_edit_fields(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(f"Gagal menjadwalkan ulang: {e}")
         return
 
-    jobs_store.pop(job_name, None)
-    rec["booking_iso"] = new_booking_iso
-    rec["profile"] = new_prof
-    rec["cookies"] = cookies
-    rec["reminder_minutes"] = reminder_minutes
-    jobs_store[new_name] = rec
+    jobs_store.rename(job_name, new_name, rec.replace(booking_iso=new_booking_iso, profile=new_prof,
+                                                      cookies=cookies, reminder_minutes=reminder_minutes))
     save_storage(storage)
     await update.message.reply_text(f"Job diupdate ✅\nLama: {job_name}\nBaru: {new_name}")
 
@@ -1059,11 +1078,7 @@ async def job_edit_when(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(f"Gagal menjadwalkan ulang: {e}")
         return
 
-    jobs_store.pop(job_name, None)
-    rec["booking_iso"] = new_booking_iso
-    rec["exec_iso"] = new_exec_iso
-    rec["time"] = hhmm
-    jobs_store[new_name] = rec
+    jobs_store.rename(job_name, new_name, rec.replace(booking_iso=new_booking_iso, exec_iso=new_exec_iso, time=hhmm))
     save_storage(storage)
     await update.message.reply_text(f"Job diubah jadwal & tanggal booking ✅\nLama: {job_name}\nBaru: {new_name}")
 
@@ -1088,7 +1103,7 @@ async def job_update_cookies(update: Update, context: ContextTypes.DEFAULT_TYPE)
         await update.message.reply_text("Job tidak ditemukan.")
         return
 
-    cookies = rec.get("cookies", {}).copy()
+    cookies = dict(rec.get("cookies") or {})
     changed = []
     for k in ["_ga","_ga_TMVP85FKW9","ci_session"]:
         if k in kv:
@@ -1109,9 +1124,7 @@ async def job_update_cookies(update: Update, context: ContextTypes.DEFAULT_TYPE)
         await update.message.reply_text(f"Gagal menjadwalkan ulang: {e}")
         return
 
-    jobs_store.pop(job_name, None)
-    rec["cookies"] = cookies
-    jobs_store[new_name] = rec
+    jobs_store.rename(job_name, new_name, rec.replace(cookies=cookies))
     save_storage(storage)
     await update.message.reply_text(f"Cookies job diupdate ✅ ({', '.join(changed)})\nLama: {job_name}\nBaru: {new_name}")
 
@@ -1158,7 +1171,12 @@ def main():
     ))
 
     app.add_error_handler(on_error)
-    app.run_polling()
+    try:
+        app.run_polling()
+    finally:
+        storage.close()
+        CLIENTS.close()
+        HTTP.close()
 
 if __name__ == "__main__":
     main()
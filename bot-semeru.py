@@ -1,19 +1,21 @@
 import asyncio
+import functools
+import hashlib
+import itertools
 import json
 import logging
 import os
-import random
 import re
+import threading
 import time
-from datetime import datetime, timedelta
-from urllib.parse import parse_qs, urlparse
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlparse
 
 import pytz
 import requests
 from bs4 import BeautifulSoup
 from difflib import get_close_matches
 from dotenv import load_dotenv
-from requests.adapters import HTTPAdapter
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.constants import ParseMode
 from telegram.error import TelegramError
@@ -26,15 +28,25 @@ from telegram.ext import (
     MessageHandler,
     filters,
 )
-from urllib3.util.retry import Retry
 
 from network_opt import (
-    create_optimized_session,
+    AsyncTransport,
+    CLIENTS,
+    CoalescingCache,
+    FormTemplate,
     prewarm_session,
+    retry_after_seconds,
     short_window_aggressive,
     timed_request,
 )
+from cadence import Cadence, RateBudget, nearest_release, parse_release_times
+from clock_sync import ClockSync, track
+from job_index import JobIndex
 from monitor_latency import HOST, monitor_latency_loop, ping_latency
+from models import JobRecord
+from precision import fire_at
+from store import JobsView, open_store
+from timeline import Timeline, TimelineLog, stage
 
 # Setup logging
 logging.basicConfig(
@@ -67,7 +79,22 @@ SEMERU_SITE_ID = "8"  # id_site untuk kapasitas
 SEMERU_SECTOR_ID = "3"  # sesuai dump HTML (penting!)
 SEMERU_SITE_LABEL = "Semeru"
 
-STORAGE_FILE = "storage.json"  # { "<user_id>": {"ci_session": "...", "jobs": {...}} }
+STORAGE_FILE = "storage.json"  # format lama { "<user_id>": {"ci_session": "...", "jobs": {...}} }
+STORAGE_DB = os.getenv("STORAGE_DB", "storage.db")  # SQLite (WAL); STORAGE_FILE dimigrasi sekali ke sini
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "sqlite").strip().lower()  # sqlite | json
+STORAGE_FLUSH_MS = int(os.getenv("STORAGE_FLUSH_MS", "500"))  # backend json: jeda minimal antar flush
+STORAGE_JOURNAL_MAX_KB = int(os.getenv("STORAGE_JOURNAL_MAX_KB", "4096"))  # backend json: 0 = tanpa journal; lewat batas → compaction
+STORAGE_PROFILE_CACHE = int(os.getenv("STORAGE_PROFILE_CACHE", "256"))  # backend sqlite: jumlah profile job di LRU
+CAPACITY_CACHE_TTL = float(os.getenv("CAPACITY_CACHE_TTL", "3"))  # detik; 0 = tanpa cache (request serentak tetap digabung)
+RELEASE_TIMES = parse_release_times(os.getenv("RELEASE_TIMES", "16:00"))  # jam rilis kuota (WIB), pisahkan dengan koma
+POLL_BUDGET_PER_MIN = float(os.getenv("POLL_BUDGET_PER_MIN", "240"))  # batas total request polling per menit
+CLOCK_OFFSET_FILE = os.getenv("CLOCK_OFFSET_FILE", "clock_offset.json")  # riwayat offset jam server per hari
+CLOCK_MAX_UNCERTAINTY = float(os.getenv("CLOCK_MAX_UNCERTAINTY", "1.0"))  # detik; lebih ragu dari ini → pakai jam VPS
+PRECISION_FIRE = os.getenv("PRECISION_FIRE", "1") == "1"  # 1 = request booking pertama tepat di jam eksekusi (spin-wait)
+PRECISION_LEAD_MS = int(os.getenv("PRECISION_LEAD_MS", "400"))  # job dibangunkan sekian ms lebih awal
+PREARM = os.getenv("PREARM", "1") == "1"  # 1 = token booking Semeru disiapkan saat prewarm (T-2 menit)
+PREARM_REVALIDATE_S = int(os.getenv("PREARM_REVALIDATE_S", "45"))  # detik antar validate_booking penjaga token
+BOOKING_TIMELINE_FILE = os.getenv("BOOKING_TIMELINE_FILE", "booking_timeline.jsonl")  # rincian tahapan tiap percobaan booking; kosong = tidak disimpan
 log = logging.getLogger("bromo-semeru-bot")
 
 MONTHS_ID = {
@@ -167,29 +194,38 @@ def load_storage():
 
 
 def save_storage(data):
-    with open(STORAGE_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    # sqlite: commit baris yang berubah; json: tandai dirty, ditulis di thread persister
+    data.commit()
 
 
-storage = load_storage()
+storage = open_store(
+    STORAGE_BACKEND,
+    db_path=STORAGE_DB,
+    json_path=STORAGE_FILE,
+    flush_interval=STORAGE_FLUSH_MS / 1000,
+    journal_max_bytes=STORAGE_JOURNAL_MAX_KB * 1024,
+    profile_cache=STORAGE_PROFILE_CACHE,
+)
 
 # Session cache untuk pre-warming
 PREWARMED_SESSIONS: dict[str, requests.Session] = {}
+# Token booking Semeru yang sudah disiapkan sebelum T0 (lihat prearm_semeru)
+PREARMED: dict[str, dict] = {}
+# Job yang booking-nya sudah ditembak (scheduled_job / watcher): pemicu lain untuk job yang sama mundur
+EXECUTING_JOBS: set[str] = set()
 
 
 def get_ci(uid: str) -> str:
-    return storage.get(uid, {}).get("ci_session", "")
+    return storage.get_ci(uid)
 
 
 def set_ci(uid: str, ci: str):
-    storage.setdefault(uid, {})["ci_session"] = ci
+    storage.set_ci(uid, ci)
     save_storage(storage)
 
 
-def get_jobs_store(uid: str) -> dict:
-    storage.setdefault(uid, {})
-    storage[uid].setdefault("jobs", {})
-    return storage[uid]["jobs"]
+def get_jobs_store(uid: str) -> JobsView:
+    return storage.jobs(uid)
 
 
 # =================== HELPERS ===================
@@ -262,119 +298,237 @@ def get_tokens_from_cnt_page(html: str, debug_name: str = "debug.html"):
     return secret, form_hash, booking
 
 
-def find_quota_for_date(rows, iso_date: str):
-    for tr in rows:
-        tds = tr.find_all("td")
-        if len(tds) < 2:
-            continue
-        tanggal_text = " ".join(tds[0].stripped_strings)
-        try:
-            iso_from_cell = parse_date_indo_to_iso(tanggal_text)
-        except:
-            continue
-        if iso_from_cell == iso_date:
+_CAP_TABLE_RE = re.compile(r"<table\b[^>]*\bclass=[\"'][^\"']*\btable\b.*?</table>", re.S | re.I)
+# "Selasa, 30 September 2025" / "30 September 2025" / "2025-09-30" / "30-09-2025", dikompilasi sekali
+_CELL_DATE_RE = re.compile(
+    r"(?:[^,]*,\s*)?(\d{1,2})\s+(" + "|".join(MONTHS_ID) + r")\s+(\d{4})"
+    r"|(\d{4})-(\d{2})-(\d{2})"
+    r"|(\d{2})-(\d{2})-(\d{4})",
+    re.I,
+)
+_DIGIT_RE = re.compile(r"\d")
+
+
+def _cell_iso(text: str) -> str | None:
+    """Tanggal sel tabel kapasitas → ISO (None bila bukan tanggal); tanpa exception per baris."""
+    m = _CELL_DATE_RE.fullmatch(text.strip())
+    if not m:
+        return None
+    if m.group(1):
+        return f"{m.group(3)}-{MONTHS_ID[m.group(2).lower()]}-{m.group(1).zfill(2)}"
+    if m.group(4):
+        return f"{m.group(4)}-{m.group(5)}-{m.group(6)}"
+    return f"{m.group(9)}-{m.group(8)}-{m.group(7)}"
+
+
+class MonthCapacity:
+    """
+    Snapshot tabel kapasitas satu ``year_month`` (satu POST ``kapasitas``):
+    iso → {"tanggal_cell", "quota", "status"}, dibangun sekali jalan atas semua baris.
+    ``timing``: connect/TTFB request yang menghasilkannya (untuk timeline booking).
+    """
+    __slots__ = ("year_month", "days", "timing")
+
+    def __init__(self, year_month: str, days: dict[str, dict], timing: dict | None = None):
+        self.year_month = year_month
+        self.days = days
+        self.timing = timing
+
+    @classmethod
+    def from_rows(cls, rows, year_month: str = "") -> "MonthCapacity":
+        days: dict[str, dict] = {}
+        for tr in rows:
+            tds = tr.find_all("td", limit=2)
+            if len(tds) < 2:
+                continue
+            tanggal_text = " ".join(tds[0].stripped_strings)
+            iso = _cell_iso(tanggal_text)
+            if iso is None or iso in days:  # baris pertama yang menang, seperti pencarian linear dulu
+                continue
             parts = list(tds[1].stripped_strings)
-            text_combined = " ".join(parts)
-            quota = extract_int(text_combined)
+            quota = extract_int(" ".join(parts))
             first_part = parts[0] if parts else ""
-            if re.search(r"\d", first_part):
+            if _DIGIT_RE.search(first_part):
                 status = "Tersedia" if quota > 0 else "Habis / Tidak tersedia"
             else:
                 status = first_part
-            return {"tanggal_cell": tanggal_text, "quota": quota, "status": status}
-    return None
+            days[iso] = {"tanggal_cell": tanggal_text, "quota": quota, "status": status}
+        return cls(year_month, days)
+
+    @classmethod
+    def parse(cls, html: str, year_month: str = "") -> "MonthCapacity | None":
+        """Dari body respons ``kapasitas``; None bila tabel kapasitas tidak ada (error/maintenance)."""
+        m = _CAP_TABLE_RE.search(html)  # parse potongan tabelnya saja, bukan seluruh halaman
+        rows = BeautifulSoup(m.group(0) if m else html, "lxml").select("table.table tbody tr")
+        if not rows:
+            return None
+        return cls.from_rows(rows, year_month)
+
+    def get(self, iso_date: str) -> dict | None:
+        return self.days.get(iso_date)
+
+    def __contains__(self, iso_date) -> bool:
+        return iso_date in self.days
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def __repr__(self):
+        return f"MonthCapacity({self.year_month!r}, {len(self.days)} hari)"
+
+
+def find_quota_for_date(rows, iso_date: str):
+    return MonthCapacity.from_rows(rows).get(iso_date)
 
 
-def _requests_session_with_retries(total: int = 3, backoff: float = 0.5) -> requests.Session:
+def capacity_digest(html: str, iso_date: str) -> bytes | None:
     """
-    Session requests dengan retry & backoff:
-    - retry untuk connect/read/status 429/502/503/504
-    - allowed_methods: POST & GET
+    Digest 16-byte dari bagian halaman yang menentukan kuota: baris tanggal yang dipantau
+    (kuota + status), atau kalau tanggalnya belum tampil, isi semua baris di bulan yang sama.
+    Token/timestamp lain di halaman tidak ikut → hanya perubahan kuota yang mengubah digest.
+    None bila tabel kapasitas tidak ada (halaman error/maintenance).
     """
-    s = requests.Session()
-    retry = Retry(
-        total=total,
-        connect=total,
-        read=total,
-        status=total,
-        backoff_factor=backoff,
-        status_forcelist=[429, 502, 503, 504],
-        allowed_methods={"GET", "POST"},
-        raise_on_status=False,
-        respect_retry_after_header=True,
-    )
-    adapter = HTTPAdapter(max_retries=retry, pool_connections=10, pool_maxsize=10)
-    s.mount("https://", adapter)
-    s.mount("http://", adapter)
-    return s
+    snap = MonthCapacity.parse(html)
+    if snap is None:
+        return None
+    cap = snap.get(iso_date)
+    if cap:
+        key = f"{iso_date}|{cap['quota']}|{cap['status']}"
+    else:
+        month = year_month_from_iso(iso_date)
+        key = f"{month}|" + "\n".join(
+            f"{iso} {c['quota']} {c['status']}" for iso, c in snap.days.items() if iso.startswith(month)
+        )
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+
+
+# Transport async anonim (tanpa cookie jar) untuk cek kapasitas & lookup grid:
+# retry 3x backoff 0.6 untuk 429/502/503/504, timeout (connect, read) = (7, 12) → responsif saat server lemot
+HTTP = AsyncTransport(retries=3, backoff=0.6, timeout=(7, 12))
+
+
+# Snapshot per (site, year_month): polling & /quota_semeru banyak user berbagi satu request
+CAPACITY_CACHE = CoalescingCache(CAPACITY_CACHE_TTL)
 
+# Offset jam server (dari header Date semua respons situs); kuota dibuka menurut jam server, bukan jam VPS
+SERVER_CLOCK = track(ClockSync(urlparse(BASE).hostname, history_path=CLOCK_OFFSET_FILE))
 
-def check_capacity(iso_date: str, site: str) -> dict | None:
+# Timeline tiap percobaan booking (connect/TTFB/total per tahap), satu baris JSON per percobaan
+BOOKING_TIMELINES = TimelineLog(BOOKING_TIMELINE_FILE or None)
+
+
+def server_fire_at(run_at: datetime) -> datetime:
+    """Waktu lokal saat jam server menunjukkan ``run_at`` (tanpa geser bila estimasi belum cukup yakin)."""
+    return SERVER_CLOCK.to_local(run_at, CLOCK_MAX_UNCERTAINTY)
+
+
+def exec_wake_at(run_at: datetime) -> datetime:
+    """Kapan JobQueue membangunkan ``scheduled_job``: lebih awal ``PRECISION_LEAD_MS`` pada mode presisi."""
+    at = server_fire_at(run_at)
+    return at - timedelta(milliseconds=PRECISION_LEAD_MS) if PRECISION_FIRE else at
+
+
+def check_capacity(iso_date: str, site: str, timeline: Timeline | None = None) -> dict | None:
+    """Versi sync untuk flow booking lama (hanya dari thread worker, bukan thread event loop): lewat jembatan ``HTTP``.
+    Flow booking butuh angka terbaru → tidak memakai snapshot cache (hanya ikut request yang sedang jalan).
+    ``timeline``: connect/TTFB request kapasitas dicatat ke stage yang sedang terbuka."""
+    snap = HTTP.run_sync(fetch_month_capacity(year_month_from_iso(iso_date), site, fresh=True))
+    if snap is None:
+        return None
+    if timeline is not None and snap.timing:
+        timeline.add_request(**snap.timing)
+    return snap.get(iso_date)
+
+
+async def check_capacity_async(iso_date: str, site: str, fresh: bool = False) -> dict | None:
+    """Kuota satu tanggal (dari snapshot bulanannya). None bila gagal / tanggal tidak ada."""
+    snap = await fetch_month_capacity(year_month_from_iso(iso_date), site, fresh=fresh)
+    return snap.get(iso_date) if snap else None
+
+
+async def fetch_month_capacity(year_month: str, site: str, fresh: bool = False) -> MonthCapacity | None:
+    """
+    Snapshot kapasitas lewat ``CAPACITY_CACHE`` (TTL ``CAPACITY_CACHE_TTL``); pemanggil serentak di loop yang
+    sama untuk (site, year_month) yang sama menunggu satu request. ``fresh``: abaikan snapshot lama.
     """
+    return await CAPACITY_CACHE.get((site, year_month), lambda: _fetch_month_capacity(year_month, site),
+                                    max_age=0 if fresh else None)
+
+
+def capacity_payload(site: str, year_month: str) -> dict:
+    """Form POST ``kapasitas`` untuk satu bulan (poller bersama & watcher halaman view)."""
+    if site == "bromo":
+        site_id = "4"
+    elif site == "semeru":
+        site_id = SEMERU_SITE_ID
+    else:
+        raise ValueError("site harus 'bromo' atau 'semeru'")
+    return {"action": "kapasitas", "id_site": site_id, "year_month": year_month}
+
+
+async def _fetch_month_capacity(year_month: str, site: str) -> MonthCapacity | None:
+    """
+    Satu POST ``kapasitas`` → ``MonthCapacity`` berisi semua tanggal di ``year_month``.
     Aman dari timeout/NetworkError: kalau gagal jaringan → return None (tidak meledak).
     site: 'bromo' | 'semeru'
     """
     try:
-        year_month = iso_date[:7]
-        if site == "bromo":
-            site_id = "4"
-        elif site == "semeru":
-            site_id = "8"
-        else:
-            raise ValueError("site harus 'bromo' atau 'semeru'")
+        payload = capacity_payload(site, year_month)
 
-        payload = {"action": "kapasitas", "id_site": site_id, "year_month": year_month}
-
-        sess = _requests_session_with_retries(total=3, backoff=0.6)
         # header ringan + UA yang sudah kamu pakai
         headers = {
             "User-Agent": "Mozilla/5.0",
             "Accept": "*/*",
         }
 
-        # Timeout tuple: (connect, read) → lebih responsif saat server lemot
-        resp = sess.post(CAP_URL, data=payload, headers=headers, timeout=(7, 12))
+        resp = await HTTP.post(CAP_URL, data=payload, headers=headers)
         log.info(
-            "check_capacity response (%s %s) status=%s body=%s",
+            "check_capacity response (%s %s) status=%s conns=%d cache=%s body=%s",
             site,
-            iso_date,
+            year_month,
             resp.status_code,
+            HTTP.connections_opened,
+            CAPACITY_CACHE.stats,
             resp.text,
         )
         # Bisa saja 200 tapi body kosong → anggap gagal
         if resp.status_code != 200 or not (resp.text or "").strip():
-            log.warning("check_capacity: status=%s, empty=%s, site=%s, iso=%s",
-                        resp.status_code, not bool((resp.text or '').strip()), site, iso_date)
+            log.warning("check_capacity: status=%s, empty=%s, site=%s, month=%s",
+                        resp.status_code, not bool((resp.text or '').strip()), site, year_month)
             return None
 
-        soup = BeautifulSoup(resp.text, "lxml")
-        rows = soup.select("table.table tbody tr")
-        return find_quota_for_date(rows, iso_date)
+        snap = MonthCapacity.parse(resp.text, year_month)
+        if snap is not None:
+            snap.timing = resp.extensions.get("timing")
+        return snap
     except Exception as e:
         # Tangkap semua error jaringan/parse supaya tidak crash handler lain
-        log.warning("check_capacity error (%s %s): %s", site, iso_date, e)
+        log.warning("check_capacity error (%s %s): %s", site, year_month, e)
         return None
 
 
 def make_session_with_cookies(ci_session: str, extra_cookies: dict | None = None):
-    sess = create_optimized_session()
-    ua = ('Mozilla/5.0 (Linux; Android 6.0; Nexus 5 Build/MRA58N) '
-          'AppleWebKit/537.36 (KHTML, like Gecko) '
-          'Chrome/139.0.0.0 Mobile Safari/537.36 Edg/139.0.0.0')
-    sess.headers.update({"User-Agent": ua, "Accept": "*/*", "Accept-Language": "id,en;q=0.9,en-GB;q=0.8,en-US;q=0.7"})
-    # per-job cookies
-    if extra_cookies:
-        if extra_cookies.get("_ga"):
-            sess.cookies.set("_ga", extra_cookies["_ga"], domain=".bromotenggersemeru.id", path="/")
-        if extra_cookies.get("_ga_TMVP85FKW9"):
-            sess.cookies.set("_ga_TMVP85FKW9", extra_cookies["_ga_TMVP85FKW9"], domain=".bromotenggersemeru.id",
-                             path="/")
-        if extra_cookies.get("ci_session"):
-            sess.cookies.set("ci_session", extra_cookies["ci_session"], domain="bromotenggersemeru.id", path="/")
-    # fallback global
-    if ci_session and not sess.cookies.get("ci_session"):
-        sess.cookies.set("ci_session", ci_session, domain="bromotenggersemeru.id", path="/")
-    return sess
+    def setup(sess: requests.Session):
+        ua = ('Mozilla/5.0 (Linux; Android 6.0; Nexus 5 Build/MRA58N) '
+              'AppleWebKit/537.36 (KHTML, like Gecko) '
+              'Chrome/139.0.0.0 Mobile Safari/537.36 Edg/139.0.0.0')
+        sess.headers.update({"User-Agent": ua, "Accept": "*/*",
+                             "Accept-Language": "id,en;q=0.9,en-GB;q=0.8,en-US;q=0.7"})
+        # per-job cookies
+        if extra_cookies:
+            if extra_cookies.get("_ga"):
+                sess.cookies.set("_ga", extra_cookies["_ga"], domain=".bromotenggersemeru.id", path="/")
+            if extra_cookies.get("_ga_TMVP85FKW9"):
+                sess.cookies.set("_ga_TMVP85FKW9", extra_cookies["_ga_TMVP85FKW9"], domain=".bromotenggersemeru.id",
+                                 path="/")
+            if extra_cookies.get("ci_session"):
+                sess.cookies.set("ci_session", extra_cookies["ci_session"], domain="bromotenggersemeru.id", path="/")
+        # fallback global
+        if ci_session and not sess.cookies.get("ci_session"):
+            sess.cookies.set("ci_session", ci_session, domain="bromotenggersemeru.id", path="/")
+
+    # session (jar & header) sendiri per pemanggil; koneksi TLS tetap dari pool bersama CLIENTS
+    return CLIENTS.ephemeral(setup)
 
 
 def fetch_districts_by_province(id_province: str, ci_session: str = "", extra_cookies: dict | None = None) -> list[
@@ -530,7 +684,7 @@ def _grid_headers(ci_session: str) -> dict:
     }
 
 
-def get_booking_by_code_api(booking_code: str, ci_session: str) -> dict:
+async def get_booking_by_code_api(booking_code: str, ci_session: str) -> dict:
     """
     Cari 1 row booking di /member/booking/grid pakai server-side search[value]=<kode>.
     Return row dict lengkap (berisi secret, form_hash, field ketua, dll).
@@ -548,7 +702,8 @@ def get_booking_by_code_api(booking_code: str, ci_session: str) -> dict:
         "search[value]": booking_code,
         "search[regex]": "false",
     }
-    r = requests.post(GRID_MEMBER, headers=_grid_headers(ci_session), data=payload, timeout=30)
+    # cookie dikirim lewat header, bukan jar
+    r = await HTTP.post(GRID_MEMBER, headers=_grid_headers(ci_session), data=payload, retries=0, timeout=30)
     r.raise_for_status()
     js = r.json()
     rows = js.get("data") or js.get("aaData") or []
@@ -609,7 +764,7 @@ def _build_website_grid_payload(secret_raw: str, start=0, length=100, search_val
     return data
 
 
-def get_members_by_secret(secret: str, ci_session: str, page_size: int = 200, search_value: str = "") -> tuple[
+async def get_members_by_secret(secret: str, ci_session: str, page_size: int = 200, search_value: str = "") -> tuple[
     list, int]:
     """
     Ambil seluruh anggota dari /website/booking/grid menggunakan secret yang didapat dari grid member.
@@ -618,18 +773,18 @@ def get_members_by_secret(secret: str, ci_session: str, page_size: int = 200, se
     """
     headers = _grid_headers(ci_session)
     headers["referer"] = f"{BASE}/booking/site/semeru"
-    r0 = requests.post(GRID_WEBSITE, headers=headers,
-                       data=_build_website_grid_payload(secret, 0, page_size, search_value),
-                       timeout=30)
+    r0 = await HTTP.post(GRID_WEBSITE, headers=headers,
+                         data=_build_website_grid_payload(secret, 0, page_size, search_value),
+                         retries=0, timeout=30)
     r0.raise_for_status()
     j0 = r0.json()
     total = int(j0.get("recordsTotal", j0.get("iTotalRecords", 0)))
     rows = list(j0.get("data") or j0.get("aaData") or [])
     start = page_size
     while start < total:
-        rx = requests.post(GRID_WEBSITE, headers=headers,
-                           data=_build_website_grid_payload(secret, start, page_size, search_value),
-                           timeout=30)
+        rx = await HTTP.post(GRID_WEBSITE, headers=headers,
+                             data=_build_website_grid_payload(secret, start, page_size, search_value),
+                             retries=0, timeout=30)
         rx.raise_for_status()
         jx = rx.json()
         rows += (jx.get("data") or jx.get("aaData") or [])
@@ -681,39 +836,66 @@ def add_or_update_members_bromo(sess: requests.Session, secret: str, male: int,
         log.warning("anggota_update (Bromo) error: %s", e)
 
 
+def _run_with_timeline(tl: Timeline, run) -> tuple[bool, str, float, dict | None]:
+    """Jalankan flow booking dengan ``tl``; timeline ditutup & disimpan ke ``BOOKING_TIMELINES`` apa pun hasilnya."""
+    result = None
+    try:
+        result = run(tl)
+        return result
+    finally:
+        tl.close(*(result[:2] if result else (False, "exception")))
+        BOOKING_TIMELINES.append(tl)
+
+
 def do_booking_flow_bromo(ci_session: str, iso_date: str, profile: dict,
                           job_cookies: dict | None = None,
-                          sess: requests.Session | None = None) -> tuple[bool, str, float, dict | None]:
+                          sess: requests.Session | None = None,
+                          timeline: Timeline | None = None) -> tuple[bool, str, float, dict | None]:
+    """``timeline``: diisi tahapan percobaan ini (dibuat sendiri bila None); selalu ikut tersimpan."""
+    tl = timeline if timeline is not None else Timeline("bromo")
+    tl.meta.update(iso=iso_date)
+    return _run_with_timeline(tl, lambda t: _booking_flow_bromo(ci_session, iso_date, profile, job_cookies, sess, t))
+
+
+def _booking_flow_bromo(ci_session: str, iso_date: str, profile: dict, job_cookies: dict | None,
+                        sess: requests.Session | None, tl: Timeline) -> tuple[bool, str, float, dict | None]:
     t0 = time.perf_counter()
 
     # ✅ JIT: cek kuota saat eksekusi
-    cap = check_capacity(iso_date, "bromo")
+    with tl.stage("capacity"):
+        cap = check_capacity(iso_date, "bromo", tl)
     if not cap:
         return False, f"Kuota: tanggal {iso_date} tidak ditemukan.", time.perf_counter() - t0, None
     if cap["quota"] <= 0:
         return False, f"Kuota {cap['tanggal_cell']}: {cap['quota']} (Tidak tersedia).", time.perf_counter() - t0, None
 
-    sess = sess or make_session_with_cookies(ci_session, job_cookies)
+    sess = tl.watch(sess or make_session_with_cookies(ci_session, job_cookies))
     referer = build_referer_url(SITE_PATH_BROMO, iso_date)
-    r = sess.get(referer, timeout=30)
+    with tl.stage("token_page"):
+        r = sess.get(referer, timeout=30)
     if r.status_code != 200:
         return False, f"Gagal GET booking page: {r.status_code}", time.perf_counter() - t0, None
     try:
-        secret, form_hash, _ = get_tokens_from_cnt_page(r.text, debug_name="debug_bromo.html")
+        with tl.stage("token_parse"):
+            secret, form_hash, _ = get_tokens_from_cnt_page(r.text, debug_name="debug_bromo.html")
     except Exception as e:
         return False, f"Gagal ekstrak token: {e}", time.perf_counter() - t0, None
 
     sess.headers.update({"X-Requested-With": "XMLHttpRequest", "Origin": BASE, "Referer": referer})
     try:
-        _ = sess.post(ACTION_URL, data={"action": "update_hash", "secret": secret, "form_hash": form_hash}, timeout=30)
-        _ = sess.post(ACTION_URL, data={"action": "validate_booking", "secret": secret, "form_hash": form_hash},
-                      timeout=30)
+        with tl.stage("update_hash"):
+            _ = sess.post(ACTION_URL, data={"action": "update_hash", "secret": secret, "form_hash": form_hash},
+                          timeout=30)
+        with tl.stage("validate_booking"):
+            _ = sess.post(ACTION_URL, data={"action": "validate_booking", "secret": secret, "form_hash": form_hash},
+                          timeout=30)
     except Exception as e:
         return False, f"Gagal update/validate hash: {e}", time.perf_counter() - t0, None
 
     male = int(profile.get("male", "0") or 0)
     female = int(profile.get("female", "0") or 0)
-    add_or_update_members_bromo(sess, secret, male, female, profile.get("id_country", "99"))
+    with tl.stage("member_update"):
+        add_or_update_members_bromo(sess, secret, male, female, profile.get("id_country", "99"))
 
     payload = {
         "action": "do_booking",
@@ -741,7 +923,8 @@ def do_booking_flow_bromo(ci_session: str, iso_date: str, profile: dict,
         "termsCheckbox": "on"
     }
     try:
-        resp = sess.post(ACTION_URL, data=payload, timeout=60)
+        with tl.stage("do_booking"):
+            resp = sess.post(ACTION_URL, data=payload, timeout=60)
     except Exception as e:
         return False, f"Gagal POST do_booking: {e}", time.perf_counter() - t0, None
 
@@ -958,6 +1141,17 @@ def _post_json(sess: requests.Session, url: str, data: dict, timeout: int = 30)
     return False, None, txt
 
 
+def _status_ok(r: requests.Response) -> bool:
+    """HTTP 200 + JSON ``status`` true: server menerima aksi itu, state form-nya sudah terbukti."""
+    if r.status_code != 200 or "json" not in (r.headers.get("Content-Type") or "").lower():
+        return False
+    try:
+        j = r.json()
+    except ValueError:
+        return False
+    return isinstance(j, dict) and bool(j.get("status"))
+
+
 def _member_update_once(sess: requests.Session, secret: str, form_hash: str, m: dict) -> tuple[bool, str]:
     """Kirim 1 anggota. Sukses = server mengembalikan JSON dengan status=True."""
     payload = {
@@ -1023,9 +1217,6 @@ def _prime_tokens_semeru(sess: requests.Session, booking_iso: str) -> tuple[str,
     return secret, (form_hash or ""), booking_obj
 
 
-from http.cookiejar import Cookie
-
-
 def has_cookie(jar: requests.cookies.RequestsCookieJar, name: str, domain: str | None = None,
                path: str | None = None) -> bool:
     for c in jar:
@@ -1131,29 +1322,29 @@ def extract_tokens_from_html(html: str, debug_name: str = "debug_semeru.html"):
 
 
 def _prepare_sem_sess(ci_session: str, job_cookies: dict | None) -> requests.Session:
-    sess = requests.Session()
-    ua = ('Mozilla/5.0 (Linux; Android 6.0; Nexus 5 Build/MRA58N) '
-          'AppleWebKit/537.36 (KHTML, like Gecko) Chrome/139.0.0.0 Mobile Safari/537.36 Edg/139.0.0.0')
-    sess.headers.update({
-        "User-Agent": ua,
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-        "Accept-Language": "id,en;q=0.9,en-GB;q=0.8,en-US;q=0.7",
-        "Connection": "keep-alive",
-    })
+    def setup(sess: requests.Session):
+        ua = ('Mozilla/5.0 (Linux; Android 6.0; Nexus 5 Build/MRA58N) '
+              'AppleWebKit/537.36 (KHTML, like Gecko) Chrome/139.0.0.0 Mobile Safari/537.36 Edg/139.0.0.0')
+        sess.headers.update({
+            "User-Agent": ua,
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+            "Accept-Language": "id,en;q=0.9,en-GB;q=0.8,en-US;q=0.7",
+            "Connection": "keep-alive",
+        })
 
-    COOKIE_DOMAIN = ".bromotenggersemeru.id"
+        COOKIE_DOMAIN = ".bromotenggersemeru.id"
 
-    # gunakan helper aman dari patch sebelumnya:
-    # set_unique_cookie(...) & has_cookie(...)
-    if job_cookies:
-        for ck, val in job_cookies.items():
-            if val:
-                set_unique_cookie(sess.cookies, ck, val, domain=COOKIE_DOMAIN)
+        # gunakan helper aman dari patch sebelumnya:
+        # set_unique_cookie(...) & has_cookie(...)
+        if job_cookies:
+            for ck, val in job_cookies.items():
+                if val:
+                    set_unique_cookie(sess.cookies, ck, val, domain=COOKIE_DOMAIN)
 
-    if ci_session and not has_cookie(sess.cookies, "ci_session"):
-        set_unique_cookie(sess.cookies, "ci_session", ci_session, domain=COOKIE_DOMAIN)
+        if ci_session and not has_cookie(sess.cookies, "ci_session"):
+            set_unique_cookie(sess.cookies, "ci_session", ci_session, domain=COOKIE_DOMAIN)
 
-    return sess
+    return CLIENTS.ephemeral(setup)
 
 
 def _preflight_sem(sess: requests.Session):
@@ -1173,10 +1364,11 @@ def _preflight_sem(sess: requests.Session):
 
 
 # === SEMERU: list & delete existing members ===
-def semeru_list_members(sess: requests.Session, booking_iso: str) -> list[dict]:
+def semeru_list_members(sess: requests.Session, booking_iso: str, strict: bool = False) -> list[dict]:
     """
     Ambil daftar anggota yg sudah tersimpan di server (per sesi/secret & tanggal).
     Return list of rows (id, identity_no, nama, secret, date_depart, dll).
+    ``strict``: error diteruskan, bukan list kosong (list kosong = bukti grid kosong).
     """
     try:
         # Banyak implementasi CI/DataTables cukup pakai draw/start/length.
@@ -1206,6 +1398,8 @@ def semeru_list_members(sess: requests.Session, booking_iso: str) -> list[dict]:
         return out
     except Exception as e:
         log.warning("semeru_list_members error: %s", e)
+        if strict:
+            raise
         return []
 
 
@@ -1224,32 +1418,12 @@ def semeru_member_delete(sess: requests.Session, secret: str, member_id: str) ->
     return False, (raw[:160] + "…")
 
 
-def do_booking_flow_semeru(
-    ci_session: str,
-    booking_iso: str,
-    leader: dict,
-    members: list,
-    job_cookies: dict | None = None,
-    sess: requests.Session | None = None
-) -> tuple[bool, str, float, dict | None]:
-    t0 = time.perf_counter()
-    logger = globals().get("log") or logging.getLogger("booking-semeru")
-    logger.warning("Tanggal berangkat (ISO): %s", booking_iso)
-
-    safe_members = [m for m in (members or []) if (m.get("nama") or "").strip()]
-    if len(safe_members) == 0:
-        return False, "Form SEMERU wajib minimal 1 anggota (ketua + 1).", time.perf_counter()-t0, None
-
-    # ——— Cek kuota
-    cap = check_capacity(booking_iso, "semeru")
-    if not cap:
-        return False, f"Kuota: tanggal {booking_iso} tidak ditemukan.", time.perf_counter()-t0, None
-    if cap["quota"] <= 0:
-        return False, f"Kuota {cap['tanggal_cell']}: {cap['quota']} (Tidak tersedia).", time.perf_counter()-t0, None
-
-    # ——— Session & cookies (fresh jar)
-    def _new_session():
-        s = create_optimized_session()
+def semeru_flow_session(ci_session: str, job_cookies: dict | None) -> requests.Session:
+    """
+    Session flow booking Semeru: session & jar baru per percobaan (berisi cookie job), di atas pool koneksi
+    CLIENTS. Flow yang jalan bersamaan di thread lain tidak berbagi jar/header dengannya.
+    """
+    def _setup(s: requests.Session):
         ua = ('Mozilla/5.0 (Linux; Android 6.0; Nexus 5 Build/MRA58N) '
               'AppleWebKit/537.36 (KHTML, like Gecko) Chrome/139.0.0.0 Mobile Safari/537.36 Edg/139.0.0.0')
         s.headers.update({
@@ -1268,18 +1442,22 @@ def do_booking_flow_semeru(
             _set("ci_session", job_cookies.get("ci_session"))
         if ci_session and not (job_cookies or {}).get("ci_session"):
             _set("ci_session", ci_session)
-        return s
 
-    sess = sess or _new_session()
+    return CLIENTS.ephemeral(_setup)
+
 
-    def _prime_secret(sess_obj: requests.Session) -> tuple[str, str]:
-        # preflight ringan
+def semeru_prime_tokens(sess_obj: requests.Session, booking_iso: str,
+                        timeline: Timeline | None = None) -> tuple[str, str]:
+    """Buka halaman booking Semeru, ambil (secret, form_hash), lalu update_hash (+ validate_booking bila perlu)."""
+    # preflight ringan
+    with stage(timeline, "preflight"):
         for url in (f"{BASE}/", f"{BASE}/peraturan/semeru"):
             try: sess_obj.get(url, timeout=15)
             except Exception: pass
-        # cache-busting
-        ts = int(time.time()*1000)
-        referer = f"{BASE}{SITE_PATH_SEMERU}?date_depart={booking_iso}&t={ts}"
+    # cache-busting
+    ts = int(time.time()*1000)
+    referer = f"{BASE}{SITE_PATH_SEMERU}?date_depart={booking_iso}&t={ts}"
+    with stage(timeline, "token_page"):
         r = sess_obj.get(
             referer, timeout=30,
             headers={
@@ -1289,26 +1467,115 @@ def do_booking_flow_semeru(
                 "Pragma": "no-cache",
             },
         )
-        if r.status_code != 200:
-            raise RuntimeError(f"Gagal GET page: HTTP {r.status_code}")
+    if r.status_code != 200:
+        raise RuntimeError(f"Gagal GET page: HTTP {r.status_code}")
+    with stage(timeline, "token_parse"):
         secret, form_hash, _ = extract_tokens_from_html(r.text, debug_name="debug_semeru.html")
-        # siapkan AJAX headers utk POST
-        sess_obj.headers.update({
-            "X-Requested-With": "XMLHttpRequest",
-            "Origin": BASE,
-            "Referer": referer,
-        })
-        # update_hash + validate
-        sess_obj.post(ACTION_URL, data={"action":"update_hash","secret":secret,"form_hash":form_hash or ""}, timeout=30)
-        sess_obj.post(ACTION_URL, data={"action":"validate_booking","secret":secret,"form_hash":form_hash or ""}, timeout=30)
-        return secret, (form_hash or "")
+    # siapkan AJAX headers utk POST
+    sess_obj.headers.update({
+        "X-Requested-With": "XMLHttpRequest",
+        "Origin": BASE,
+        "Referer": referer,
+    })
+    # update_hash; validate_booking hanya bila jawabannya belum membuktikan token diterima
+    with stage(timeline, "update_hash"):
+        r = sess_obj.post(ACTION_URL, data={"action":"update_hash","secret":secret,"form_hash":form_hash or ""}, timeout=30)
+    if not _status_ok(r):
+        with stage(timeline, "validate_booking"):
+            sess_obj.post(ACTION_URL, data={"action":"validate_booking","secret":secret,"form_hash":form_hash or ""}, timeout=30)
+    return secret, (form_hash or "")
 
-    def _add_member(sess_obj: requests.Session, secret: str, form_hash: str, idx: int, m: dict) -> tuple[bool, str]:
-        payload = {
+
+def semeru_cleanup_members(sess: requests.Session, booking_iso: str, secret: str, form_hash: str, logger) -> int:
+    """
+    Hapus anggota yang sudah terdaftar di secret/tanggal ini (sisa percobaan sebelumnya); return jumlah terhapus.
+    validate_booking hanya dikirim bila ada member_delete yang tidak dijawab status=true.
+    Grid yang terbaca & habis terhapus dicatat di ``SEMERU_SECRET_MEMBERS`` (secret ini boleh lewati cleanup).
+    """
+    deleted = 0
+    clean = False
+    try:
+        existing = semeru_list_members(sess, booking_iso, strict=True)
+        to_del = [row for row in existing if row.get("date_depart") == booking_iso]
+        if to_del:
+            logger.info("Ditemukan %d anggota existing → hapus dulu", len(to_del))
+            for row in to_del:
+                row_secret = row.get("secret") or secret
+                okdel, msgdel = semeru_member_delete(sess, row_secret, row["id"])
+                logger.info("Del member id=%s (%s) → %s (%s)", row["id"], row.get("nama"), "OK" if okdel else "FAIL", msgdel)
+                deleted += okdel
+                time.sleep(0.15)
+            if deleted < len(to_del):
+                try:
+                    sess.post(ACTION_URL, data={"action":"validate_booking","secret":secret,"form_hash":form_hash or ""}, timeout=20)
+                except Exception:
+                    pass
+        clean = deleted == len(to_del)
+    except Exception as e:
+        logger.warning("Cleanup existing members gagal: %s", e)
+    if clean:
+        _remember_secret_members(secret, 0)
+    else:
+        _forget_secret_members(secret)  # belum terbukti kosong: percobaan berikutnya cleanup lagi
+    return deleted
+
+
+def _semeru_safe_members(members) -> list:
+    return [m for m in (members or []) if (m.get("nama") or "").strip()]
+
+
+class SemeruPayloads:
+    """Body POST ``do_booking`` + ``member_update`` per anggota, dikompilasi sekali dari profile job."""
+    __slots__ = ("booking", "members")
+
+    SLOTS = ("secret", "form_hash")
+
+    def __init__(self, booking: FormTemplate, members: list[FormTemplate]):
+        self.booking = booking
+        self.members = members
+
+
+def compile_semeru_payloads(booking_iso: str, leader: dict, members: list) -> SemeruPayloads:
+    """Susun & url-encode payload booking Semeru saat penjadwalan; di T0 tinggal isi secret/form_hash."""
+    try:
+        arr_iso = (datetime.fromisoformat(booking_iso) + timedelta(days=1)).date().isoformat()
+    except Exception:
+        arr_iso = booking_iso
+    bank_norm = {"qris":"qris","va-mandiri":"VA-Mandiri","va-bni":"VA-BNI"} \
+        .get((leader.get("bank") or "qris").strip().lower(), "qris")
+    bp = {
+        "action": "do_booking",
+        "secret": None,
+        "form_hash": None,
+        "id_sector": SEMERU_SECTOR_ID,
+        "id_site":   SEMERU_SITE_ID,
+        "site":      SEMERU_SITE_LABEL,
+        "date_depart": booking_iso,
+        "date_arrival": arr_iso,
+        "pendamping":     leader.get("pendamping","0"),
+        "organisasi":     leader.get("organisasi",""),
+        "name":           leader.get("name",""),
+        "id_country":     leader.get("id_country","99"),
+        "birthdate":      leader.get("birthdate",""),
+        "leader_setuju":  leader.get("leader_setuju","1"),
+        "id_gender":      leader.get("id_gender","1"),
+        "id_identity":    leader.get("id_identity","1"),
+        "identity_no":    leader.get("identity_no",""),
+        "address":        leader.get("address",""),
+        "id_province":    leader.get("id_province",""),
+        "id_district":    leader.get("id_district",""),
+        "hp":             leader.get("hp",""),
+        "table-member_length": "10",
+        "bank": bank_norm,
+        "termsCheckbox": "on",
+    }
+    member_forms = []
+    for m in _semeru_safe_members(members):
+        member_forms.append(FormTemplate({
             "action": "member_update",
             "id": "",
-            "secret": secret,
-            "form_hash": form_hash or "",
+            "secret": None,
+            "form_hash": None,
             "nama": m.get("nama",""),
             "birthdate": m.get("birthdate",""),
             "anggota_setuju": m.get("anggota_setuju","1"),
@@ -1320,167 +1587,279 @@ def do_booking_flow_semeru(
             "hp_keluarga": m.get("hp_keluarga",""),
             "id_job": m.get("id_job","6"),
             "id_country": m.get("id_country","99"),
-        }
-        r = sess_obj.post(ACTION_URL, data=payload, timeout=30)
-        ct = (r.headers.get("Content-Type") or "").lower()
-        if "json" in ct:
+        }, SemeruPayloads.SLOTS))
+    return SemeruPayloads(FormTemplate(bp, SemeruPayloads.SLOTS), member_forms)
+
+
+def do_booking_flow_semeru(
+    ci_session: str,
+    booking_iso: str,
+    leader: dict,
+    members: list,
+    job_cookies: dict | None = None,
+    sess: requests.Session | None = None,
+    armed: dict | None = None,
+    payloads: SemeruPayloads | None = None,
+    timeline: Timeline | None = None,
+) -> tuple[bool, str, float, dict | None]:
+    """``timeline``: diisi tahapan percobaan ini (dibuat sendiri bila None); selalu ikut tersimpan."""
+    tl = timeline if timeline is not None else Timeline("semeru")
+    tl.meta.update(iso=booking_iso, prearmed=armed is not None)
+    return _run_with_timeline(tl, lambda t: _booking_flow_semeru(
+        ci_session, booking_iso, leader, members, job_cookies, sess, armed, payloads, t))
+
+
+# Secret yang grid-nya terbukti kosong (cleanup proses ini) → jumlah anggota yang kita tambahkan sesudahnya.
+# Hanya 0 yang boleh melewati cleanup; secret yang tidak tercatat belum pernah terlihat kosong
+# (anggota sisa proses lain / browser bisa saja ada) → cleanup dulu.
+# Dibaca/ditulis flow di banyak thread worker: akses hanya lewat helper di bawah (``_SECRET_LOCK``).
+SEMERU_SECRET_MEMBERS: dict[str, int] = {}
+SEMERU_SECRET_MEMORY = 512
+_SECRET_LOCK = threading.Lock()
+
+
+def _remember_secret_members(secret: str, count: int):
+    with _SECRET_LOCK:
+        SEMERU_SECRET_MEMBERS.pop(secret, None)
+        SEMERU_SECRET_MEMBERS[secret] = count
+        while len(SEMERU_SECRET_MEMBERS) > SEMERU_SECRET_MEMORY:
+            SEMERU_SECRET_MEMBERS.pop(next(iter(SEMERU_SECRET_MEMBERS)), None)
+
+
+def _forget_secret_members(secret: str):
+    with _SECRET_LOCK:
+        SEMERU_SECRET_MEMBERS.pop(secret, None)
+
+
+def _count_secret_member(secret: str):
+    """Satu anggota masuk ke ``secret`` (hanya dihitung untuk secret yang grid-nya pernah terbukti kosong)."""
+    with _SECRET_LOCK:
+        if secret in SEMERU_SECRET_MEMBERS:
+            SEMERU_SECRET_MEMBERS[secret] += 1
+
+
+def _secret_known_empty(secret: str) -> bool:
+    with _SECRET_LOCK:
+        return SEMERU_SECRET_MEMBERS.get(secret) == 0
+
+
+class SemeruBookingMachine:
+    """
+    Flow booking Semeru sebagai state machine; transisi ditentukan respons server.
+
+        capacity ─kuota ada─▶ prime ─grid belum terbukti kosong─▶ cleanup ─▶ first_member
+                                    └─grid kosong sejak cleanup terakhir─▶ first_member
+        first_member ─OK────────────────────────▶ members ─▶ book
+                     ├─"maksimal 9" (sekali)────▶ reprime ─▶ (seperti prime)
+                     ├─"identitas ganda" (sekali)▶ cleanup
+                     └─lainnya──────────────────▶ book_first ─OK─▶ members (selesai)
+        book / book_first ─"nomor identitas ganda" (sekali)─▶ dedupe ─▶ book
+
+    Pre-armed mulai dari ``first_member``. ``validate_booking`` hanya dikirim selama
+    ``dirty``: sejak validate terakhir ada ``member_update`` yang tidak dijawab status=true
+    (satu gagal di tengah tetap dihitung meski yang terakhir berhasil).
+    ``path`` mencatat state yang dilalui.
+    """
+
+    def __init__(self, ci_session: str, booking_iso: str, job_cookies: dict | None, members: list,
+                 payloads: SemeruPayloads, tl: Timeline, logger, sess: requests.Session | None = None,
+                 armed: dict | None = None):
+        self.ci_session = ci_session
+        self.booking_iso = booking_iso
+        self.job_cookies = job_cookies
+        self.members = members
+        self.payloads = payloads
+        self.tl = tl
+        self.logger = logger
+        self.sess = sess
+        self.secret, self.form_hash = "", ""
+        self.start = "capacity"
+        if armed is not None:
+            # token sudah disiapkan sebelum T0 (prearm_semeru): langsung ke POST anggota & booking
+            self.sess, self.secret, self.form_hash = armed["sess"], armed["secret"], armed["form_hash"]
+            self.start = "first_member"
+        if self.sess is not None:
+            tl.watch(self.sess)
+        self.dirty = False
+        self.added = 0
+        self.fail_msgs: list[str] = []
+        self.ok_do, self.data_do, self.msg_do = False, None, ""
+        self.error: str | None = None  # alasan berhenti sebelum do_booking
+        self.path: list[str] = []
+        self._seen: set[str] = set()
+
+    def run(self) -> "SemeruBookingMachine":
+        state = self.start
+        while state is not None:
+            self.path.append(state)
+            self._seen.add(state)
+            state = getattr(self, f"_{state}")()
+        return self
+
+    # ---------- aksi ----------
+    def _add(self, idx: int) -> tuple[bool, str]:
+        # idx berbasis 1, selaras dengan self.members (payload sudah dikompilasi)
+        body = self.payloads.members[idx - 1].render(secret=self.secret, form_hash=self.form_hash or "")
+        with self.tl.stage(f"member_update#{idx}"):
+            r = self.sess.post(ACTION_URL, data=body, headers=FormTemplate.HEADERS, timeout=30)
+        ok, msg = False, "Respon member_update non-JSON"
+        if "json" in (r.headers.get("Content-Type") or "").lower():
             try:
                 dj = r.json()
             except Exception:
-                return False, "Respon member_update bukan JSON"
-            ok = bool(dj.get("status", False))
-            return ok, str(dj.get("message") or "-")
-        return False, "Respon member_update non-JSON"
+                msg = "Respon member_update bukan JSON"
+            else:
+                ok, msg = bool(dj.get("status", False)), str(dj.get("message") or "-")
+        # satu member_update gagal cukup membuat form diragukan sampai validate_booking berikutnya
+        self.dirty = self.dirty or not ok
+        if ok:
+            _count_secret_member(self.secret)
+        return ok, msg
 
-    def _do_booking(sess_obj: requests.Session, secret: str, form_hash: str) -> tuple[bool, dict | None, str]:
-        try:
-            arr_iso = (datetime.fromisoformat(booking_iso) + timedelta(days=1)).date().isoformat()
-        except Exception:
-            arr_iso = booking_iso
-        bank_norm = {"qris":"qris","va-mandiri":"VA-Mandiri","va-bni":"VA-BNI"} \
-            .get((leader.get("bank") or "qris").strip().lower(), "qris")
-        bp = {
-            "action": "do_booking",
-            "secret": secret,
-            "form_hash": form_hash or "",
-            "id_sector": SEMERU_SECTOR_ID,
-            "id_site":   SEMERU_SITE_ID,
-            "site":      SEMERU_SITE_LABEL,
-            "date_depart": booking_iso,
-            "date_arrival": arr_iso,
-            "pendamping":     leader.get("pendamping","0"),
-            "organisasi":     leader.get("organisasi",""),
-            "name":           leader.get("name",""),
-            "id_country":     leader.get("id_country","99"),
-            "birthdate":      leader.get("birthdate",""),
-            "leader_setuju":  leader.get("leader_setuju","1"),
-            "id_gender":      leader.get("id_gender","1"),
-            "id_identity":    leader.get("id_identity","1"),
-            "identity_no":    leader.get("identity_no",""),
-            "address":        leader.get("address",""),
-            "id_province":    leader.get("id_province",""),
-            "id_district":    leader.get("id_district",""),
-            "hp":             leader.get("hp",""),
-            "table-member_length": "10",
-            "bank": bank_norm,
-            "termsCheckbox": "on",
-        }
-        r = sess_obj.post(ACTION_URL, data=bp, timeout=60)
+    def _book_once(self):
+        body = self.payloads.booking.render(secret=self.secret, form_hash=self.form_hash or "")
+        with self.tl.stage("do_booking"):
+            r = self.sess.post(ACTION_URL, data=body, headers=FormTemplate.HEADERS, timeout=60)
         ct = (r.headers.get("Content-Type") or "").lower()
         if "json" not in ct:
-            return False, None, f"Respon non-JSON do_booking: {r.text[:400]}"
+            self.ok_do, self.data_do, self.msg_do = False, None, f"Respon non-JSON do_booking: {r.text[:400]}"
+            return
         try:
             dj = r.json()
         except Exception:
-            return False, None, f"Respon do_booking tak bisa JSON: {r.text[:400]}"
-        return bool(dj.get("status")), dj, str(dj.get("message") or "-")
+            self.ok_do, self.data_do, self.msg_do = False, None, f"Respon do_booking tak bisa JSON: {r.text[:400]}"
+            return
+        self.ok_do, self.data_do, self.msg_do = bool(dj.get("status")), dj, str(dj.get("message") or "-")
 
-    # ——— PRIME secret pertama
-    try:
-        secret, form_hash = _prime_secret(sess)
-        logger.info("Token OK: secret_len=%d, form_hash_len=%d", len(secret or ""), len(form_hash or ""))
-    except Exception as e:
-        return False, f"Gagal ekstrak token: {e}", time.perf_counter()-t0, None
+    def _validate(self):
+        try:
+            with self.tl.stage("validate_booking"):
+                r = self.sess.post(ACTION_URL, data={"action": "validate_booking", "secret": self.secret,
+                                                     "form_hash": self.form_hash or ""}, timeout=20)
+            self.dirty = not _status_ok(r)
+        except Exception:
+            pass
 
-    # === Bersihkan anggota yang sudah terdaftar di secret/tanggal ini ===
-    try:
-        existing = semeru_list_members(sess, booking_iso)
-        to_del = [row for row in existing if row.get("date_depart") == booking_iso]
-        if to_del:
-            logger.info("Ditemukan %d anggota existing → hapus dulu", len(to_del))
-            for row in to_del:
-                row_secret = row.get("secret") or secret
-                okdel, msgdel = semeru_member_delete(sess, row_secret, row["id"])
-                logger.info("Del member id=%s (%s) → %s (%s)", row["id"], row.get("nama"), "OK" if okdel else "FAIL", msgdel)
-                time.sleep(0.15)
-            try:
-                sess.post(ACTION_URL, data={"action":"validate_booking","secret":secret,"form_hash":form_hash or ""}, timeout=20)
-            except Exception:
-                pass
-    except Exception as e:
-        logger.warning("Cleanup existing members gagal: %s", e)
+    def _after_prime(self) -> str:
+        self.logger.info("Token OK: secret_len=%d, form_hash_len=%d", len(self.secret or ""), len(self.form_hash or ""))
+        return "first_member" if _secret_known_empty(self.secret) else "cleanup"
 
-    # ——— Coba tambah 1 anggota dulu
-    first_add_msg = ""
-    ok_first, msg_first = _add_member(sess, secret, form_hash, 1, safe_members[0])
-    if ok_first:
-        first_add_msg = "OK"
-    else:
-        first_add_msg = msg_first
-        logger.warning("[member 1] server warn: %s", msg_first)
+    # ---------- state ----------
+    def _capacity(self):
+        # dilewati bila pre-armed: di T0 kuota baru saja dibuka, server yang menolak bila belum
+        with self.tl.stage("capacity"):
+            cap = check_capacity(self.booking_iso, "semeru", self.tl)
+        if not cap:
+            self.error = f"Kuota: tanggal {self.booking_iso} tidak ditemukan."
+            return None
+        if cap["quota"] <= 0:
+            self.error = f"Kuota {cap['tanggal_cell']}: {cap['quota']} (Tidak tersedia)."
+            return None
+        return "prime"
 
-    # ——— Jika langsung "Maksimal 9 anggota" → re-prime secret sekali
-    if (not ok_first) and ("maksimal 9" in msg_first.lower()):
+    def _prime(self):
+        if self.sess is None:
+            self.sess = self.tl.watch(semeru_flow_session(self.ci_session, self.job_cookies))
         try:
-            sess = _new_session()
-            secret, form_hash = _prime_secret(sess)
-            ok_first, msg_first = _add_member(sess, secret, form_hash, 1, safe_members[0])
-            logger.warning("Re-prime secret → add member 1: %s (%s)", "OK" if ok_first else "FAIL", msg_first)
+            self.secret, self.form_hash = semeru_prime_tokens(self.sess, self.booking_iso, self.tl)
         except Exception as e:
-            logger.warning("Re-prime gagal: %s", e)
+            self.error = f"Gagal ekstrak token: {e}"
+            return None
+        return self._after_prime()
 
-    added = 0
-    fail_msgs: list[str] = []
+    def _reprime(self):
+        # secret sudah penuh anggota orang lain/percobaan lama → session & secret baru
+        try:
+            self.sess = self.tl.watch(semeru_flow_session(self.ci_session, self.job_cookies))
+            self.secret, self.form_hash = semeru_prime_tokens(self.sess, self.booking_iso, self.tl)
+        except Exception as e:
+            self.logger.warning("Re-prime gagal: %s", e)
+            return "book_first"
+        return self._after_prime()
+
+    def _cleanup(self):
+        with self.tl.stage("cleanup"):
+            semeru_cleanup_members(self.sess, self.booking_iso, self.secret, self.form_hash, self.logger)
+        return "first_member"
 
-    if ok_first:
-        added += 1
-        # Jalur A: tambah sisa anggota (2..9) lalu do_booking
-        for i, m in enumerate(safe_members[1:9], start=2):
-            ok_m, msg_m = _add_member(sess, secret, form_hash, i, m)
+    def _first_member(self):
+        ok, msg = self._add(1)
+        if ok:
+            self.added += 1
+            return "members"
+        self.logger.warning("[member 1] server warn: %s", msg)
+        low = msg.lower()
+        if "maksimal 9" in low and "reprime" not in self._seen:
+            return "reprime"
+        if "identitas ganda" in low and "cleanup" not in self._seen:
+            return "cleanup"  # sisa anggota yang belum kita ketahui (proses lama / browser)
+        return "book_first"
+
+    def _members(self):
+        for i in range(2, min(len(self.members), 9) + 1):
+            ok_m, msg_m = self._add(i)
             if ok_m:
-                added += 1
+                self.added += 1
             else:
-                fail_msgs.append(f"#{i}: {msg_m}")
-                logger.warning("[member %s] server warn: %s", i, msg_m)
+                self.fail_msgs.append(f"#{i}: {msg_m}")
+                self.logger.warning("[member %s] server warn: %s", i, msg_m)
                 if "maksimal 9" in msg_m.lower():
                     break
             time.sleep(0.2)
-        try:
-            sess.post(ACTION_URL, data={"action": "validate_booking", "secret": secret, "form_hash": form_hash or ""}, timeout=20)
-        except Exception:
-            pass
-        ok_do, data_do, msg_do = _do_booking(sess, secret, form_hash)
-    else:
-        # Jalur B: do_booking dulu (ketua + Anggota 1), baru tambah sisa
-        ok_do, data_do, msg_do = _do_booking(sess, secret, form_hash)
-        if not ok_do and "minimal 2" in msg_do.lower():
-            ok_retry, msg_retry = _add_member(sess, secret, form_hash, 1, safe_members[0])
-            logger.warning("Fallback add first member → %s (%s)", "OK" if ok_retry else "FAIL", msg_retry)
-            ok_do, data_do, msg_do = _do_booking(sess, secret, form_hash)
-        if ok_do:
-            for i, m in enumerate(safe_members[1:9], start=2):
-                ok_m, msg_m = _add_member(sess, secret, form_hash, i, m)
-                if ok_m:
-                    added += 1
-                else:
-                    fail_msgs.append(f"#{i}: {msg_m}")
-                    logger.warning("[member %s] server warn: %s", i, msg_m)
-                    if "maksimal 9" in msg_m.lower():
-                        break
-                time.sleep(0.2)
-            try:
-                sess.post(ACTION_URL, data={"action": "validate_booking", "secret": secret, "form_hash": form_hash or ""}, timeout=20)
-            except Exception:
-                pass
+        if self.dirty:
+            self._validate()
+        return None if self.ok_do else "book"
+
+    def _book(self):
+        self._book_once()
+        return self._after_book()
+
+    def _book_first(self):
+        # do_booking dulu (ketua + Anggota 1), baru tambah sisa
+        self._book_once()
+        if not self.ok_do and "minimal 2" in self.msg_do.lower():
+            ok_retry, msg_retry = self._add(1)
+            self.logger.warning("Fallback add first member → %s (%s)", "OK" if ok_retry else "FAIL", msg_retry)
+            self._book_once()
+        if self.ok_do:
+            return "members"
+        return self._after_book()
+
+    def _after_book(self):
+        if not self.ok_do and "nomor identitas ganda" in self.msg_do.lower() and "dedupe" not in self._seen:
+            return "dedupe"
+        return None
 
-    # ——— Error handling khusus duplikat identitas
-    if not ok_do:
-        if "nomor identitas ganda" in msg_do.lower():
-            logger.warning("Deteksi duplikat identitas → cleanup & retry sekali")
-            try:
-                existing = semeru_list_members(sess, booking_iso)
-                for row in existing:
-                    if row.get("date_depart") == booking_iso:
-                        row_secret = row.get("secret") or secret
-                        semeru_member_delete(sess, row_secret, row["id"])
-                        time.sleep(0.1)
-                sess.post(ACTION_URL, data={"action": "validate_booking", "secret": secret, "form_hash": form_hash or ""}, timeout=20)
-            except Exception as e:
-                logger.warning("Cleanup on duplicate fail: %s", e)
-            ok_do, data_do, msg_do = _do_booking(sess, secret, form_hash)
+    def _dedupe(self):
+        self.logger.warning("Deteksi duplikat identitas → cleanup & retry sekali")
+        with self.tl.stage("cleanup"):
+            semeru_cleanup_members(self.sess, self.booking_iso, self.secret, self.form_hash, self.logger)
+        return "book"
 
-        if not ok_do:
-            return False, f"Booking Semeru GAGAL {secret[:12]}...: {msg_do}", time.perf_counter() - t0, (data_do or None)
+
+def _booking_flow_semeru(ci_session: str, booking_iso: str, leader: dict, members: list, job_cookies: dict | None,
+                         sess: requests.Session | None, armed: dict | None, payloads: SemeruPayloads | None,
+                         tl: Timeline) -> tuple[bool, str, float, dict | None]:
+    t0 = time.perf_counter()
+    logger = globals().get("log") or logging.getLogger("booking-semeru")
+    logger.warning("Tanggal berangkat (ISO): %s", booking_iso)
+
+    safe_members = _semeru_safe_members(members)
+    if len(safe_members) == 0:
+        return False, "Form SEMERU wajib minimal 1 anggota (ketua + 1).", time.perf_counter()-t0, None
+    if payloads is None:
+        payloads = compile_semeru_payloads(booking_iso, leader, members)
+
+    machine = SemeruBookingMachine(ci_session, booking_iso, job_cookies, safe_members, payloads, tl, logger,
+                                   sess=sess, armed=armed).run()
+    tl.meta["states"] = machine.path
+    logger.info("[semeru] state: %s", " → ".join(machine.path))
+    if machine.error:
+        return False, machine.error, time.perf_counter() - t0, None
+    if not machine.ok_do:
+        return (False, f"Booking Semeru GAGAL {machine.secret[:12]}...: {machine.msg_do}", time.perf_counter() - t0,
+                (machine.data_do or None))
+    data_do, added, fail_msgs = machine.data_do, machine.added, machine.fail_msgs
 
     # ——— SUKSES → susun pesan dengan KODE BOOKING
     elapsed = time.perf_counter() - t0
@@ -1556,7 +1935,7 @@ async def quota_semeru_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     try:
-        cap = check_capacity(iso_date, "semeru")
+        cap = await check_capacity_async(iso_date, "semeru")
     except Exception as e:
         await update.message.reply_text(f"Gagal cek kuota: {e}")
         return
@@ -1897,14 +2276,39 @@ def parse_hhmmss(s: str) -> tuple[int, int, int]:
     return hh, mm, ss
 
 
+@functools.lru_cache(maxsize=1024)
+def _jakarta_tzinfo(exec_iso: str):
+    # Asia/Jakarta tanpa DST: offset cukup dihitung sekali per tanggal, bukan localize() per job
+    y, M, d = map(int, exec_iso.split("-"))
+    return ASIA_JAKARTA.localize(datetime(y, M, d)).tzinfo
+
+
+def _stored_run_at(rec: dict) -> datetime:
+    hh, mm, ss = parse_hhmmss(rec["time"])
+    y, M, d = map(int, rec["exec_iso"].split("-"))
+    return datetime(y, M, d, hh, mm, ss, tzinfo=_jakarta_tzinfo(rec["exec_iso"]))
+
+
+RUN_AT_UNKNOWN = datetime.max.replace(tzinfo=timezone.utc)  # exec_iso/time rusak → urutan paling akhir
+RUN_AT_MIN = datetime.min.replace(tzinfo=timezone.utc)
+
+
+def _index_run_at(rec: dict) -> datetime:
+    try:
+        return _stored_run_at(rec)
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return RUN_AT_UNKNOWN
+
+
+# Index job terurut run_at (per user + global), dijaga store pada setiap simpan/hapus job
+storage.attach_index(JobIndex(_index_run_at))
+
+
 # Simpan index -> job_name per user agar callback_data pendek
-def _ensure_job_index(context: ContextTypes.DEFAULT_TYPE, uid: str, jobs_store: dict) -> dict[int, str]:
+def _ensure_job_index(context: ContextTypes.DEFAULT_TYPE, uid: str, jobs_store: JobsView) -> dict[int, str]:
     idxmap_all = context.bot_data.setdefault("jobs_index", {})
-    idxmap = {}
-    # urutkan konsisten sesuai tampilan /jobs
-    items = sorted(jobs_store.items(), key=_sort_key)
-    for i, (name, _rec) in enumerate(items, start=1):
-        idxmap[i] = name
+    # urutan konsisten dengan tampilan /jobs
+    idxmap = dict(enumerate(jobs_store.ordered_names(), start=1))
     idxmap_all[uid] = idxmap
     return idxmap
 
@@ -1967,14 +2371,17 @@ async def book_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Dibatalkan.")
         return ConversationHandler.END
     uid = str(update.effective_user.id)
-    ok, msg, elapsed_s, raw = do_booking_flow_bromo(
-        get_ci(uid), context.user_data["booking_iso"], context.user_data["profile"], context.user_data.get("cookies")
+    tl = Timeline("bromo")
+    ok, msg, elapsed_s, raw = await asyncio.to_thread(
+        do_booking_flow_bromo,
+        get_ci(uid), context.user_data["booking_iso"], context.user_data["profile"], context.user_data.get("cookies"),
+        timeline=tl,
     )
     extra = ""
     if raw:
         extra = f"\n\n[Server]\nmessage: {raw.get('message', '-')}\nlink: {raw.get('booking_link') or raw.get('link_redirect') or '-'}"
     await update.message.reply_text(
-        ("✅ " if ok else "❌ ") + msg + f"\n\nWaktu proses: {elapsed_s:.2f} detik" + extra,
+        ("✅ " if ok else "❌ ") + msg + f"\n\nWaktu proses: {elapsed_s:.2f} detik" + _timeline_note(tl) + extra,
         parse_mode=ParseMode.HTML,
         disable_web_page_preview=True,
     )
@@ -2039,101 +2446,264 @@ async def schedule_collect_form(update: Update, context: ContextTypes.DEFAULT_TY
 
 
 # ---------- SCHEDULER SHARED ----------
-async def poll_capacity_job(context: ContextTypes.DEFAULT_TYPE):
-    data = context.job.data or {}
-    uid = str(data["user_id"])
-    site = data["site"]
-    iso = data["iso"]
-    prof = data["profile"]
-    job_cookies = data.get("cookies") or {}
-    chat_id = context.job.chat_id
+# =================== POLLING KAPASITAS BERSAMA ===================
+# Satu poller per (site, year_month); job yang menunggu kuota hanya berlangganan.
+# Jeda antar cek adaptif: rapat (10 s) di jendela rilis 15:55–16:15, renggang (≤ 5 menit) di luar itu,
+# mundur saat server lambat / 429 / 5xx. Semua poller berbagi POLL_BUDGET.
+POLL_BUDGET = RateBudget(POLL_BUDGET_PER_MIN)
+CAPACITY_RELEASE_BEFORE = timedelta(minutes=5)
+CAPACITY_RELEASE_AFTER = timedelta(minutes=15)
+# (site, year_month) -> {job_name: langganan}; isi langganan lihat subscribe_capacity
+CAPACITY_SUBSCRIBERS: dict[tuple[str, str], dict[str, dict]] = {}
+_SUBSCRIBE_SEQ = itertools.count()
 
-    # --- DETEKSI INTERVAL AKTUAL DARI JOB (PTB v21: timedelta) ---
-    actual_interval = 60
-    try:
-        if getattr(context.job, "interval", None):
-            iv = context.job.interval  # timedelta
-            actual_interval = int(iv.total_seconds())
-    except Exception:
-        pass
 
-    # --- PRIORITAS: pakai nilai yang dikirim lewat data, fallback ke interval aktual, lalu default ---
-    interval_seconds = int(data.get("interval_seconds") or actual_interval or 60)
+def _capacity_poller_name(site: str, year_month: str) -> str:
+    return f"cappoll-{site}-{year_month}"
 
-    # Kompatibilitas lama: kalau ada "notify_every" (dalam menit), konversi ke ticks
-    if "notify_every_ticks" in data:
-        notify_every_ticks = max(1, int(data["notify_every_ticks"]))
-    elif "notify_every" in data:
-        # menit -> tick
-        notify_every_ticks = max(1, int((int(data["notify_every"]) * 60) / interval_seconds))
-    else:
-        # default: kirim tiap 5 menit
-        notify_every_ticks = max(1, int(300 / interval_seconds))
 
-    # Batas durasi
-    if "max_ticks" in data:
-        max_ticks = int(data["max_ticks"])
+def _capacity_cadence() -> Cadence:
+    return Cadence(hot=10, far=300, before=CAPACITY_RELEASE_BEFORE, after=CAPACITY_RELEASE_AFTER,
+                   budget=POLL_BUDGET)
+
+
+def _reschedule_in(job, seconds: float):
+    """Majukan/mundurkan tick berikutnya job repeating (interval run_repeating = batas atas)."""
+    job.job.modify(next_run_time=datetime.now(ASIA_JAKARTA) + timedelta(seconds=seconds))
+
+
+def _subscription_order(sub: dict) -> tuple:
+    return sub["priority"], sub["seq"]  # priority kecil duluan, lalu yang berlangganan lebih dulu
+
+
+def subscribe_capacity(jq, job_name: str, *, user_id: str, site: str, iso: str, profile, cookies: dict,
+                       chat_id: int, notify_every_minutes: int = 5, max_minutes: int = 180,
+                       max_ticks: int | None = None, priority: int = 0,
+                       payloads: SemeruPayloads | None = None) -> dict:
+    """
+    Daftarkan job ke poller bersama (site, bulan ``iso``); poller dibuat bila belum ada.
+    Status dikirim tiap ``notify_every_minutes``; berhenti setelah ``max_minutes`` (atau ``max_ticks`` cek).
+    """
+    unsubscribe_capacity(job_name)  # pastikan tidak dobel
+    key = (site, year_month_from_iso(iso))
+    now = datetime.now(ASIA_JAKARTA)
+    sub = {
+        "job_name": job_name,
+        "user_id": str(user_id),
+        "site": site,
+        "iso": iso,
+        "profile": profile,
+        "cookies": cookies or {},
+        "payloads": payloads,
+        "chat_id": chat_id,
+        "notify_every": timedelta(minutes=max(1, int(notify_every_minutes))),
+        "max_ticks": int(max_ticks) if max_ticks is not None else None,
+        "since": now,
+        "deadline": now + timedelta(minutes=int(max_minutes)),
+        "notified_at": None,
+        "priority": priority,
+        "seq": next(_SUBSCRIBE_SEQ),
+        "ticks": 0,
+    }
+    CAPACITY_SUBSCRIBERS.setdefault(key, {})[job_name] = sub
+    poller = _capacity_poller_name(*key)
+    running = jq.get_jobs_by_name(poller)
+    if not running:
+        cadence = _capacity_cadence()
+        first = cadence.next_delay(now, nearest_release(now, RELEASE_TIMES, CAPACITY_RELEASE_AFTER))
+        jq.run_repeating(poll_capacity_month_job, interval=cadence.far, first=first,
+                         name=poller, data={"key": key, "cadence": cadence})
     else:
-        max_minutes = int(data.get("max_minutes", 180))
-        max_ticks = int((max_minutes * 60) / interval_seconds)
+        # poller sudah ada (mungkin sedang renggang, tick berikut s/d cadence.far lagi): pelanggan baru
+        # langsung dicek, bukan menunggu tick terjadwal
+        job = running[0]
+        delay = job.data["cadence"].prompt_delay()
+        if job.next_t is None or job.next_t > now + timedelta(seconds=delay):
+            _reschedule_in(job, delay)
+    return sub
+
+
+def unsubscribe_capacity(job_name: str) -> bool:
+    """Lepas job dari poller; poller tanpa pelanggan berhenti sendiri di tick berikutnya."""
+    for subs in CAPACITY_SUBSCRIBERS.values():
+        if subs.pop(job_name, None) is not None:
+            return True
+    return False
 
-    # Counter tick
-    data["ticks"] = data.get("ticks", 0) + 1
 
-    ci = get_ci(uid)  # fallback global
-    cap = await asyncio.to_thread(check_capacity, iso, site)
+async def poll_capacity_month_job(context: ContextTypes.DEFAULT_TYPE):
+    key = context.job.data["key"]
+    site, year_month = key
+    subs = CAPACITY_SUBSCRIBERS.get(key)
+    if not subs:
+        CAPACITY_SUBSCRIBERS.pop(key, None)
+        context.job.schedule_removal()
+        return
 
-    # Belum ada kuota
-    if (not cap) or (cap["quota"] <= 0):
-        # kirim status sesuai jadwal notifikasi
-        if data["ticks"] % notify_every_ticks == 1:
+    cadence: Cadence = context.job.data["cadence"]
+    t0 = time.perf_counter()
+    snap = await fetch_month_capacity(year_month, site)  # satu request untuk semua pelanggan bulan ini
+    cadence.observe(elapsed=time.perf_counter() - t0, error=snap is None)
+    now = datetime.now(ASIA_JAKARTA)
+    delay = cadence.next_delay(now, nearest_release(now, RELEASE_TIMES, CAPACITY_RELEASE_AFTER))
+
+    ready = []
+    for sub in sorted(subs.values(), key=_subscription_order):
+        sub["ticks"] += 1
+        iso = sub["iso"]
+        cap = snap.get(iso) if snap else None
+        if cap and cap["quota"] > 0:
+            ready.append((sub, cap))
+            continue
+
+        # Belum ada kuota: kirim status sesuai jadwal notifikasi
+        if sub["notified_at"] is None or now - sub["notified_at"] >= sub["notify_every"]:
+            sub["notified_at"] = now
             status = (f"{iso}: tanggal tidak ditemukan"
                       if not cap else f"{cap['tanggal_cell']}\nKuota: {cap['quota']} → {cap['status']}")
             await context.bot.send_message(
-                chat_id,
-                text=f"[Polling {site}] {status} (percobaan {data['ticks']}, interval {interval_seconds}s)"
+                sub["chat_id"],
+                text=f"[Polling {site}] {status} (percobaan {sub['ticks']}, cek berikutnya ~{delay:.0f}s)"
             )
 
-        # Stop bila mencapai batas tick
-        if data["ticks"] >= max_ticks:
-            total_minutes = int((data["ticks"] * interval_seconds) / 60)
+        # Stop bila mencapai batas waktu / jumlah cek
+        if now >= sub["deadline"] or (sub["max_ticks"] is not None and sub["ticks"] >= sub["max_ticks"]):
+            total_minutes = int((now - sub["since"]).total_seconds() / 60)
             await context.bot.send_message(
-                chat_id,
-                text=f"[Polling {site}] Dihentikan setelah ~{total_minutes} menit / {data['ticks']} percobaan. "
+                sub["chat_id"],
+                text=f"[Polling {site}] Dihentikan setelah ~{total_minutes} menit / {sub['ticks']} percobaan. "
                      f"Gunakan /job_edit_time untuk menjadwalkan ulang."
             )
-            context.job.schedule_removal()
-        return
+            subs.pop(sub["job_name"], None)
+
+    if ready:
+        for sub, _ in ready:
+            subs.pop(sub["job_name"], None)
+        context.application.create_task(_dispatch_capacity_bookings(context.bot, ready))
+    if subs:
+        _reschedule_in(context.job, delay)
+
+
+async def _dispatch_capacity_bookings(bot, ready: list[tuple[dict, dict]]):
+    """Kuota ada → eksekusi booking tiap pelanggan berurutan sesuai prioritas (flow cek ulang kuota sendiri)."""
+    for sub, cap in ready:
+        site, iso, prof, chat_id = sub["site"], sub["iso"], sub["profile"], sub["chat_id"]
+        job_cookies = sub["cookies"]
+        ci = get_ci(sub["user_id"])  # fallback global
+        await bot.send_message(chat_id, text=f"[Polling {site}] Kuota tersedia: {cap['quota']} — eksekusi booking sekarang.")
+        tl = Timeline(site, job=sub["job_name"])
+        try:
+            if site == "bromo":
+                ok, msg, elapsed_s, raw = await asyncio.to_thread(
+                    do_booking_flow_bromo, ci, iso, prof, job_cookies=job_cookies, timeline=tl
+                )
+            else:
+                leader = prof.get("_leader", {})
+                members = prof.get("_members", [])
+                ok, msg, elapsed_s, raw = await asyncio.to_thread(
+                    do_booking_flow_semeru,
+                    ci, iso, leader, members,
+                    job_cookies=job_cookies, payloads=sub.get("payloads"), timeline=tl,
+                )
+        except Exception as e:
+            # satu flow gagal tidak boleh menahan pelanggan berikutnya
+            log.exception("Booking dari polling gagal (%s)", sub["job_name"])
+            await bot.send_message(chat_id, text=f"[Polling] ❌ Error: {e}")
+            continue
 
-    # Kuota ada → eksekusi booking dan hentikan polling
-    await context.bot.send_message(chat_id,
-                                   text=f"[Polling {site}] Kuota tersedia: {cap['quota']} — eksekusi booking sekarang.")
-    if site == "bromo":
-        ok, msg, elapsed_s, raw = await asyncio.to_thread(
-            do_booking_flow_bromo, ci, iso, prof, job_cookies=job_cookies
-        )
-    else:
-        leader = prof.get("_leader", {})
-        members = prof.get("_members", [])
-        ok, msg, elapsed_s, raw = await asyncio.to_thread(
-            do_booking_flow_semeru,
-            ci, iso, leader, members,
-            job_cookies=job_cookies,
+        extra = ""
+        if raw:
+            server_msg = raw.get("message", "-")
+            link = raw.get("booking_link") or raw.get("link_redirect") or "-"
+            extra = f"\n[Server]\nmessage: {server_msg}\nlink: {link}"
+        await asyncio.to_thread(_record_timeline, sub["user_id"], sub["job_name"], tl)
+
+        await bot.send_message(
+            chat_id,
+            text=("[Polling] ✅ " if ok else "[Polling] ❌ ") + msg + f"\n\nWaktu proses: {elapsed_s:.2f} detik"
+                 + _timeline_note(tl) + extra,
+            parse_mode=ParseMode.HTML,
+            disable_web_page_preview=True,
         )
 
-    extra = ""
-    if raw:
-        server_msg = raw.get("message", "-")
-        link = raw.get("booking_link") or raw.get("link_redirect") or "-"
-        extra = f"\n[Server]\nmessage: {server_msg}\nlink: {link}"
 
-    await context.bot.send_message(
-        chat_id,
-        text=("[Polling] ✅ " if ok else "[Polling] ❌ ") + msg + f"\n\nWaktu proses: {elapsed_s:.2f} detik" + extra,
-        parse_mode=ParseMode.HTML,
-        disable_web_page_preview=True,
-    )
-    context.job.schedule_removal()
+def prearm_semeru(ci_session: str, booking_iso: str, job_cookies: dict | None, job_name: str) -> dict:
+    """
+    Bagian flow Semeru yang tidak butuh kuota terbuka, dijalankan sebelum T0:
+    session, halaman booking → (secret, form_hash), update_hash + validate, bersihkan anggota lama.
+    Di T0 tinggal POST anggota & do_booking (``do_booking_flow_semeru(..., armed=...)``).
+    """
+    sess = semeru_flow_session(ci_session, job_cookies)
+    tl = Timeline("semeru-prearm", job=job_name, iso=booking_iso)
+    tl.watch(sess)
+    ok = False
+    try:
+        secret, form_hash = semeru_prime_tokens(sess, booking_iso, tl)
+        with tl.stage("cleanup"):
+            semeru_cleanup_members(sess, booking_iso, secret, form_hash, log)
+        ok = True
+    finally:
+        tl.close(ok)
+        BOOKING_TIMELINES.append(tl)
+    return {"sess": sess, "iso": booking_iso, "secret": secret, "form_hash": form_hash,
+            "round_trips": sum(e["requests"] for e in tl.stages) + 1,  # +1: cek kuota di awal flow juga dilewati
+            "checked_at": time.monotonic(), "refreshes": 0}
+
+
+def prearm_revalidate(armed: dict) -> bool:
+    """validate_booking ringan; False bila token/session tampak tidak berlaku (bukan JSON, HTTP ≠ 200)."""
+    try:
+        r = armed["sess"].post(ACTION_URL, data={"action": "validate_booking", "secret": armed["secret"],
+                                                 "form_hash": armed["form_hash"]}, timeout=10)
+    except requests.RequestException:
+        return False
+    return r.status_code == 200 and "json" in (r.headers.get("Content-Type") or "").lower()
+
+
+def take_prearmed(job_name: str) -> dict | None:
+    """Ambil token pre-arm (sekali pakai) bila masih tervalidasi baru-baru ini."""
+    armed = PREARMED.pop(job_name, None)
+    if armed is None or time.monotonic() - armed["checked_at"] > 2 * PREARM_REVALIDATE_S + 10:
+        return None
+    return armed
+
+
+# Penjaga token berhenti sekian detik sebelum job dibangunkan: pre-arm ulang (beberapa round-trip)
+# tidak boleh masih berjalan saat flow T0 memakai token tersebut
+PREARM_CUTOFF = timedelta(seconds=15)
+
+
+def _prearm_fired(context: ContextTypes.DEFAULT_TYPE, job_name: str) -> bool:
+    """True bila job booking sudah ditembak (scheduled_job / watcher) atau dihapus: PREARMED tidak diisi lagi."""
+    return context.job.removed or job_name in EXECUTING_JOBS
+
+
+async def prearm_keepalive_job(context: ContextTypes.DEFAULT_TYPE):
+    data = context.job.data
+    job_name = data["job_name"]
+    armed = PREARMED.get(job_name)
+    run_at = data.get("run_at")
+    if (armed is None or _prearm_fired(context, job_name)
+            or (run_at is not None and datetime.now(ASIA_JAKARTA) >= exec_wake_at(run_at) - PREARM_CUTOFF)):
+        context.job.schedule_removal()
+        return
+    if await asyncio.to_thread(prearm_revalidate, armed):
+        armed["checked_at"] = time.monotonic()
+        return
+    log.warning("[prearm] %s: token tidak valid lagi → siapkan ulang", job_name)
+    if PREARMED.get(job_name) is armed:
+        PREARMED.pop(job_name)  # sampai pre-arm ulang selesai, T0 memakai flow penuh
+    try:
+        # semeru_flow_session memberi session baru: session token lama tidak disentuh
+        fresh = await asyncio.to_thread(prearm_semeru, data["ci_session"], data["iso"], data["cookies"], job_name)
+    except Exception as e:
+        log.warning("[prearm] %s: gagal menyiapkan ulang: %s", job_name, e)
+        return
+    if _prearm_fired(context, job_name):
+        log.info("[prearm] %s: job sudah jalan selama pre-arm ulang, token baru dibuang", job_name)
+        return
+    fresh["refreshes"] = armed["refreshes"] + 1
+    PREARMED[job_name] = fresh
 
 
 async def prewarm_session_job(context: ContextTypes.DEFAULT_TYPE):
@@ -2144,11 +2714,54 @@ async def prewarm_session_job(context: ContextTypes.DEFAULT_TYPE):
     sess = make_session_with_cookies(ci, cookies)
     await asyncio.to_thread(prewarm_session, sess, BASE)
     PREWARMED_SESSIONS[job_name] = sess
+    run_at = data.get("run_at")
+    if PREARM and run_at and data.get("site") == "semeru":
+        try:
+            armed = await asyncio.to_thread(prearm_semeru, ci, data["iso"], cookies, job_name)
+        except Exception as e:
+            log.warning("[prearm] %s gagal, T0 memakai flow penuh: %s", job_name, e)
+        else:
+            PREARMED[job_name] = armed
+            require_jq(context).run_repeating(
+                prearm_keepalive_job, interval=PREARM_REVALIDATE_S, first=PREARM_REVALIDATE_S,
+                last=run_at - timedelta(seconds=5), name=f"arm-{job_name}",
+                data={"job_name": job_name, "ci_session": ci, "iso": data["iso"], "cookies": cookies,
+                      "run_at": run_at})
+            log.info("[prearm] %s siap: %d round-trip dipindah sebelum T0", job_name, armed["round_trips"])
+    if run_at:
+        # prewarm barusan menambah sampel jam server: selaraskan ulang waktu eksekusi
+        wake_at = exec_wake_at(run_at)
+        for j in require_jq(context).get_jobs_by_name(job_name):
+            j.job.modify(next_run_time=wake_at)
+        log.info("[clock] %s dibangunkan %s (%s)", job_name, wake_at.isoformat(timespec="milliseconds"),
+                 SERVER_CLOCK.stats)
+
+
+def _fetch_view(sess: requests.Session, site: str, iso: str, last_digest: bytes | None):
+    """
+    Ambil tabel kapasitas bulan ``iso`` + bandingkan digest kuota dengan tick sebelumnya (jalan di thread,
+    bukan di event loop). GET polos hanya menampilkan bulan default, jadi bulan target diminta seperti poller.
+    Return (digest, changed, response) — response untuk umpan balik ke Cadence.
+    """
+    resp, _, _ = timed_request(sess, "POST", CAP_URL, data=capacity_payload(site, year_month_from_iso(iso)),
+                               timeout=10)
+    digest = capacity_digest(resp.text, iso)
+    return digest, last_digest is not None and digest is not None and digest != last_digest, resp
+
+
+def _view_cadence() -> Cadence:
+    # rapat di sekitar jam eksekusi job, renggang saat masih jauh
+    return Cadence(hot=3, far=15, before=timedelta(seconds=60), after=timedelta(seconds=60), budget=POLL_BUDGET)
 
 
 async def poll_get_view_job(context: ContextTypes.DEFAULT_TYPE):
     data = context.job.data or {}
+    if data.get("triggered"):
+        return  # booking dari tick sebelumnya masih berjalan
     job_name = data.get("job_name")
+    if job_name in EXECUTING_JOBS:
+        context.job.schedule_removal()
+        return
     end_at = data.get("end_at")
     site = data.get("site")
     iso = data.get("iso")
@@ -2163,46 +2776,77 @@ async def poll_get_view_job(context: ContextTypes.DEFAULT_TYPE):
         sess = make_session_with_cookies(ci, cookies)
         PREWARMED_SESSIONS[job_name] = sess
 
-    resp, _, _ = timed_request(sess, "GET", CAP_URL, timeout=10)
-    html = resp.text
-    last_html = data.get("last_html")
+    cadence = data.setdefault("cadence", _view_cadence())
+    # fetch + diff di thread: event loop tetap melayani job & handler lain
+    t0 = time.perf_counter()
+    try:
+        digest, changed, resp = await asyncio.to_thread(_fetch_view, sess, site, iso, data.get("view_digest"))
+    except requests.RequestException as e:
+        log.warning("[watch] %s: %s", job_name, e)
+        digest, changed, resp = None, False, None
+    if context.job.removed or job_name in EXECUTING_JOBS:
+        return  # selama fetch, scheduled_job sudah menembak (atau job dihapus): jangan booking kedua kali
+    if resp is None:
+        cadence.observe(error=True)
+    else:
+        cadence.observe(status=resp.status_code, elapsed=time.perf_counter() - t0,
+                        retry_after=retry_after_seconds(resp.headers.get("Retry-After")))
 
-    if last_html and html != last_html:
-        jq = require_jq(context)
-        for j in jq.get_jobs_by_name(job_name):
-            j.schedule_removal()
-        for j in jq.get_jobs_by_name(f"rem-{job_name}"):
-            j.schedule_removal()
-        context.job.schedule_removal()
+    if changed:
+        data["triggered"] = True
+        EXECUTING_JOBS.add(job_name)
+        try:
+            jq = require_jq(context)
+            for j in jq.get_jobs_by_name(job_name):
+                j.schedule_removal()
+            for j in jq.get_jobs_by_name(f"rem-{job_name}") + jq.get_jobs_by_name(f"arm-{job_name}"):
+                j.schedule_removal()
+            context.job.schedule_removal()
 
-        ci = get_ci(uid)
-        def attempt():
-            if site == "bromo":
-                return do_booking_flow_bromo(ci, iso, prof, job_cookies=cookies, sess=sess)
-            else:
-                leader = prof.get("_leader", {})
-                members = prof.get("_members", [])
-                return do_booking_flow_semeru(ci, iso, leader, members, job_cookies=cookies, sess=sess)
+            ci = get_ci(uid)
+            armed = take_prearmed(job_name)
+            timelines: list[Timeline] = []
 
-        ok, msg, elapsed_s, raw = short_window_aggressive(attempt, attempts=3)
-        extra = ""
-        if raw:
-            server_msg = raw.get("message", "-")
-            link = raw.get("booking_link") or raw.get("link_redirect") or "-"
-            extra = f"\n[Server]\nmessage: {server_msg}\nlink: {link}"
-        await context.bot.send_message(
-            chat_id,
-            text=("[Watch] ✅ " if ok else "[Watch] ❌ ") + msg + f"\n\nWaktu proses: {elapsed_s:.2f} detik" + extra,
-            parse_mode=ParseMode.HTML,
-            disable_web_page_preview=True,
-        )
+            def attempt():
+                nonlocal armed
+                tl = Timeline(site, job=job_name)
+                timelines.append(tl)
+                if site == "bromo":
+                    return do_booking_flow_bromo(ci, iso, prof, job_cookies=cookies, sess=sess, timeline=tl)
+                else:
+                    leader = prof.get("_leader", {})
+                    members = prof.get("_members", [])
+                    use, armed = armed, None  # token pre-arm hanya untuk percobaan pertama
+                    return do_booking_flow_semeru(ci, iso, leader, members, job_cookies=cookies, sess=sess, armed=use,
+                                                  payloads=data.get("payloads"), timeline=tl)
+            # flow booking (blocking + time.sleep antar percobaan) dijalankan off-loop
+            ok, msg, elapsed_s, raw = await asyncio.to_thread(short_window_aggressive, attempt, attempts=3)
+            tl = timelines[-1] if timelines else None
+            await asyncio.to_thread(_record_timeline, uid, job_name, tl)
+            extra = ""
+            if raw:
+                server_msg = raw.get("message", "-")
+                link = raw.get("booking_link") or raw.get("link_redirect") or "-"
+                extra = f"\n[Server]\nmessage: {server_msg}\nlink: {link}"
+            await context.bot.send_message(
+                chat_id,
+                text=("[Watch] ✅ " if ok else "[Watch] ❌ ") + msg + f"\n\nWaktu proses: {elapsed_s:.2f} detik"
+                     + _timeline_note(tl) + extra,
+                parse_mode=ParseMode.HTML,
+                disable_web_page_preview=True,
+            )
+        finally:
+            EXECUTING_JOBS.discard(job_name)
         PREWARMED_SESSIONS.pop(job_name, None)
         return
 
-    data["last_html"] = html
-    context.job.interval = timedelta(seconds=random.uniform(3, 7))
-    if end_at and datetime.now(ASIA_JAKARTA) > end_at:
+    if digest is not None:
+        data["view_digest"] = digest
+    now = datetime.now(ASIA_JAKARTA)
+    if end_at and now > end_at:
         context.job.schedule_removal()
+        return
+    _reschedule_in(context.job, cadence.next_delay(now, data.get("release")))
 
 async def scheduled_job(context: ContextTypes.DEFAULT_TYPE):
     data = context.job.data
@@ -2221,80 +2865,156 @@ async def scheduled_job(context: ContextTypes.DEFAULT_TYPE):
 
     jq = require_jq(context)
     job_name = context.job.name or f"{site}-{uid}-{iso}"
-    for j in jq.get_jobs_by_name(f"view-{job_name}"):
-        j.schedule_removal()
+    if job_name in EXECUTING_JOBS:
+        log.info("[jadwal] %s sudah dieksekusi watcher, dilewati", job_name)
+        return
+    EXECUTING_JOBS.add(job_name)  # tick watcher yang masih menunggu fetch tidak ikut booking
+    try:
+        # penjaga pre-arm ikut berhenti: setelah nama job dilepas dari EXECUTING_JOBS token tidak diisi lagi
+        for j in jq.get_jobs_by_name(f"view-{job_name}") + jq.get_jobs_by_name(f"arm-{job_name}"):
+            j.schedule_removal()
 
-    # ✅ cek kapasitas saat eksekusi
-    cap = await asyncio.to_thread(check_capacity, iso, site)
-    if not cap or cap["quota"] <= 0:
-        # info kondisi saat ini
-        if not cap:
-            await context.bot.send_message(chat_id, text=f"[Jadwal {site}] {iso}: tanggal tidak ditemukan.")
-        else:
-            await context.bot.send_message(chat_id,
-                                           text=f"[Jadwal {site}] {cap['tanggal_cell']}\nKuota: {cap['quota']} → {cap['status']}")
-
-        # aktifkan polling per menit
-        poll_name = f"poll-{job_name}"
-        for j in jq.get_jobs_by_name(poll_name):
-            j.schedule_removal()  # pastikan tidak dobel
-        jq.run_repeating(
-            poll_capacity_job,
-            interval=60,
-            first=60,
-            name=poll_name,
-            data={
-                "user_id": uid,
-                "site": site,
-                "iso": iso,
-                "profile": prof,
-                "cookies": job_cookies,
-
-                # Gunakan kunci yang benar:
-                "interval_seconds": 60,  # sinkron dgn interval run_repeating
-                "notify_every_ticks": 5,  # tiap 5 tick = 5 menit karena interval 60s
-                "max_minutes": 180  # hard stop 3 jam
-                # (opsional) kalau tetap mau gaya lama:
-                # "notify_every": 5,          # menit (handler akan konversi ke ticks)
-                # "max_ticks": 180            # kalau kamu ingin batas tick absolut
-            },
-            chat_id=chat_id
-        )
+        timelines: list[Timeline] = []
+
+        def attempt(sess, armed=None):
+            tl = Timeline(site, job=job_name)
+            timelines.append(tl)
+            if site == "bromo":
+                return do_booking_flow_bromo(ci, iso, prof, job_cookies=job_cookies, sess=sess, timeline=tl)
+            leader = prof.get("_leader", {})
+            members = prof.get("_members", [])
+            return do_booking_flow_semeru(ci, iso, leader, members, job_cookies=job_cookies, sess=sess, armed=armed,
+                                          payloads=data.get("payloads"), timeline=tl)
+
+        run_at = data.get("run_at")
+        sess = PREWARMED_SESSIONS.pop(job_name, None)
+        fire = None
+        if PRECISION_FIRE and run_at:
+            # mode presisi: session sudah siap, request booking pertama dikirim tepat di jam server
+            sess = sess or make_session_with_cookies(ci, job_cookies)
+            armed = take_prearmed(job_name)
+            try:
+                fire, result = await asyncio.wrap_future(
+                    fire_at(server_fire_at(run_at).timestamp(), functools.partial(attempt, sess, armed),
+                            name=f"fire-{job_name}"))
+            except Exception as e:
+                # error jaringan/timeout di T0 (flow tidak menangkap requests.RequestException): tetap lanjut ke
+                # alur cek kuota → booking / polling di bawah
+                log.warning("[fire] %s error: %s", job_name, e)
+                tl = timelines[-1] if timelines else None
+                await asyncio.to_thread(_record_timeline, uid, job_name, tl)
+                await context.bot.send_message(
+                    chat_id, text=f"[Jadwal {site}] Percobaan tepat waktu error: {e}{_timeline_note(tl)}"
+                                  f"\nCek kuota & coba lagi...")
+            else:
+                if armed:
+                    fire["prearm_rt"] = armed["round_trips"]
+                # error_ms diukur saat flow dimulai: catat request apa yang sebenarnya keluar di T0
+                # (tanpa pre-arm itu cek kuota, bukan POST booking)
+                fire["first_request"] = _first_request(timelines[-1])
+                await asyncio.to_thread(_record_fire, uid, job_name, fire)
+                log.info("[fire] %s error=%.3f ms lead=%.1f ms first=%s", job_name, fire["error_ms"], fire["lead_ms"],
+                         fire["first_request"])
+                if result[0]:
+                    await _report_scheduled_result(context, uid, job_name, job_cookies, chat_id, site, result, fire,
+                                                   timelines[-1])
+                    return
+                # gagal (mis. kuota belum terbuka di detik itu): lanjut alur biasa cek kuota → booking / polling
+                await asyncio.to_thread(_record_timeline, uid, job_name, timelines[-1])
+                await context.bot.send_message(
+                    chat_id, text=f"[Jadwal {site}] Percobaan tepat waktu gagal ({fire['error_ms']:+.3f} ms): {result[1]}"
+                                  f"{_timeline_note(timelines[-1])}\nCek kuota & coba lagi...")
+
+        # ✅ cek kapasitas saat eksekusi
+        cap = await check_capacity_async(iso, site, fresh=True)
+        if not cap or cap["quota"] <= 0:
+            # info kondisi saat ini
+            if not cap:
+                await context.bot.send_message(chat_id, text=f"[Jadwal {site}] {iso}: tanggal tidak ditemukan.")
+            else:
+                await context.bot.send_message(chat_id,
+                                               text=f"[Jadwal {site}] {cap['tanggal_cell']}\nKuota: {cap['quota']} → {cap['status']}")
+
+            # aktifkan polling per menit (poller bersama per bulan)
+            subscribe_capacity(
+                jq, job_name,
+                user_id=uid, site=site, iso=iso, profile=prof, cookies=job_cookies, chat_id=chat_id,
+                notify_every_minutes=5,
+                max_minutes=180,  # hard stop 3 jam
+                payloads=data.get("payloads"),
+            )
 
-        await context.bot.send_message(chat_id, text=f"[Jadwal {site}] Polling per menit diaktifkan (max 3 jam).")
+            await context.bot.send_message(chat_id, text=f"[Jadwal {site}] Polling kuota diaktifkan (adaptif sekitar jam rilis, max 3 jam).")
+            return
+
+        # kalau kuota tersedia langsung eksekusi seperti biasa
+        await context.bot.send_message(chat_id,
+                                       text=f"[Jadwal {site}] {cap['tanggal_cell']}\nKuota: {cap['quota']} → {cap['status']}")
+        result = await asyncio.to_thread(attempt, sess, take_prearmed(job_name))
+        await _report_scheduled_result(context, uid, job_name, job_cookies, chat_id, site, result, fire, timelines[-1])
+    finally:
+        # selesai (booking, gagal, atau diserahkan ke polling): nama job boleh dipakai lagi
+        EXECUTING_JOBS.discard(job_name)
+
+
+def _record_fire(uid: str, job_name: str, fire: dict):
+    """Simpan error penembakan presisi terakhir di record job (tampil di /job_detail)."""
+    jobs = get_jobs_store(uid)
+    rec = jobs.get(job_name)
+    if rec is None:
         return
+    jobs[job_name] = rec.replace(last_fire={**fire, "at": datetime.now(ASIA_JAKARTA).isoformat(timespec="milliseconds")})
+    save_storage(storage)
 
-    # kalau kuota tersedia langsung eksekusi seperti biasa
-    await context.bot.send_message(chat_id,
-                                   text=f"[Jadwal {site}] {cap['tanggal_cell']}\nKuota: {cap['quota']} → {cap['status']}")
-    sess = PREWARMED_SESSIONS.pop(job_name, None)
-    if site == "bromo":
-        ok, msg, elapsed_s, raw = await asyncio.to_thread(
-            do_booking_flow_bromo,
-            ci, iso, prof,
-            job_cookies=job_cookies, sess=sess,
-        )
-    else:
-        leader = prof.get("_leader", {})
-        members = prof.get("_members", [])
-        ok, msg, elapsed_s, raw = await asyncio.to_thread(
-            do_booking_flow_semeru,
-            ci, iso, leader, members,
-            job_cookies=job_cookies, sess=sess,
-        )
+
+def _record_timeline(uid: str, job_name: str, tl: Timeline | None):
+    """Simpan timeline percobaan booking terakhir di record job (ringkasannya tampil di /job_detail)."""
+    if tl is None:
+        return
+    jobs = get_jobs_store(uid)
+    rec = jobs.get(job_name)
+    if rec is None:
+        return
+    jobs[job_name] = rec.replace(last_timeline={**tl.as_dict(), "summary": tl.summary()})
+    save_storage(storage)
+
+
+def _first_request(tl: Timeline | None) -> str | None:
+    """Tahap pertama timeline = request yang dikirim tepat di T0 (``member_update#1`` bila pre-armed)."""
+    return tl.stages[0]["stage"] if tl is not None and tl.stages else None
+
+
+def _timeline_note(tl: Timeline | None) -> str:
+    return f"\nTahapan: {tl.summary()}" if tl is not None and tl.stages else ""
+
+
+async def _report_scheduled_result(context: ContextTypes.DEFAULT_TYPE, uid: str, job_name: str, job_cookies: dict,
+                                   chat_id: int, site: str, result: tuple, fire: dict | None,
+                                   timeline: Timeline | None = None):
+    ok, msg, elapsed_s, raw = result
+    # tulis ke SQLite di thread: event loop tidak ikut menunggu disk / busy_timeout bot lain
+    await asyncio.to_thread(_record_timeline, uid, job_name, timeline)
+    # rantai ke job berikutnya dgn cookie sama sebelum kirim hasil (tanpa menunggu Telegram)
+    trigger_next_cookie_job(context, uid, job_name, job_cookies, chat_id, site)
 
     extra = ""
     if raw:
         server_msg = raw.get("message", "-")
         link = raw.get("booking_link") or raw.get("link_redirect") or "-"
         extra = f"\n[Server]\nmessage: {server_msg}\nlink: {link}"
+    if fire:
+        extra += f"\nPresisi tembak: {fire['error_ms']:+.3f} ms"
+        if fire.get("first_request"):
+            extra += f" (request pertama: {fire['first_request']})"
+        if fire.get("prearm_rt"):
+            extra += f" | pre-arm: {fire['prearm_rt']} round-trip di luar jalur kritis"
     await context.bot.send_message(
         chat_id,
-        text=("[Jadwal] ✅ " if ok else "[Jadwal] ❌ ") + msg + f"\n\nWaktu proses: {elapsed_s:.2f} detik" + extra,
+        text=("[Jadwal] ✅ " if ok else "[Jadwal] ❌ ") + msg + f"\n\nWaktu proses: {elapsed_s:.2f} detik"
+             + _timeline_note(timeline) + extra,
         parse_mode=ParseMode.HTML,
         disable_web_page_preview=True,
     )
-    trigger_next_cookie_job(context, uid, job_name, job_cookies, chat_id, site)
 
 
 async def reminder_job(context: ContextTypes.DEFAULT_TYPE):
@@ -2331,23 +3051,20 @@ def trigger_next_cookie_job(context: ContextTypes.DEFAULT_TYPE, uid: str, curren
     if jq is None:
         return
     now = datetime.now(ASIA_JAKARTA)
-    jobs = get_jobs_store(uid)
-    candidates = []
-    for name, rec in jobs.items():
+    # grup cookie di index sudah terurut run_at: kandidat aktif pertama adalah job berikutnya
+    for name in storage.index().same_cookies(uid, job_cookies, now):
         if name == current_name:
             continue
-        if rec.get("cookies") == job_cookies and jq.get_jobs_by_name(name):
-            t = rec.get("time", "")
-            fmt = "%Y-%m-%d %H:%M:%S" if t.count(":") == 2 else "%Y-%m-%d %H:%M"
-            run_at = ASIA_JAKARTA.localize(datetime.strptime(f"{rec['exec_iso']} {t}", fmt))
-            if run_at > now:
-                candidates.append((run_at, name, rec))
-    if not candidates:
+        if _is_deferred(uid, name) or jq.get_jobs_by_name(name):
+            rec = get_jobs_store(uid).get(name)
+            if rec:
+                next_name = name
+                break
+    else:
         return
-    candidates.sort(key=lambda x: x[0])
-    _, next_name, rec = candidates[0]
     for j in jq.get_jobs_by_name(next_name):
         j.schedule_removal()
+    CONSUMED_EARLY.add(next_name)
     jq.run_once(
         scheduled_job,
         when=datetime.now(ASIA_JAKARTA),
@@ -2369,6 +3086,8 @@ def jobs_live_names(context: ContextTypes.DEFAULT_TYPE) -> set[str]:
     if jq:
         for j in jq.jobs():
             if j.name: live.add(j.name)
+    # job hasil rehidrasi yang belum masuk horizon tetap dihitung aktif
+    live.update(_deferred_names())
     return live
 
 
@@ -2380,14 +3099,9 @@ def require_jq(context: ContextTypes.DEFAULT_TYPE):
 
 
 def resolve_job_selector(uid: str, selector: str) -> str | None:
-    jobs_store = get_jobs_store(uid)
-    if not jobs_store:
-        return None
     if selector.isdigit():
-        idx = int(selector)
-        items = sorted(jobs_store.items(), key=_sort_key)
-        return items[idx - 1][0] if 1 <= idx <= len(items) else None
-    return selector if selector in jobs_store else None
+        return storage.index().nth(uid, int(selector))
+    return selector if selector in get_jobs_store(uid) else None
 
 
 def _fmt_len(s: str, n: int) -> str:
@@ -2405,21 +3119,6 @@ def _exec_dt_str(rec: dict) -> str:
     return f"{rec.get('exec_iso', '????-??-??')} {t}"
 
 
-def _participants(rec: dict) -> int:
-    prof = rec.get("profile", {})
-    # Bromo: 1 leader + male + female
-    if "name" in prof:
-        try:
-            m = int(prof.get("male", "0") or 0)
-            f = int(prof.get("female", "0") or 0)
-            return 1 + m + f
-        except Exception:
-            return 1
-    # Semeru: leader + jumlah anggota
-    mem = prof.get("_members", [])
-    return 1 + (len(mem) if isinstance(mem, list) else 0)
-
-
 def _cookies_badge(rec: dict) -> str:
     ck = rec.get("cookies", {}) or {}
     marks = []
@@ -2433,12 +3132,7 @@ def _status_badge(name: str, live: set[str]) -> str:
     return "🟢" if name in live else "⚪"
 
 
-def _sort_key(item: tuple[str, dict]) -> tuple[str, str]:
-    name, rec = item
-    return (rec.get("exec_iso", "9999-99-99"), rec.get("time", "99:99:99"))
-
-
-def _render_jobs_table(jobs_store: dict, live: set[str]) -> list[str]:
+def _render_jobs_table(jobs_store: JobsView, live: set[str]) -> list[str]:
     if not jobs_store:
         return ["Belum ada job terjadwal."]
 
@@ -2455,21 +3149,19 @@ def _render_jobs_table(jobs_store: dict, live: set[str]) -> list[str]:
     )
     sep = "—" * len(header)
 
-    items = sorted(jobs_store.items(), key=_sort_key)
+    # cukup header (tanpa profile): leader & jumlah peserta sudah dihitung store
+    items = jobs_store.ordered_headers()
 
     lines = [header, sep]
     for idx, (name, rec) in enumerate(items, start=1):
-        leader = (rec.get("profile", {}).get("name")
-                  or rec.get("profile", {}).get("_leader", {}).get("name")
-                  or "-")
         row = (
                 _fmt_len(idx, 3) + " " +
                 _fmt_len(_status_badge(name, live), 2) + " " +
                 _fmt_len(_detect_site(name), 6) + " " +
                 _fmt_len(rec.get("booking_iso", "-"), 10) + " " +
                 _fmt_len(_exec_dt_str(rec), 16) + " " +
-                _fmt_len(leader, 16) + " " +
-                _fmt_len(_participants(rec), 3) + " " +
+                _fmt_len(rec.leader or "-", 16) + " " +
+                _fmt_len(rec.pax, 3) + " " +
                 _fmt_len(_cookies_badge(rec), 4) + " " +
                 name
         )
@@ -2510,12 +3202,11 @@ async def jobs_list(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # Kirim daftar ringkas + tombol (batasi 20 agar tidak spam)
     MAX_ROWS = 20
-    rows = sorted(jobs_store.items(), key=_sort_key)[:MAX_ROWS]
+    rows = [(name, jobs_store.header(name)) for name in list(idxmap.values())[:MAX_ROWS]]
     for i, (name, rec) in enumerate(rows, start=1):
-        leader = (rec.get("profile", {}).get("name")
-                  or rec.get("profile", {}).get("_leader", {}).get("name")
-                  or "-")
-        text = f"{i}. {name}\n• Leader: {leader}\n• Eksekusi: {_exec_dt_str(rec)}"
+        if rec is None:
+            continue
+        text = f"{i}. {name}\n• Leader: {rec.leader or '-'}\n• Eksekusi: {_exec_dt_str(rec)}"
 
         kb = [
             [
@@ -2546,6 +3237,13 @@ async def job_detail(update: Update, context: ContextTypes.DEFAULT_TYPE):
     ck = rec.get("cookies", {})
     safe_ck = {k: mask(ck.get(k)) for k in ["_ga", "_ga_TMVP85FKW9", "ci_session"]}
 
+    clock = SERVER_CLOCK.stats
+    live_jobs = context.application.job_queue.get_jobs_by_name(job_name) if context.application.job_queue else ()
+    clock["eksekusi_lokal"] = live_jobs[0].next_t.astimezone(ASIA_JAKARTA).isoformat(timespec="milliseconds") \
+        if live_jobs and live_jobs[0].next_t else None
+    clock["riwayat"] = {day: f"{h['min']:+.3f}..{h['max']:+.3f} s (akhir {h['last']:+.3f} ±{h['uncertainty']:.3f}, "
+                             f"{h['samples']} sampel)" for day, h in SERVER_CLOCK.history(7)}
+
     await update.message.reply_text(json.dumps({
         "job": job_name,
         "status": "AKTIF" if live else "TIDAK AKTIF",
@@ -2553,8 +3251,12 @@ async def job_detail(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "exec_iso": rec["exec_iso"],
         "time": rec["time"],
         "reminder_minutes": rec.get("reminder_minutes"),
-        "profile": rec["profile"],
+        "profile": rec["profile"].to_dict(),
         "cookies": safe_ck,
+        "tembak_terakhir": rec.get("last_fire"),
+        "tahapan_terakhir": {k: (rec.get("last_timeline") or {}).get(k) for k in ("at", "ok", "total_ms", "summary")}
+        if rec.get("last_timeline") else None,
+        "jam_server": clock,
     }, ensure_ascii=False, indent=2))
 
 
@@ -2572,18 +3274,76 @@ async def job_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
         jq = require_jq(context)
         for j in jq.get_jobs_by_name(job_name): j.schedule_removal()
         for j in jq.get_jobs_by_name(f"rem-{job_name}"): j.schedule_removal()
-        for j in jq.get_jobs_by_name(f"poll-{job_name}"): j.schedule_removal()
         for j in jq.get_jobs_by_name(f"prewarm-{job_name}"): j.schedule_removal()
         for j in jq.get_jobs_by_name(f"view-{job_name}"): j.schedule_removal()
+        for j in jq.get_jobs_by_name(f"arm-{job_name}"): j.schedule_removal()
     except RuntimeError:
         pass
+    unsubscribe_capacity(job_name)
     PREWARMED_SESSIONS.pop(job_name, None)
+    PREARMED.pop(job_name, None)
+    EXECUTING_JOBS.discard(job_name)
     get_jobs_store(uid).pop(job_name, None)
     save_storage(storage)
     await update.message.reply_text(f"Job '{job_name}' dibatalkan & dihapus.")
 
 
 # ====== RESCHED CORE ======
+TAKEOVER_REMINDERS = [(30, ""), (15, "2")]  # (menit sebelum kedaluwarsa, sufiks nama rem)
+
+
+def _register_job_bundle(jq, uid: str, job_name: str, site: str, run_at: datetime,
+                         booking_iso: str, profile: dict, cookies: dict, reminder_minutes: int | None,
+                         chat_id: int, ci_session: str, now: datetime | None = None) -> int:
+    """Daftarkan job eksekusi + prewarm + view + reminder ke JobQueue; return jumlah entri.
+
+    Dipakai saat membuat/ubah jadwal dan saat rehidrasi startup, jadi nama & data
+    job selalu sama. Job take over hanya punya eksekusi + dua reminder tetap.
+    """
+    now = now or datetime.now(ASIA_JAKARTA)
+    payloads = None
+    if site == "semeru":
+        # body POST siap kirim; dipakai bersama job eksekusi, watcher & poller
+        payloads = compile_semeru_payloads(booking_iso, profile.get("_leader", {}), profile.get("_members", []))
+    jq.run_once(
+        scheduled_job, when=exec_wake_at(run_at), name=job_name,
+        data={"user_id": uid, "site": site, "iso": booking_iso, "profile": profile, "cookies": cookies,
+              "run_at": run_at, "payloads": payloads},
+        chat_id=chat_id
+    )
+    n = 1
+    if job_name.startswith(f"{TAKEOVER_PREFIX}-"):
+        for mins, suf in TAKEOVER_REMINDERS:
+            remind_at = run_at - timedelta(minutes=mins)
+            if remind_at > now:
+                jq.run_once(reminder_job, when=remind_at, name=f"rem{suf}-{job_name}",
+                            data={"user_id": uid, "job_name": job_name}, chat_id=chat_id)
+                n += 1
+        return n
+
+    pre_at = run_at - timedelta(minutes=2)
+    jq.run_once(prewarm_session_job, when=pre_at, name=f"prewarm-{job_name}",
+                data={"job_name": job_name, "ci_session": ci_session, "cookies": cookies, "run_at": run_at,
+                      "site": site, "iso": booking_iso},
+                chat_id=chat_id)
+    poll_start = run_at - timedelta(minutes=5)
+    poll_end = run_at + timedelta(minutes=15)
+    jq.run_repeating(poll_get_view_job, interval=timedelta(seconds=15), first=poll_start,
+                     name=f"view-{job_name}",
+                     data={"job_name": job_name, "user_id": uid, "site": site,
+                           "iso": booking_iso, "profile": profile, "cookies": cookies, "payloads": payloads,
+                           "release": run_at, "end_at": poll_end, "chat_id": chat_id},
+                     chat_id=chat_id)
+    n += 2
+    if isinstance(reminder_minutes, int) and reminder_minutes > 0:
+        remind_at = run_at - timedelta(minutes=reminder_minutes)
+        if remind_at > now:
+            jq.run_once(reminder_job, when=remind_at, name=f"rem-{job_name}",
+                        data={"user_id": uid, "job_name": job_name}, chat_id=chat_id)
+            n += 1
+    return n
+
+
 async def reschedule_job(context: ContextTypes.DEFAULT_TYPE, uid: str, old_name: str,
                          booking_iso: str, exec_iso: str, hhmm: str,
                          profile: dict, cookies: dict, reminder_minutes: int | None,
@@ -2591,10 +3351,13 @@ async def reschedule_job(context: ContextTypes.DEFAULT_TYPE, uid: str, old_name:
     jq = require_jq(context)
     for j in jq.get_jobs_by_name(old_name): j.schedule_removal()
     for j in jq.get_jobs_by_name(f"rem-{old_name}"): j.schedule_removal()
-    for j in jq.get_jobs_by_name(f"poll-{old_name}"): j.schedule_removal()
+    unsubscribe_capacity(old_name)
     for j in jq.get_jobs_by_name(f"prewarm-{old_name}"): j.schedule_removal()
     for j in jq.get_jobs_by_name(f"view-{old_name}"): j.schedule_removal()
+    for j in jq.get_jobs_by_name(f"arm-{old_name}"): j.schedule_removal()
     PREWARMED_SESSIONS.pop(old_name, None)
+    PREARMED.pop(old_name, None)
+    EXECUTING_JOBS.discard(old_name)
 
     leader_name = profile.get("name") or profile.get("_leader", {}).get("name", "ketua")
     new_name = make_job_name(site, uid, leader_name, booking_iso, exec_iso, hhmm)
@@ -2605,29 +3368,8 @@ async def reschedule_job(context: ContextTypes.DEFAULT_TYPE, uid: str, old_name:
     if run_at < datetime.now(ASIA_JAKARTA):
         raise ValueError("Waktu eksekusi baru sudah lewat di Asia/Jakarta.")
 
-    jq.run_once(
-        scheduled_job, when=run_at, name=new_name,
-        data={"user_id": uid, "site": site, "iso": booking_iso, "profile": profile, "cookies": cookies},
-        chat_id=chat_id
-    )
-
-    pre_at = run_at - timedelta(minutes=2)
-    jq.run_once(prewarm_session_job, when=pre_at, name=f"prewarm-{new_name}",
-                data={"job_name": new_name, "ci_session": get_ci(uid), "cookies": cookies},
-                chat_id=chat_id)
-    poll_start = run_at - timedelta(minutes=5)
-    poll_end = run_at + timedelta(minutes=15)
-    jq.run_repeating(poll_get_view_job, interval=timedelta(seconds=5), first=poll_start,
-                     name=f"view-{new_name}",
-                     data={"job_name": new_name, "user_id": uid, "site": site,
-                           "iso": booking_iso, "profile": profile, "cookies": cookies,
-                           "end_at": poll_end, "chat_id": chat_id},
-                     chat_id=chat_id)
-    if isinstance(reminder_minutes, int) and reminder_minutes > 0:
-        remind_at = run_at - timedelta(minutes=reminder_minutes)
-        if remind_at > datetime.now(ASIA_JAKARTA):
-            jq.run_once(reminder_job, when=remind_at, name=f"rem-{new_name}",
-                        data={"user_id": uid, "job_name": new_name}, chat_id=chat_id)
+    _register_job_bundle(jq, uid, new_name, site, run_at, booking_iso, profile, cookies,
+                         reminder_minutes, chat_id, get_ci(uid))
     return new_name
 
 
@@ -2670,10 +3412,7 @@ async def job_edit_time(update: Update, context: ContextTypes.DEFAULT_TYPE):
     except Exception as e:
         await update.message.reply_text(f"Gagal menjadwalkan ulang: {e}");
         return
-    jobs.pop(job_name, None);
-    rec["exec_iso"] = exec_iso;
-    rec["time"] = hhmm;
-    jobs[new_name] = rec;
+    jobs.rename(job_name, new_name, rec.replace(exec_iso=exec_iso, time=hhmm))
     save_storage(storage)
     await update.message.reply_text(f"Job diubah waktunya ✅\nLama: {job_name}\nBaru: {new_name}")
 
@@ -2692,7 +3431,7 @@ async def job_update_cookies(update: Update, context: ContextTypes.DEFAULT_TYPE)
     rec = jobs.get(job_name)
     if not rec: await update.message.reply_text("Job tidak ditemukan."); return
 
-    cookies = rec.get("cookies", {}).copy();
+    cookies = dict(rec.get("cookies") or {});
     changed = []
     for k in ["_ga", "_ga_TMVP85FKW9", "ci_session"]:
         if k in kv and kv[k]:
@@ -2709,9 +3448,7 @@ async def job_update_cookies(update: Update, context: ContextTypes.DEFAULT_TYPE)
         await update.message.reply_text(f"Gagal menjadwalkan ulang: {e}");
         return
 
-    jobs.pop(job_name, None);
-    rec["cookies"] = cookies;
-    jobs[new_name] = rec;
+    jobs.rename(job_name, new_name, rec.replace(cookies=cookies))
     save_storage(storage)
     await update.message.reply_text(
         f"Cookies job diupdate ✅ ({', '.join(changed)})\nLama: {job_name}\nBaru: {new_name}")
@@ -2775,15 +3512,17 @@ async def book_semeru_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE
         await update.message.reply_text("Dibatalkan.")
         return ConversationHandler.END
     uid = str(update.effective_user.id)
-    ok, msg, elapsed_s, raw = do_booking_flow_semeru(
+    tl = Timeline("semeru")
+    ok, msg, elapsed_s, raw = await asyncio.to_thread(
+        do_booking_flow_semeru,
         get_ci(uid), context.user_data["booking_iso"], context.user_data["_leader"], context.user_data["_members"],
-        job_cookies=context.user_data.get("cookies")
+        job_cookies=context.user_data.get("cookies"), timeline=tl,
     )
     extra = ""
     if raw:
         extra = f"\n\n[Server]\nmessage: {raw.get('message', '-')}\nlink: {raw.get('booking_link') or raw.get('link_redirect') or '-'}"
     await update.message.reply_text(
-        ("✅ " if ok else "❌ ") + msg + f"\n\nWaktu proses: {elapsed_s:.2f} detik" + extra,
+        ("✅ " if ok else "❌ ") + msg + f"\n\nWaktu proses: {elapsed_s:.2f} detik" + _timeline_note(tl) + extra,
         parse_mode=ParseMode.HTML,
         disable_web_page_preview=True,
     )
@@ -2872,70 +3611,24 @@ async def schedule_semeru_confirm(update: Update, context: ContextTypes.DEFAULT_
     for j in jq.get_jobs_by_name(job_name): j.schedule_removal()
     for j in jq.get_jobs_by_name(f"prewarm-{job_name}"): j.schedule_removal()
     for j in jq.get_jobs_by_name(f"view-{job_name}"): j.schedule_removal()
-    import copy
-    profile = {
-        "_leader": copy.deepcopy(context.user_data["_leader"]),
-        "_members": copy.deepcopy(context.user_data["_members"]),
-    }
-
-    jobs_store = get_jobs_store(uid)
-    jobs_store[job_name] = {
+    for j in jq.get_jobs_by_name(f"arm-{job_name}"): j.schedule_removal()
+    PREARMED.pop(job_name, None)
+    # record immutable: dipakai bersama oleh store dan job.data, tanpa deepcopy
+    rec = JobRecord.from_dict({
         "booking_iso": booking_iso,
         "exec_iso": exec_iso,
         "time": context.user_data["time"],
-        "profile": profile,
+        "profile": {"_leader": context.user_data["_leader"], "_members": context.user_data["_members"]},
         "cookies": context.user_data.get("cookies", {}),
         "reminder_minutes": context.user_data.get("reminder_minutes"),
         "created_at": datetime.now(ASIA_JAKARTA).isoformat(),
         "chat_id": update.effective_chat.id
-    }
+    })
+    get_jobs_store(uid)[job_name] = rec
     save_storage(storage)
 
-    jq.run_once(
-        scheduled_job,
-        when=run_at,
-        name=job_name,
-        data={
-            "user_id": uid,
-            "site": "semeru",
-            "iso": booking_iso,
-            "profile": copy.deepcopy(profile),
-            "cookies": jobs_store[job_name]["cookies"],
-        },
-        chat_id=update.effective_chat.id,
-    )
-
-    pre_at = run_at - timedelta(minutes=2)
-    jq.run_once(prewarm_session_job, when=pre_at, name=f"prewarm-{job_name}",
-                data={"job_name": job_name, "ci_session": get_ci(uid),
-                      "cookies": jobs_store[job_name]["cookies"]},
-                chat_id=update.effective_chat.id)
-    poll_start = run_at - timedelta(minutes=5)
-    poll_end = run_at + timedelta(minutes=15)
-    jq.run_repeating(
-        poll_get_view_job,
-        interval=timedelta(seconds=5),
-        first=poll_start,
-        name=f"view-{job_name}",
-        data={
-            "job_name": job_name,
-            "user_id": uid,
-            "site": "semeru",
-            "iso": booking_iso,
-            "profile": copy.deepcopy(profile),
-            "cookies": jobs_store[job_name]["cookies"],
-            "end_at": poll_end,
-            "chat_id": update.effective_chat.id,
-        },
-        chat_id=update.effective_chat.id,
-    )
-
-    remind_min = context.user_data.get("reminder_minutes")
-    if isinstance(remind_min, int) and remind_min > 0:
-        remind_at = run_at - timedelta(minutes=remind_min)
-        if remind_at > datetime.now(ASIA_JAKARTA):
-            jq.run_once(reminder_job, when=remind_at, name=f"rem-{job_name}",
-                        data={"user_id": uid, "job_name": job_name}, chat_id=update.effective_chat.id)
+    _register_job_bundle(jq, uid, job_name, BOOK_PREFIX_SEMERU, run_at, booking_iso, rec.profile,
+                         rec.cookies, rec.reminder_minutes, update.effective_chat.id, get_ci(uid))
 
     await update.message.reply_text(
         f"Terjadwal ✅ (SEMERU)\n- Booking: {booking_iso}\n- Eksekusi: {exec_iso} {context.user_data['time']} (Asia/Jakarta)\n"
@@ -3046,14 +3739,17 @@ async def on_jobs_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             jq = require_jq(context)
             for j in jq.get_jobs_by_name(name): j.schedule_removal()
             for j in jq.get_jobs_by_name(f"rem-{name}"): j.schedule_removal()
-            for j in jq.get_jobs_by_name(f"poll-{name}"): j.schedule_removal()
             for j in jq.get_jobs_by_name(f"prewarm-{name}"): j.schedule_removal()
             for j in jq.get_jobs_by_name(f"view-{name}"): j.schedule_removal()
+            for j in jq.get_jobs_by_name(f"arm-{name}"): j.schedule_removal()
         except RuntimeError:
             pass
+        unsubscribe_capacity(name)
         jobs.pop(name, None)
         save_storage(storage)
         PREWARMED_SESSIONS.pop(name, None)
+        PREARMED.pop(name, None)
+        EXECUTING_JOBS.discard(name)
         await q.edit_message_text(f"✅ Job <code>{name}</code> dibatalkan & dihapus.", parse_mode=ParseMode.HTML)
 
     elif action == "edit":
@@ -3098,7 +3794,7 @@ async def booking_detail_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE)
     filter_q = " ".join(context.args[1:]).strip() if len(context.args) > 1 else ""
 
     try:
-        row = get_booking_by_code_api(booking_code, ci)
+        row = await get_booking_by_code_api(booking_code, ci)
     except Exception as e:
         await update.message.reply_text(f"Gagal ambil booking: {e}")
         return
@@ -3110,7 +3806,7 @@ async def booking_detail_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return
 
     try:
-        members, total = get_members_by_secret(secret, ci_session=ci, page_size=200, search_value=filter_q)
+        members, total = await get_members_by_secret(secret, ci_session=ci, page_size=200, search_value=filter_q)
     except Exception as e:
         await update.message.reply_text(f"Gagal ambil anggota: {e}")
         return
@@ -3173,7 +3869,7 @@ async def take_over_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     booking_code = context.args[0].strip()
     try:
-        row = get_booking_by_code_api(booking_code, ci)
+        row = await get_booking_by_code_api(booking_code, ci)
     except Exception as e:
         await update.message.reply_text(f"Gagal ambil booking: {e}")
         return
@@ -3186,7 +3882,7 @@ async def take_over_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     members = []
     if secret:
         try:
-            mrows, _ = get_members_by_secret(secret, ci_session=ci)
+            mrows, _ = await get_members_by_secret(secret, ci_session=ci)
             for m in mrows:
                 members.append({
                     "nama": m.get("nama", ""),
@@ -3223,8 +3919,7 @@ async def take_over_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     booking_iso = leader.get("date_depart") or row.get("date_depart") or expired_at.strftime("%Y-%m-%d")
     job_name = make_job_name(TAKEOVER_PREFIX, uid, leader_profile.get("name", "ketua"),
                              booking_iso, expired_at.strftime("%Y-%m-%d"), expired_at.strftime("%H:%M:%S"))
-    jobs_store = get_jobs_store(uid)
-    jobs_store[job_name] = {
+    rec = JobRecord.from_dict({
         "booking_iso": booking_iso,
         "exec_iso": expired_at.strftime("%Y-%m-%d"),
         "time": expired_at.strftime("%H:%M:%S"),
@@ -3233,32 +3928,12 @@ async def take_over_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "reminder_minutes": None,
         "created_at": datetime.now(ASIA_JAKARTA).isoformat(),
         "chat_id": update.effective_chat.id,
-    }
+    })
+    get_jobs_store(uid)[job_name] = rec
     save_storage(storage)
     jq = require_jq(context)
-    jq.run_once(
-        scheduled_job,
-        when=expired_at,
-        name=job_name,
-        data={
-            "user_id": uid,
-            "site": "semeru",
-            "iso": booking_iso,
-            "profile": profile,
-            "cookies": {},
-        },
-        chat_id=update.effective_chat.id,
-    )
-    for mins, suf in [(30, ""), (15, "2")]:
-        remind_at = expired_at - timedelta(minutes=mins)
-        if remind_at > datetime.now(ASIA_JAKARTA):
-            jq.run_once(
-                reminder_job,
-                when=remind_at,
-                name=f"rem{suf}-{job_name}",
-                data={"user_id": uid, "job_name": job_name},
-                chat_id=update.effective_chat.id,
-            )
+    _register_job_bundle(jq, uid, job_name, BOOK_PREFIX_SEMERU, expired_at, booking_iso, rec.profile, rec.cookies,
+                         None, update.effective_chat.id, ci)
     await update.message.reply_text(
         f"Take over dijadwalkan pada {expired_at.strftime('%Y-%m-%d %H:%M:%S')} (Asia/Jakarta)."
     )
@@ -3275,12 +3950,117 @@ async def on_error(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 # =================== BOOT ===================
+# Prefix job yang dijadwalkan bot ini → site. Job "book-..." milik bot-bromo.py.
+REHYDRATE_SITES = {BOOK_PREFIX_SEMERU: "semeru", BOOK_PREFIX_BROMO: "bromo", TAKEOVER_PREFIX: "semeru"}
+# Job yang eksekusinya lebih jauh dari horizon ini tidak langsung masuk JobQueue saat start;
+# arm_deferred_jobs mengambilnya dari index global saat mendekati waktunya. Minimal 3 jam
+# agar reminder (maks 120 menit) dan prewarm/view tetap terdaftar tepat waktu.
+REHYDRATE_HORIZON = timedelta(hours=max(3.0, float(os.getenv("REHYDRATE_HORIZON_H", "6"))))
+REHYDRATE_STATE: dict[str, datetime | None] = {"armed_until": None}  # run_at ≤ ini sudah didaftarkan
+CONSUMED_EARLY: set[str] = set()  # job tertunda yang sudah dijalankan lebih awal via trigger_next_cookie_job
+
+
+def _deferred_names() -> list[str]:
+    until = REHYDRATE_STATE["armed_until"]
+    if until is None:
+        return []
+    return [name for run_at, _, name in storage.index().due_between(until, RUN_AT_UNKNOWN)
+            if run_at != RUN_AT_UNKNOWN and name not in CONSUMED_EARLY
+            and name.split("-", 1)[0] in REHYDRATE_SITES]
+
+
+def _is_deferred(uid: str, name: str) -> bool:
+    until = REHYDRATE_STATE["armed_until"]
+    run_at = storage.index().run_at(uid, name)
+    return (until is not None and run_at is not None and until < run_at != RUN_AT_UNKNOWN
+            and name not in CONSUMED_EARLY and name.split("-", 1)[0] in REHYDRATE_SITES)
+
+
+def _register_stored_job(jq, uid: str, name: str, rec: dict, run_at: datetime, ci_session: str,
+                         now: datetime) -> int:
+    return _register_job_bundle(
+        jq, uid, name, REHYDRATE_SITES[name.split("-", 1)[0]], run_at, rec["booking_iso"],
+        rec.get("profile") or {}, rec.get("cookies") or {}, rec.get("reminder_minutes"),
+        rec.get("chat_id"), ci_session, now=now,
+    )
+
+
+def _schedule_deferred_arm(jq):
+    for j in jq.get_jobs_by_name("rehydrate-arm"):
+        j.schedule_removal()
+    nxt = storage.index().next_after(REHYDRATE_STATE["armed_until"])
+    if nxt and nxt[0] != RUN_AT_UNKNOWN:
+        jq.run_once(arm_deferred_jobs, when=nxt[0] - REHYDRATE_HORIZON, name="rehydrate-arm")
+
+
+def _arm_window(jq, start: datetime, end: datetime, now: datetime, live: set[str], stats: dict):
+    ci_cache: dict[str, str] = {}
+    for run_at, uid, name in storage.index().due_between(start, end):
+        if name.split("-", 1)[0] not in REHYDRATE_SITES:
+            stats["foreign"] += 1
+            continue
+        if name in live or name in CONSUMED_EARLY:
+            continue  # sudah dijadwalkan ulang / dijalankan sejak start
+        rec = get_jobs_store(uid).get(name)
+        if not rec:
+            continue
+        if uid not in ci_cache:
+            ci_cache[uid] = get_ci(uid)
+        stats["entries"] += _register_stored_job(jq, uid, name, rec, run_at, ci_cache[uid], now)
+        stats["registered"] += 1
+
+
+def rehydrate_jobs(jq) -> dict:
+    """Daftarkan ulang job tersimpan yang belum lewat ke JobQueue (sekali jalan saat start)."""
+    t0 = time.perf_counter()
+    now = datetime.now(ASIA_JAKARTA)
+    index = storage.index()
+    horizon_end = now + REHYDRATE_HORIZON
+    stats = {"stored": len(index), "registered": 0, "entries": 0, "foreign": 0}
+    _arm_window(jq, now, horizon_end, now, set(), stats)
+    REHYDRATE_STATE["armed_until"] = horizon_end
+    stats["deferred"] = len(_deferred_names())
+    stats["expired"] = len(index.due_between(RUN_AT_MIN, now))
+    _schedule_deferred_arm(jq)
+    stats["ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    log.info(
+        "Rehidrasi JobQueue: %d tersimpan → %d didaftarkan (%d entri), %d ditunda, %d kedaluwarsa, "
+        "%d milik bot lain dalam %.1f ms",
+        stats["stored"], stats["registered"], stats["entries"], stats["deferred"], stats["expired"],
+        stats["foreign"], stats["ms"],
+    )
+    return stats
+
+
+async def arm_deferred_jobs(context: ContextTypes.DEFAULT_TYPE):
+    """Daftarkan job tertunda yang sudah masuk horizon; record dibaca ulang dari storage."""
+    jq = require_jq(context)
+    now = datetime.now(ASIA_JAKARTA)
+    start, end = REHYDRATE_STATE["armed_until"], now + REHYDRATE_HORIZON
+    stats = {"registered": 0, "entries": 0, "foreign": 0}
+    _arm_window(jq, max(start, now), end, now, {j.name for j in jq.jobs()}, stats)
+    REHYDRATE_STATE["armed_until"] = end
+    log.info("Rehidrasi tertunda: %d job didaftarkan (%d entri)", stats["registered"], stats["entries"])
+    _schedule_deferred_arm(jq)
+
+
+async def _post_init(app: Application):
+    if app.job_queue is None:
+        log.warning("JobQueue tidak aktif; job tersimpan tidak dijadwalkan ulang.")
+        return
+    rehydrate_jobs(app.job_queue)
+
+
+async def _post_shutdown(app: Application):
+    await HTTP.aclose()  # client milik loop PTB; yang di jembatan sync ditutup di main()
+
+
 def main():
     token = os.getenv("TELEGRAM_BOT_TOKEN", "").strip()
     if not token:
         token = "PASTE_TELEGRAM_BOT_TOKEN_DI_SINI"
 
-    app = Application.builder().token(token).build()
+    app = Application.builder().token(token).post_init(_post_init).post_shutdown(_post_shutdown).build()
 
     # basic
     app.add_handler(CommandHandler("start", start))
@@ -3351,7 +4131,13 @@ def main():
     app.add_handler(CommandHandler("examples", examples_cmd))
 
     app.add_error_handler(on_error)
-    app.run_polling()
+    try:
+        app.run_polling()
+    finally:
+        storage.close()  # flush terakhir sebelum proses keluar
+        CLIENTS.close()
+        HTTP.close()
+        SERVER_CLOCK.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,125 @@
+"""Adaptive polling cadence.
+
+Pollers ask a ``Cadence`` how long to wait before their next request
+instead of repeating at a fixed interval. The delay is ``far`` away from
+the expected release moment, shrinks as the release approaches (``1/ramp`` of the remaining
+gap, never overshooting the start of the window),
+stays at ``hot`` inside the release window and relaxes again after it.
+While the site answers slowly or with 429/5xx the delay is stretched by a
+backoff factor that decays once responses are healthy again.
+
+A ``RateBudget`` shared by several cadences caps the total request rate
+they can produce together, however many pollers are active.
+"""
+import random
+import threading
+import time
+from datetime import datetime, time as dtime, timedelta
+
+
+class RateBudget:
+    """At most ``per_minute`` requests per minute across all users, bursts up to ``burst`` (GCRA)."""
+
+    def __init__(self, per_minute: float, burst: int | None = None):
+        self.interval = 60.0 / per_minute
+        self.burst = burst if burst is not None else max(1, int(per_minute // 6))
+        self._tau = self.interval * (self.burst - 1)
+        self._tat = 0.0  # theoretical arrival time (monotonic)
+        self._lock = threading.Lock()
+        self.delayed = 0
+
+    def reserve(self, at: float) -> float:
+        """Book one request at monotonic time ``at`` or later; returns the granted time."""
+        with self._lock:
+            tat = max(self._tat, at)
+            granted = max(at, tat - self._tau)
+            self._tat = tat + self.interval
+            if granted > at:
+                self.delayed += 1
+            return granted
+
+
+def parse_release_times(spec: str) -> list[dtime]:
+    """``"16:00,08:00"`` → sorted ``time`` list; invalid entries are ignored."""
+    out = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            hh, mm = part.split(":", 1)
+            out.append(dtime(int(hh), int(mm)))
+        except ValueError:
+            continue
+    return sorted(out)
+
+
+def nearest_release(now: datetime, times: list[dtime], after: timedelta) -> datetime | None:
+    """The release moment that is still relevant at ``now``: current (within ``after``) or next one."""
+    best = None
+    for day in (now.date() - timedelta(days=1), now.date(), now.date() + timedelta(days=1)):
+        for t in times:
+            at = now.replace(year=day.year, month=day.month, day=day.day, hour=t.hour, minute=t.minute,
+                             second=0, microsecond=0)
+            if at + after >= now and (best is None or at < best):
+                best = at
+    return best
+
+
+class Cadence:
+    """Per-poller delay policy; ``observe()`` each response, then ask ``next_delay()``."""
+
+    def __init__(self, *, hot: float, far: float, before: timedelta, after: timedelta, ramp: float = 6.0,
+                 slow_s: float = 3.0, max_backoff: float = 8.0, jitter: float = 0.1,
+                 budget: RateBudget | None = None):
+        self.hot = hot
+        self.far = far
+        self.before = before.total_seconds()
+        self.after = after.total_seconds()
+        self.ramp = ramp
+        self.slow_s = slow_s
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.budget = budget
+        self.backoff = 1.0
+        self._retry_after = 0.0
+
+    def observe(self, *, status: int | None = None, elapsed: float | None = None, error: bool = False,
+                retry_after: float | None = None):
+        if error or status == 429 or (status is not None and status >= 500):
+            self.backoff = min(self.max_backoff, self.backoff * 2)
+        elif elapsed is not None and elapsed > self.slow_s:
+            self.backoff = min(self.max_backoff, self.backoff * 1.5)
+        else:
+            self.backoff = max(1.0, self.backoff / 2)
+        self._retry_after = retry_after or 0.0
+
+    def base_delay(self, now: datetime, release: datetime | None) -> float:
+        """Delay from the position relative to the release window alone (no backoff, jitter or budget)."""
+        if release is None:
+            return self.far
+        d = (release - now).total_seconds()
+        if -self.after <= d <= self.before:
+            return self.hot
+        gap = d - self.before if d > self.before else -d - self.after
+        delay = min(self.far, max(self.hot, gap / self.ramp))
+        if d > self.before:
+            delay = min(delay, max(gap, 0.5))  # tiba tepat di awal jendela
+        return delay
+
+    def prompt_delay(self) -> float:
+        """Delay for an out-of-schedule check (e.g. a new subscriber): only backoff, Retry-After and budget apply."""
+        delay = max(self._retry_after, self.hot * (self.backoff - 1))
+        if self.budget is not None:
+            t = time.monotonic()
+            delay = self.budget.reserve(t + delay) - t
+        return max(0.5, delay)
+
+    def next_delay(self, now: datetime, release: datetime | None) -> float:
+        delay = self.base_delay(now, release) * self.backoff
+        delay = min(max(delay, self._retry_after), max(self.far, self._retry_after))
+        delay *= 1 + random.uniform(-self.jitter, self.jitter)
+        if self.budget is not None:
+            t = time.monotonic()
+            delay = self.budget.reserve(t + delay) - t
+        return max(0.5, delay)
@@ -0,0 +1,174 @@
+"""Server clock offset from HTTP ``Date`` headers.
+
+A ``Date`` header only has one-second resolution, but it tells us the
+server's clock read some value in ``[D, D + 1)`` at a moment between sending
+the request and receiving the response headers. Each response therefore
+bounds ``offset = server - local`` to ``[D - received, D + 1 - sent]``;
+intersecting the bounds of recent responses (taken at different sub-second
+phases) narrows the estimate well below one second. When the samples stop
+agreeing (the server clock was stepped, or a different backend answered) the
+oldest ones are dropped until they agree again.
+
+``timed_request`` and friends in ``network_opt`` feed every response into the
+clocks registered with ``track()``.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import date, datetime, timedelta
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+log = logging.getLogger(__name__)
+
+
+class ClockSync:
+    """Offset estimate for one host plus a per-day history persisted as JSON."""
+
+    def __init__(self, host: str | None = None, *, window: int = 64, max_age: float = 1800.0,
+                 history_path: str | None = None, history_days: int = 30, save_every: float = 60.0):
+        self.host = host
+        self.max_age = max_age
+        self.history_path = history_path
+        self.history_days = history_days
+        self.save_every = save_every
+        self._samples: deque = deque(maxlen=window)  # (monotonic, lo, hi)
+        self._lock = threading.Lock()
+        self._bounds: tuple[float, float] | None = None
+        self._history: dict[str, dict] = self._load_history()
+        self._saved_at = 0.0
+        self.samples = 0
+        self.resets = 0
+
+    # ---------- sampling ----------
+    def observe(self, url: str, date_header: str | None, sent_at: float, received_at: float) -> bool:
+        """Add one response (wall-clock ``time.time()`` bounds); False if it is not usable."""
+        if not date_header or (self.host and urlsplit(url).hostname != self.host):
+            return False
+        try:
+            server = parsedate_to_datetime(date_header).timestamp()
+        except (TypeError, ValueError):
+            return False
+        lo, hi = server - received_at, server + 1.0 - sent_at
+        now = time.monotonic()
+        with self._lock:
+            self._samples.append((now, lo, hi))
+            self.samples += 1
+            self._bounds = self._intersect(now)
+            est = self._estimate_locked()
+            self._record_day(est)
+            save = self.history_path and now - self._saved_at >= self.save_every
+            if save:
+                self._saved_at = now
+                snapshot = json.dumps(self._history, sort_keys=True)
+        if save:
+            self._write_history(snapshot)
+        return True
+
+    def _intersect(self, now: float) -> tuple[float, float] | None:
+        while self._samples and now - self._samples[0][0] > self.max_age:
+            self._samples.popleft()
+        while self._samples:
+            lo = max(s[1] for s in self._samples)
+            hi = min(s[2] for s in self._samples)
+            if lo <= hi:
+                return lo, hi
+            self._samples.popleft()  # tidak konsisten: buang sampel tertua
+            self.resets += 1
+        return None
+
+    def _estimate_locked(self) -> tuple[float, float] | None:
+        if self._bounds is None:
+            return None
+        lo, hi = self._bounds
+        return (lo + hi) / 2, (hi - lo) / 2
+
+    # ---------- estimate ----------
+    def estimate(self) -> tuple[float, float] | None:
+        """``(offset, uncertainty)`` in seconds (server = local + offset), or None without samples."""
+        with self._lock:
+            self._bounds = self._intersect(time.monotonic())
+            return self._estimate_locked()
+
+    def to_local(self, server_at: datetime, max_uncertainty: float | None = None) -> datetime:
+        """Local moment at which the server clock shows ``server_at`` (unchanged without a usable estimate)."""
+        est = self.estimate()
+        if est is None or (max_uncertainty is not None and est[1] > max_uncertainty):
+            return server_at
+        return server_at - timedelta(seconds=est[0])
+
+    @property
+    def stats(self) -> dict:
+        est = self.estimate()
+        return {"samples": self.samples, "window": len(self._samples), "resets": self.resets,
+                "offset_s": round(est[0], 3) if est else None,
+                "uncertainty_s": round(est[1], 3) if est else None}
+
+    # ---------- history ----------
+    def _record_day(self, est: tuple[float, float] | None):
+        if est is None:
+            return
+        offset, err = est
+        day = self._history.setdefault(date.today().isoformat(), {"samples": 0, "min": offset, "max": offset})
+        day["samples"] += 1
+        day["min"] = round(min(day["min"], offset), 3)
+        day["max"] = round(max(day["max"], offset), 3)
+        day["last"] = round(offset, 3)
+        day["uncertainty"] = round(err, 3)
+        if len(self._history) > self.history_days:
+            for k in sorted(self._history)[:-self.history_days]:
+                del self._history[k]
+
+    def history(self, days: int | None = None) -> list[tuple[str, dict]]:
+        """Per-day summaries, oldest first: samples, min/max/last offset and the last uncertainty."""
+        with self._lock:
+            items = sorted((k, dict(v)) for k, v in self._history.items())
+        return items[-days:] if days else items
+
+    def _load_history(self) -> dict:
+        if not self.history_path or not os.path.exists(self.history_path):
+            return {}
+        try:
+            with open(self.history_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError) as e:
+            log.warning("riwayat offset jam tidak terbaca (%s): %s", self.history_path, e)
+            return {}
+
+    def _write_history(self, payload: str):
+        tmp = self.history_path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(payload)
+            os.replace(tmp, self.history_path)
+        except OSError as e:
+            log.warning("gagal menyimpan riwayat offset jam: %s", e)
+
+    def close(self):
+        """Flush the history file."""
+        if not self.history_path:
+            return
+        with self._lock:
+            snapshot = json.dumps(self._history, sort_keys=True)
+        self._write_history(snapshot)
+
+
+_CLOCKS: list[ClockSync] = []
+
+
+def track(clock: ClockSync) -> ClockSync:
+    """Feed every response seen by ``network_opt`` into ``clock``."""
+    _CLOCKS.append(clock)
+    return clock
+
+
+def observe_response(url: str, headers, sent_at: float, received_at: float):
+    if not _CLOCKS or headers.get("Age"):
+        return  # respons dari cache: Date-nya milik respons asli
+    date_header = headers.get("Date")
+    for clock in _CLOCKS:
+        clock.observe(url, date_header, sent_at, received_at)
@@ -0,0 +1,150 @@
+"""Time-ordered index of stored jobs.
+
+Keeps every user's jobs, plus all jobs globally, in lists sorted by a
+precomputed ``run_at``. "Job #N" is a list index and "next job after T" is
+a bisect, instead of re-sorting every record with ``strptime`` on each
+``/jobs``. The store updates it on every put/delete (see
+``store.SqliteStore.attach_index``).
+
+Jobs are also grouped by a fingerprint of their cookie set, so the next job
+sharing a session is found without comparing cookie dicts job by job.
+"""
+import bisect
+import hashlib
+import json
+import threading
+from datetime import datetime
+from operator import itemgetter
+
+_RUN_AT = itemgetter(0)
+
+
+def cookie_fingerprint(cookies: dict | None) -> bytes:
+    """Order-independent digest of a cookie set.
+
+    Only non-empty values count: ``_ga=""`` and a missing ``_ga`` are the same
+    session (the SQLite store turns ``None`` into ``""``). A set with no values
+    at all (jobs on the global ci_session) is a group of its own, ``b""``.
+    """
+    present = {k: v for k, v in (cookies or {}).items() if v}
+    if not present:
+        return b""
+    canon = json.dumps(present, sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(canon.encode("utf-8"), digest_size=16).digest()
+
+
+class JobIndex:
+    """Per-user and global ``run_at`` order; ties broken by job name."""
+
+    def __init__(self, run_at_of):
+        self._run_at_of = run_at_of  # rec -> datetime aware (job tak valid → sentinel paling akhir)
+        self._lock = threading.RLock()
+        self._user: dict[str, list[tuple[datetime, str]]] = {}
+        self._global: list[tuple[datetime, str, str]] = []
+        self._run_at: dict[tuple[str, str], datetime] = {}
+        self._fp: dict[tuple[str, str], bytes] = {}
+        self._by_cookie: dict[tuple[str, bytes], list[tuple[datetime, str]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._run_at)
+
+    def rebuild(self, items):
+        """Replace the whole index from ``(user_id, name, record)`` triples."""
+        run_at_of = self._run_at_of
+        user: dict[str, list[tuple[datetime, str]]] = {}
+        glob: list[tuple[datetime, str, str]] = []
+        run_at: dict[tuple[str, str], datetime] = {}
+        fps: dict[tuple[str, str], bytes] = {}
+        by_cookie: dict[tuple[str, bytes], list[tuple[datetime, str]]] = {}
+        for uid, name, rec in items:
+            t = run_at_of(rec)
+            run_at[(uid, name)] = t
+            user.setdefault(uid, []).append((t, name))
+            glob.append((t, uid, name))
+            fp = fps[(uid, name)] = cookie_fingerprint(rec.get("cookies"))
+            by_cookie.setdefault((uid, fp), []).append((t, name))
+        for lst in user.values():
+            lst.sort()
+        for lst in by_cookie.values():
+            lst.sort()
+        glob.sort()
+        with self._lock:
+            self._user, self._global, self._run_at = user, glob, run_at
+            self._fp, self._by_cookie = fps, by_cookie
+
+    def put(self, uid: str, name: str, rec: dict):
+        t = self._run_at_of(rec)
+        fp = cookie_fingerprint(rec.get("cookies"))
+        key = (uid, name)
+        with self._lock:
+            old = self._run_at.get(key)
+            if old == t and self._fp.get(key) == fp:
+                return
+            if old is not None:
+                self._remove(uid, name, old)
+            self._run_at[key] = t
+            bisect.insort(self._user.setdefault(uid, []), (t, name))
+            bisect.insort(self._global, (t, uid, name))
+            self._fp[key] = fp
+            bisect.insort(self._by_cookie.setdefault((uid, fp), []), (t, name))
+
+    def remove(self, uid: str, name: str):
+        with self._lock:
+            old = self._run_at.pop((uid, name), None)
+            if old is not None:
+                self._remove(uid, name, old)
+
+    def _remove(self, uid: str, name: str, t: datetime):
+        lst = self._user[uid]
+        del lst[bisect.bisect_left(lst, (t, name))]
+        if not lst:
+            del self._user[uid]
+        del self._global[bisect.bisect_left(self._global, (t, uid, name))]
+        fp = self._fp.pop((uid, name), None)
+        if fp is not None:
+            group = self._by_cookie[(uid, fp)]
+            del group[bisect.bisect_left(group, (t, name))]
+            if not group:
+                del self._by_cookie[(uid, fp)]
+
+    # ---------- per user ----------
+    def run_at(self, uid: str, name: str) -> datetime | None:
+        return self._run_at.get((uid, name))
+
+    def names(self, uid: str) -> list[str]:
+        with self._lock:
+            return [name for _, name in self._user.get(uid, ())]
+
+    def nth(self, uid: str, idx: int) -> str | None:
+        """1-based position in the ``/jobs`` order."""
+        with self._lock:
+            lst = self._user.get(uid, ())
+            return lst[idx - 1][1] if 1 <= idx <= len(lst) else None
+
+    def upcoming(self, uid: str, after: datetime) -> list[str]:
+        """The user's job names with ``run_at`` strictly after ``after``, soonest first."""
+        with self._lock:
+            lst = self._user.get(uid, ())
+            i = bisect.bisect_right(lst, after, key=_RUN_AT)
+            return [name for _, name in lst[i:]]
+
+    def same_cookies(self, uid: str, cookies: dict | None, after: datetime) -> list[str]:
+        """The user's jobs sharing exactly this cookie set with ``run_at`` after ``after``."""
+        fp = cookie_fingerprint(cookies)
+        with self._lock:
+            group = self._by_cookie.get((uid, fp), ())
+            i = bisect.bisect_right(group, after, key=_RUN_AT)
+            return [name for _, name in group[i:]]
+
+    # ---------- global ----------
+    def due_between(self, start: datetime, end: datetime) -> list[tuple[datetime, str, str]]:
+        """All ``(run_at, user_id, name)`` with ``start < run_at <= end``."""
+        with self._lock:
+            lo = bisect.bisect_right(self._global, start, key=_RUN_AT)
+            hi = bisect.bisect_right(self._global, end, key=_RUN_AT)
+            return self._global[lo:hi]
+
+    def next_after(self, after: datetime) -> tuple[datetime, str, str] | None:
+        with self._lock:
+            i = bisect.bisect_right(self._global, after, key=_RUN_AT)
+            return self._global[i] if i < len(self._global) else None
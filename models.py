@@ -0,0 +1,296 @@
+"""Immutable job records.
+
+A stored job used to be a free-form nested dict (``profile._leader``,
+``profile._members``, ``cookies``...) that was deep-copied on every schedule
+and copied again into ``job.data``. These slotted, frozen classes hold the
+same data once and are shared as-is between the store and the JobQueue.
+
+Every model is a read-only ``Mapping`` over its JSON keys, so existing reads
+(``rec["exec_iso"]``, ``prof.get("_leader", {})``, ``"name" in prof``) work
+unchanged; edits go through ``replace()``. ``to_dict()``/``from_dict()``
+round-trip the current JSON shape: keys that were absent stay absent and
+unknown keys are kept in ``extra``. Short code-like values (gender, country,
+dates, cookie values...) are interned so thousands of jobs share one copy.
+
+``JobHeader`` is a record minus its profile (plus the leader name and head
+count ``/jobs`` shows); stores keep headers resident and load profiles only
+when a job is about to run or is opened.
+"""
+import sys
+from collections.abc import Mapping
+from dataclasses import dataclass, field, fields
+
+
+class _Missing:
+    __slots__ = ()
+
+    def __repr__(self):
+        return "MISSING"
+
+    def __bool__(self):
+        return False
+
+
+MISSING = _Missing()  # key tidak ada di JSON asal (beda dengan nilai None/"")
+
+
+_NO_EXTRA: dict = {}  # dibagi semua record tanpa key tambahan; jangan diubah
+
+
+def _intern(v):
+    return sys.intern(v) if type(v) is str else v
+
+
+def to_plain(obj):
+    """``json.dumps(default=...)`` hook: models serialize as their dict form."""
+    if isinstance(obj, _Model):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _model(cls):
+    cls = dataclass(frozen=True, slots=True, eq=False)(cls)
+    cls._KEYS = tuple(f.name for f in fields(cls) if f.name != "extra" and f.name not in cls._DERIVED)
+    cls._KEYSET = frozenset(cls._KEYS)
+    return cls
+
+
+class _Model(Mapping):
+    __slots__ = ()
+    _KEYS = ()
+    _KEYSET = frozenset()
+    _DERIVED = frozenset()  # field turunan, bukan key JSON
+    _INTERN = frozenset()  # key yang nilainya di-intern
+    _CONVERT = {}          # key -> fungsi pembentuk nilai nested
+
+    def __getitem__(self, key):
+        if key in self._KEYSET:
+            v = getattr(self, key)
+            if v is MISSING:
+                raise KeyError(key)
+            return v
+        return self.extra[key]
+
+    def __contains__(self, key) -> bool:
+        if key in self._KEYSET:
+            return getattr(self, key) is not MISSING
+        return key in self.extra
+
+    def __iter__(self):
+        for k in self._KEYS:
+            if getattr(self, k) is not MISSING:
+                yield k
+        yield from self.extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+    def to_dict(self) -> dict:
+        out = {}
+        for k in self._KEYS:
+            v = getattr(self, k)
+            if v is MISSING:
+                continue
+            if isinstance(v, _Model):
+                v = v.to_dict()
+            elif type(v) is tuple:
+                v = [x.to_dict() if isinstance(x, _Model) else x for x in v]
+            out[k] = v
+        out.update(self.extra)
+        return out
+
+    @classmethod
+    def from_dict(cls, d, **derived):
+        if isinstance(d, cls):
+            return d
+        kw = {}
+        extra = {}
+        for k, v in (d or {}).items():
+            if k in cls._KEYSET:
+                conv = cls._CONVERT.get(k)
+                if conv is not None:
+                    v = conv(v)
+                elif k in cls._INTERN:
+                    v = _intern(v)
+                kw[k] = v
+            else:
+                extra[k] = v
+        return cls(**kw, **derived, extra=extra or _NO_EXTRA)
+
+    def replace(self, **changes):
+        """New record with ``changes`` applied (values may be plain dicts)."""
+        d = {k: self[k] for k in self}
+        d.update(changes)
+        return type(self).from_dict(d)
+
+
+@_model
+class Cookies(_Model):
+    _ga: str = MISSING
+    _ga_TMVP85FKW9: str = MISSING
+    ci_session: str = MISSING
+    extra: dict = field(default_factory=lambda: _NO_EXTRA)
+
+    _INTERN = frozenset({"_ga", "_ga_TMVP85FKW9", "ci_session"})  # satu sesi dipakai banyak job
+
+
+@_model
+class Leader(_Model):
+    id_country: str = MISSING
+    id_gender: str = MISSING
+    id_identity: str = MISSING
+    name: str = MISSING
+    identity_no: str = MISSING
+    hp: str = MISSING
+    birthdate: str = MISSING
+    address: str = MISSING
+    id_province: str = MISSING
+    id_district: str = MISSING
+    pendamping: str = MISSING
+    organisasi: str = MISSING
+    leader_setuju: str = MISSING
+    bank: str = MISSING
+    extra: dict = field(default_factory=lambda: _NO_EXTRA)
+
+    _INTERN = frozenset({"id_country", "id_gender", "id_identity", "birthdate", "id_province", "id_district",
+                         "pendamping", "leader_setuju", "bank"})
+
+
+@_model
+class Member(_Model):
+    nama: str = MISSING
+    birthdate: str = MISSING
+    id_gender: str = MISSING
+    alamat: str = MISSING
+    id_identity: str = MISSING
+    identity_no: str = MISSING
+    hp_member: str = MISSING
+    hp_keluarga: str = MISSING
+    id_job: str = MISSING
+    id_country: str = MISSING
+    anggota_setuju: str = MISSING
+    extra: dict = field(default_factory=lambda: _NO_EXTRA)
+
+    _INTERN = frozenset({"birthdate", "id_gender", "id_identity", "id_job", "id_country", "anggota_setuju"})
+
+
+def _member_tuple(v):
+    return tuple(Member.from_dict(m) for m in (v or ()))
+
+
+@_model
+class SemeruProfile(_Model):
+    _leader: Leader = MISSING
+    _members: tuple = MISSING
+    extra: dict = field(default_factory=lambda: _NO_EXTRA)
+
+    _CONVERT = {"_leader": Leader.from_dict, "_members": _member_tuple}
+
+
+@_model
+class BromoProfile(_Model):
+    id_country: str = MISSING
+    id_gender: str = MISSING
+    id_identity: str = MISSING
+    id_gate: str = MISSING
+    id_vehicle: str = MISSING
+    vehicle_count: str = MISSING
+    bank: str = MISSING
+    male: str = MISSING
+    female: str = MISSING
+    birthdate: str = MISSING
+    address: str = MISSING
+    id_province: str = MISSING
+    id_district: str = MISSING
+    name: str = MISSING
+    identity_no: str = MISSING
+    hp: str = MISSING
+    extra: dict = field(default_factory=lambda: _NO_EXTRA)
+
+    _INTERN = frozenset({"id_country", "id_gender", "id_identity", "id_gate", "id_vehicle", "vehicle_count",
+                         "bank", "male", "female", "birthdate", "id_province", "id_district"})
+
+
+def make_profile(v):
+    """Semeru profiles carry ``_leader``/``_members``; anything else is a Bromo profile."""
+    if v is None or v is MISSING or isinstance(v, (SemeruProfile, BromoProfile)):
+        return v
+    if "_leader" in v or "_members" in v:
+        return SemeruProfile.from_dict(v)
+    return BromoProfile.from_dict(v)
+
+
+def leader_name(profile) -> str:
+    if not profile:
+        return ""
+    return profile.get("name") or (profile.get("_leader") or {}).get("name") or ""
+
+
+def participant_count(profile) -> int:
+    prof = profile or {}
+    # Bromo: 1 leader + male + female
+    if "name" in prof:
+        try:
+            return 1 + int(prof.get("male", "0") or 0) + int(prof.get("female", "0") or 0)
+        except (TypeError, ValueError):
+            return 1
+    # Semeru: leader + jumlah anggota
+    mem = prof.get("_members", ())
+    return 1 + (len(mem) if isinstance(mem, (list, tuple)) else 0)
+
+
+def _cookies(v):
+    return None if v is None else Cookies.from_dict(v)
+
+
+@_model
+class JobRecord(_Model):
+    booking_iso: str = MISSING
+    exec_iso: str = MISSING
+    time: str = MISSING
+    profile: Mapping = MISSING
+    cookies: Cookies = MISSING
+    reminder_minutes: int | None = MISSING
+    created_at: str = MISSING
+    chat_id: int = MISSING
+    extra: dict = field(default_factory=lambda: _NO_EXTRA)
+
+    _INTERN = frozenset({"booking_iso", "exec_iso", "time"})
+    _CONVERT = {"profile": make_profile, "cookies": _cookies}
+
+    @property
+    def leader(self) -> str:
+        return leader_name(self.profile or None)
+
+    @property
+    def pax(self) -> int:
+        return participant_count(self.profile or None)
+
+
+@_model
+class JobHeader(_Model):
+    """A ``JobRecord`` without its profile: enough for listing, selectors and the index."""
+
+    booking_iso: str = MISSING
+    exec_iso: str = MISSING
+    time: str = MISSING
+    cookies: Cookies = MISSING
+    reminder_minutes: int | None = MISSING
+    created_at: str = MISSING
+    chat_id: int = MISSING
+    leader: str = ""
+    pax: int = 1
+    extra: dict = field(default_factory=lambda: _NO_EXTRA)
+
+    _DERIVED = frozenset({"leader", "pax"})
+    _INTERN = JobRecord._INTERN
+    _CONVERT = {"cookies": _cookies}
+
+    def with_profile(self, profile) -> JobRecord:
+        return JobRecord(booking_iso=self.booking_iso, exec_iso=self.exec_iso, time=self.time,
+                         profile=make_profile(profile), cookies=self.cookies,
+                         reminder_minutes=self.reminder_minutes, created_at=self.created_at,
+                         chat_id=self.chat_id, extra=self.extra)
@@ -1,45 +1,92 @@
+import asyncio
+import concurrent.futures
 import logging
 import random
+import threading
 import time
+import weakref
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from urllib.parse import quote_plus
 
+import httpx
 import requests
 from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
 from urllib3.util.retry import Retry
 
+from clock_sync import observe_response
+
 log = logging.getLogger("netopt")
 
 
-def create_optimized_session(pool_maxsize: int = 100) -> requests.Session:
-    """Return a requests.Session with a large connection pool and keep-alive."""
-    sess = requests.Session()
-    # Disable built-in retries; we'll handle retries manually.
-    retry = Retry(total=0)
-    adapter = HTTPAdapter(
-        max_retries=retry,
-        pool_connections=pool_maxsize,
-        pool_maxsize=pool_maxsize,
-    )
-    sess.mount("https://", adapter)
-    sess.mount("http://", adapter)
-    sess.headers.update({
-        "User-Agent": (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/116.0.0.0 Safari/537.36"
-        ),
-        "Accept": "*/*",
-        "Accept-Language": "id,en;q=0.9",
-        "Connection": "keep-alive",
-    })
-    return sess
+DEFAULT_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/116.0.0.0 Safari/537.36"
+    ),
+    "Accept": "*/*",
+    "Accept-Language": "id,en;q=0.9",
+    "Connection": "keep-alive",
+}
+
+
+# ---------- waktu connect (TCP+TLS) per thread ----------
+_connect_local = threading.local()
+
+
+def take_connect_time() -> float:
+    """Seconds this thread spent opening sockets (TCP+TLS) since the last call; 0 when the pool reused one."""
+    spent = getattr(_connect_local, "seconds", 0.0)
+    _connect_local.seconds = 0.0
+    return spent
+
+
+class _ConnectTimer:
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _connect_local.seconds = getattr(_connect_local, "seconds", 0.0) + time.perf_counter() - start
+
+
+class _TimedHTTPConnection(_ConnectTimer, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_ConnectTimer, HTTPSConnection):
+    pass
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """``HTTPAdapter`` whose new connections report their setup time to ``take_connect_time()``."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _TimedHTTPConnectionPool,
+                                                   "https": _TimedHTTPSConnectionPool}
 
 
 def timed_request(sess: requests.Session, method: str, url: str, **kwargs):
-    """Perform request and log connect+TTFB and total latency."""
+    """Perform request and log connect+TTFB and total latency; the Date header feeds ``clock_sync``."""
+    sent = time.time()
     start = time.perf_counter()
     resp = sess.request(method, url, **kwargs)
     ttfb = resp.elapsed.total_seconds()
     total = time.perf_counter() - start
+    observe_response(resp.url, resp.headers, sent, sent + total)
     log.info("latency %s %s connect+ttfb=%.3f total=%.3f", method, url, ttfb, total)
     return resp, ttfb, total
 
@@ -75,3 +122,440 @@ def short_window_aggressive(attempt_fn, attempts: int = 3, base_delay: float = 0
         delay = decorrelated_jitter(delay)
         time.sleep(delay)
     return last
+
+
+def retry_after_seconds(value: str | None) -> float | None:
+    """``Retry-After`` as seconds from now: delta-seconds or HTTP-date form; None if absent or unparseable."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if at.tzinfo is None:
+        at = at.replace(tzinfo=timezone.utc)  # "-0000": UTC
+    return max(0.0, (at - datetime.now(timezone.utc)).total_seconds())
+
+
+def _pool_connections(adapter: HTTPAdapter) -> int:
+    pools = adapter.poolmanager.pools
+    opened = 0
+    for pool_key in pools.keys():
+        pool = pools.get(pool_key)
+        if pool is not None:
+            opened += pool.num_connections
+    return opened
+
+
+class _Client:
+    __slots__ = ("sess", "setup", "last_used")
+
+    def __init__(self, sess: requests.Session, setup):
+        self.sess = sess
+        self.setup = setup
+        self.last_used = time.monotonic()
+
+
+class ClientRegistry:
+    """Long-lived ``requests.Session`` objects shared by the whole process.
+
+    ``ephemeral()`` gives a new, unshared session (own jar and headers) for
+    every flow that writes headers or cookies: booking flows, prewarm, token
+    priming. ``session(key)`` caches one session per key and is only for
+    read-only callers (anonymous capacity checks) where sharing is harmless.
+    All sessions with the same retry policy mount one shared ``HTTPAdapter``,
+    so TCP/TLS connections to the host are reused either way. Cached sessions
+    unused for ``idle_ttl`` seconds are dropped; the pools live until ``close()``.
+    """
+
+    def __init__(self, idle_ttl: float = 600.0, pool_maxsize: int = 32):
+        self.idle_ttl = idle_ttl
+        self.pool_maxsize = pool_maxsize
+        self._lock = threading.Lock()
+        self._clients: dict = {}
+        self._adapters: dict[int, tuple[Retry | None, HTTPAdapter]] = {}
+        self._last_sweep = time.monotonic()
+        self.created = 0
+        self.reused = 0
+        self.evicted = 0
+
+    def _adapter(self, retry: Retry | None) -> HTTPAdapter:
+        # satu adapter (pool koneksi) per objek Retry; pakai konstanta modul agar tidak berlipat
+        key = id(retry)
+        entry = self._adapters.get(key)
+        if entry is None:
+            adapter = TimedHTTPAdapter(
+                max_retries=retry if retry is not None else Retry(total=0),
+                pool_connections=10,
+                pool_maxsize=self.pool_maxsize,
+            )
+            entry = self._adapters[key] = (retry, adapter)
+        return entry[1]
+
+    def session(self, key, setup=None, *, retry: Retry | None = None) -> requests.Session:
+        """Pooled session for ``key``; ``setup(sess)`` installs headers/cookies when it is created."""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_sweep > self.idle_ttl / 4:
+                self._evict_idle(now)
+            client = self._clients.get(key)
+            if client is None:
+                sess = requests.Session()
+                adapter = self._adapter(retry)
+                sess.mount("https://", adapter)
+                sess.mount("http://", adapter)
+                client = self._clients[key] = _Client(sess, setup)
+                self.created += 1
+                if setup is not None:
+                    setup(sess)
+            else:
+                self.reused += 1
+            client.last_used = now
+        return client.sess
+
+    def ephemeral(self, setup=None, *, retry: Retry | None = None) -> requests.Session:
+        """New session mounting the shared pool for ``retry``; never cached, so nothing else uses its jar."""
+        sess = requests.Session()
+        with self._lock:
+            adapter = self._adapter(retry)
+            self.created += 1
+        sess.mount("https://", adapter)
+        sess.mount("http://", adapter)
+        if setup is not None:
+            setup(sess)
+        return sess
+
+    def _evict_idle(self, now: float):
+        self._last_sweep = now
+        stale = [k for k, c in self._clients.items() if now - c.last_used > self.idle_ttl]
+        for k in stale:
+            del self._clients[k]  # jangan sess.close(): adapter-nya dipakai bersama
+        self.evicted += len(stale)
+
+    def evict_idle(self) -> int:
+        with self._lock:
+            before = self.evicted
+            self._evict_idle(time.monotonic())
+            return self.evicted - before
+
+    def discard(self, key):
+        with self._lock:
+            self._clients.pop(key, None)
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            opened = sum(_pool_connections(adapter) for _, adapter in self._adapters.values())
+            return {"clients": len(self._clients), "created": self.created, "reused": self.reused,
+                    "evicted": self.evicted, "connections_opened": opened}
+
+    def close(self):
+        with self._lock:
+            self._clients.clear()
+            adapters, self._adapters = self._adapters, {}
+        for _, adapter in adapters.values():
+            adapter.close()
+
+
+# Registry bersama untuk seluruh proses (bot-semeru / bot-bromo)
+CLIENTS = ClientRegistry()
+
+
+def no_cookie_jar(sess: requests.Session):
+    """``setup`` for sessions that send their own ``cookie`` header: never store server cookies."""
+    sess.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+
+class FormTemplate:
+    """``application/x-www-form-urlencoded`` body encoded once; only ``slots`` are filled per send.
+
+    Produces the same bytes ``requests`` sends for ``data=fields`` (field
+    order kept, ``quote_plus``, ``None`` values dropped). Post the result with
+    ``data=body, headers=FormTemplate.HEADERS``.
+    """
+
+    __slots__ = ("_parts",)
+    HEADERS = {"Content-Type": "application/x-www-form-urlencoded"}
+
+    def __init__(self, fields: dict, slots=()):
+        parts: list = []
+        literal = ""
+        first = True
+        for k, v in fields.items():
+            if v is None and k not in slots:
+                continue
+            literal += ("" if first else "&") + quote_plus(str(k)) + "="
+            first = False
+            if k in slots:
+                parts.append(literal.encode("ascii"))
+                parts.append(k)
+                literal = ""
+            else:
+                literal += quote_plus(str(v))
+        parts.append(literal.encode("ascii"))
+        self._parts = tuple(p for p in parts if p != b"")
+
+    def render(self, **values) -> bytes:
+        return b"".join(p if type(p) is bytes else quote_plus(str(values[p])).encode("ascii")
+                        for p in self._parts)
+
+
+# ---------- asyncio transport (httpx) ----------
+def _httpx_timeout(timeout) -> httpx.Timeout:
+    """``requests``-style timeout (seconds or ``(connect, read)``) as ``httpx.Timeout``."""
+    if isinstance(timeout, httpx.Timeout):
+        return timeout
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+        return httpx.Timeout(read, connect=connect)
+    return httpx.Timeout(timeout)
+
+
+def create_async_client(pool_maxsize: int = 100, timeout=30, store_cookies: bool = True) -> httpx.AsyncClient:
+    """``httpx.AsyncClient`` with a keep-alive pool, following redirects like requests.
+
+    With ``store_cookies=False`` cookies the server sets are dropped, as with ``no_cookie_jar``.
+    """
+    cookies = None
+    if not store_cookies:
+        cookies = CookieJar(policy=DefaultCookiePolicy(allowed_domains=[]))
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize),
+        timeout=_httpx_timeout(timeout),
+        headers=DEFAULT_HEADERS,
+        cookies=cookies,
+        follow_redirects=True,
+    )
+
+
+async def timed_request_async(client: httpx.AsyncClient, method: str, url: str, **kwargs):
+    """Async ``timed_request``: returns (response, elapsed on the wire, total)."""
+    sent = time.time()
+    start = time.perf_counter()
+    resp = await client.request(method, url, **kwargs)
+    ttfb = resp.elapsed.total_seconds()
+    total = time.perf_counter() - start
+    observe_response(str(resp.url), resp.headers, sent, sent + total)
+    log.info("latency %s %s connect+ttfb=%.3f total=%.3f", method, url, ttfb, total)
+    return resp, ttfb, total
+
+
+class AsyncTransport:
+    """Coroutine HTTP client with the retry/backoff semantics of ``urllib3.Retry``.
+
+    Each event loop that awaits ``request()`` gets its own ``httpx.AsyncClient``
+    (connections belong to the loop that opened them), so hundreds of polls
+    share one thread and a few sockets. Sync code in worker threads calls
+    ``request_sync()`` / ``run_sync()``, which run the coroutine on a private
+    bridge loop thread and give up after ``sync_timeout`` seconds; that keeps
+    the old flows working while they migrate. Never call them from a thread
+    running an event loop: that loop stalls until the bridge answers.
+
+    Retries cover transport errors and ``status_forcelist`` responses, sleeping
+    ``backoff * 2**(n-1)`` (first retry immediate) or the server's ``Retry-After``.
+    The returned response carries ``extensions["timing"]``: connect, TTFB and
+    status of its last attempt.
+    """
+
+    def __init__(self, *, retries: int = 0, backoff: float = 0.0, status_forcelist=(429, 502, 503, 504),
+                 timeout=30, pool_maxsize: int = 100, store_cookies: bool = False, sync_timeout: float = 60.0):
+        self.retries = retries
+        self.backoff = backoff
+        self.status_forcelist = frozenset(status_forcelist)
+        self.timeout = timeout
+        self.pool_maxsize = pool_maxsize
+        self.store_cookies = store_cookies
+        self.sync_timeout = sync_timeout
+        self._clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()  # loop -> AsyncClient
+        self._lock = threading.Lock()
+        self._bridge_loop: asyncio.AbstractEventLoop | None = None
+        self.requests = 0
+        self.retried = 0
+        self.connections_opened = 0
+
+    def _client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            client = create_async_client(self.pool_maxsize, self.timeout, self.store_cookies)
+            with self._lock:
+                self._clients[loop] = client
+        return client
+
+    async def _trace(self, event: str, info: dict):
+        if event == "connection.connect_tcp.complete":
+            self.connections_opened += 1
+
+    @staticmethod
+    def _wire_timing(marks: dict, status: int) -> dict:
+        """connect (TCP+TLS) and TTFB seconds of one attempt, from the ``perf_counter`` of its trace events."""
+        start = marks.get("connection.connect_tcp.started")
+        ready = marks.get("connection.start_tls.complete") or marks.get("connection.connect_tcp.complete")
+        sent = marks.get("http11.send_request_headers.started") or marks.get("http2.send_request_headers.started")
+        head = (marks.get("http11.receive_response_headers.complete")
+                or marks.get("http2.receive_response_headers.complete"))
+        return {"connect_s": ready - start if start and ready else 0.0,
+                "ttfb_s": head - sent if sent and head else 0.0, "status": status}
+
+    def _sleep_for(self, attempt: int, resp: httpx.Response | None) -> float:
+        if resp is not None:
+            retry_after = retry_after_seconds(resp.headers.get("Retry-After"))
+            if retry_after is not None:
+                return retry_after
+        return 0.0 if attempt <= 1 else self.backoff * (2 ** (attempt - 1))
+
+    async def request(self, method: str, url: str, *, retries: int | None = None, timeout=None,
+                      **kwargs) -> httpx.Response:
+        client = self._client()
+        retries = self.retries if retries is None else retries
+        if timeout is not None:
+            kwargs["timeout"] = _httpx_timeout(timeout)
+        marks: dict = {}
+
+        async def trace(event: str, info: dict):
+            marks[event] = time.perf_counter()
+            await self._trace(event, info)
+
+        kwargs.setdefault("extensions", {})["trace"] = trace
+        self.requests += 1
+        attempt = 0
+        while True:
+            resp = None
+            marks.clear()
+            sent = time.time()
+            try:
+                resp = await client.request(method, url, **kwargs)
+            except httpx.TransportError:
+                if attempt >= retries:
+                    raise
+            else:
+                observe_response(str(resp.url), resp.headers, sent, time.time())
+                resp.extensions["timing"] = self._wire_timing(marks, resp.status_code)
+                if resp.status_code not in self.status_forcelist or attempt >= retries:
+                    return resp
+            attempt += 1
+            self.retried += 1
+            await asyncio.sleep(self._sleep_for(attempt, resp))
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    # ---------- jembatan untuk kode sync ----------
+    def _bridge(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._bridge_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="http-bridge", daemon=True).start()
+                self._bridge_loop = loop
+            return self._bridge_loop
+
+    def run_sync(self, coro, timeout: float | None = None):
+        """Run ``coro`` from sync code and return its result; cancelled after ``timeout`` (default ``sync_timeout``)."""
+        fut = asyncio.run_coroutine_threadsafe(coro, self._bridge())
+        try:
+            return fut.result(self.sync_timeout if timeout is None else timeout)
+        except concurrent.futures.TimeoutError:
+            fut.cancel()
+            raise
+
+    def request_sync(self, method: str, url: str, **kwargs) -> httpx.Response:
+        return self.run_sync(self.request(method, url, **kwargs))
+
+    @property
+    def stats(self) -> dict:
+        return {"requests": self.requests, "retried": self.retried, "connections_opened": self.connections_opened,
+                "loops": len(self._clients)}
+
+    async def aclose(self):
+        """Close the client of the running loop (call before that loop shuts down)."""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    def close(self):
+        """Close the bridge loop and its client; clients of other loops die with their loop."""
+        with self._lock:
+            loop, self._bridge_loop = self._bridge_loop, None
+        if loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.aclose(), loop).result(5)
+        loop.call_soon_threadsafe(loop.stop)
+
+
+class CoalescingCache:
+    """Short-TTL cache for async loads with single-flight coalescing.
+
+    ``await get(key, load)`` returns a value younger than ``ttl``; otherwise it
+    joins the load already in flight for ``key`` on the same event loop or, if
+    none, runs ``load()`` itself. Loads are never joined across loops: a sync
+    caller blocking the bot loop while its bridge-loop call waits on a load
+    owned by that bot loop would deadlock. Finished values are shared by all
+    loops. ``None`` results (failed fetches) are handed to waiters but not
+    cached.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data: dict = {}      # key -> (expires_at, value)
+        self._inflight: dict = {}  # (loop, key) -> asyncio.Future
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get(self, key, load, *, max_age: float | None = None):
+        """``max_age`` (seconds) tightens the TTL for this call; 0 skips the cache but still coalesces."""
+        now = time.monotonic()
+        loop = asyncio.get_running_loop()
+        flight = (loop, key)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and now < entry[0] and (max_age is None or now - (entry[0] - self.ttl) <= max_age):
+                self.hits += 1
+                return entry[1]
+            fut = self._inflight.get(flight)
+            owner = fut is None
+            if owner:
+                fut = self._inflight[flight] = loop.create_future()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        if not owner:
+            return await asyncio.shield(fut)
+        try:
+            value = await load()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(flight, None)
+            if isinstance(e, asyncio.CancelledError):
+                fut.cancel()
+            else:
+                fut.set_exception(e)
+                fut.exception()  # tanpa waiter: jangan dilaporkan "never retrieved"
+            raise
+        with self._lock:
+            self._inflight.pop(flight, None)
+            if value is not None and self.ttl > 0:
+                now = time.monotonic()
+                self._data[key] = (now + self.ttl, value)
+                if len(self._data) > 64:
+                    self._data = {k: v for k, v in self._data.items() if v[0] > now}
+        fut.set_result(value)
+        return value
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    @property
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "coalesced": self.coalesced, "entries": len(self._data)}
@@ -0,0 +1,87 @@
+"""Precision firing for release-time jobs.
+
+The JobQueue wakes a job a few hundred milliseconds early; ``fire_at`` then
+hands the remaining wait to a dedicated thread. That thread maps the
+wall-clock target onto ``perf_counter`` once, sleeps in short slices until
+``SPIN_S`` is left, busy-waits the rest and calls the function right away.
+For the last ``FAST_AHEAD_S`` the interpreter's switch interval is lowered,
+so threads holding the GIL hand it back every ~0.1 ms instead of 5 ms.
+"""
+import concurrent.futures
+import sys
+import threading
+import time
+
+SPIN_S = 0.002  # sisa waktu yang dihabiskan dengan busy-wait
+FAST_AHEAD_S = 0.05  # switch interval diperkecil sejak sisa waktu segini
+FAST_SWITCH_S = 0.0001  # switch interval fase akhir (default Python 0.005)
+
+_switch_lock = threading.Lock()
+_switch_users = 0
+_switch_saved = None
+
+
+def _fast_switch(on: bool):
+    global _switch_users, _switch_saved
+    with _switch_lock:
+        if on:
+            if _switch_users == 0:
+                _switch_saved = sys.getswitchinterval()
+                sys.setswitchinterval(FAST_SWITCH_S)
+            _switch_users += 1
+        else:
+            _switch_users -= 1
+            if _switch_users == 0:
+                sys.setswitchinterval(_switch_saved)
+
+
+def perf_target(wall_at: float) -> float:
+    """``time.time()`` target → ``perf_counter`` target, fixed now so later clock slews don't move it."""
+    return time.perf_counter() + (wall_at - time.time())
+
+
+def wait_until(target: float, spin_s: float = SPIN_S) -> float:
+    """Block until ``perf_counter() >= target``; returns how late it returned (seconds)."""
+    while True:
+        left = target - time.perf_counter()
+        if left <= FAST_AHEAD_S:
+            break
+        time.sleep(min(left - FAST_AHEAD_S, 0.5))
+    _fast_switch(True)
+    try:
+        while True:
+            left = target - time.perf_counter()
+            if left <= spin_s:
+                break
+            time.sleep(left - spin_s)
+        while True:
+            now = time.perf_counter()
+            if now >= target:
+                return now - target
+    finally:
+        _fast_switch(False)
+
+
+def fire_at(wall_at: float, fn, *, name: str = "precise-fire") -> concurrent.futures.Future:
+    """Run ``fn()`` on a new thread at ``wall_at``; the future resolves to ``(fire, fn())``.
+
+    ``fire`` holds ``lead_ms`` (how early the wait started) and ``error_ms``
+    (how late ``fn`` was entered relative to the target).
+    """
+    target = perf_target(wall_at)
+    fut: concurrent.futures.Future = concurrent.futures.Future()
+
+    def run():
+        fut.set_running_or_notify_cancel()
+        lead = target - time.perf_counter()
+        late = wait_until(target)
+        fire = {"lead_ms": round(lead * 1000, 3), "error_ms": round(late * 1000, 3)}
+        try:
+            result = fn()
+        except BaseException as e:
+            fut.set_exception(e)
+        else:
+            fut.set_result((fire, result))
+
+    threading.Thread(target=run, name=name, daemon=True).start()
+    return fut
@@ -0,0 +1,819 @@
+import json
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from collections.abc import MutableMapping
+
+from models import JobHeader, JobRecord, leader_name, make_profile, participant_count, to_plain
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX: tanpa kunci antar-proses
+    fcntl = None
+
+log = logging.getLogger("store")
+
+# Kolom skalar job; sisanya (profile, cookies, key tak dikenal) disimpan terpisah.
+JOB_COLUMNS = ("booking_iso", "exec_iso", "time", "reminder_minutes", "created_at", "chat_id")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS users (
+    user_id    TEXT PRIMARY KEY,
+    ci_session TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    user_id          TEXT NOT NULL,
+    name             TEXT NOT NULL,
+    booking_iso      TEXT,
+    exec_iso         TEXT,
+    time             TEXT,
+    reminder_minutes INTEGER,
+    created_at       TEXT,
+    chat_id          INTEGER,
+    profile          TEXT NOT NULL DEFAULT '{}',
+    extra            TEXT,
+    PRIMARY KEY (user_id, name)
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_user_exec ON jobs (user_id, exec_iso, time);
+CREATE TABLE IF NOT EXISTS cookies (
+    user_id  TEXT NOT NULL,
+    job_name TEXT NOT NULL,
+    name     TEXT NOT NULL,
+    value    TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (user_id, job_name, name),
+    FOREIGN KEY (user_id, job_name) REFERENCES jobs (user_id, name) ON DELETE CASCADE
+);
+"""
+
+
+def _dumps(obj) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=to_plain)
+
+
+class JobsView(MutableMapping):
+    """Dict-like view of one user's jobs; every write goes straight to the store."""
+
+    __slots__ = ("_store", "_uid")
+
+    def __init__(self, store, uid: str):
+        self._store = store
+        self._uid = uid
+
+    def __getitem__(self, name: str) -> JobRecord:
+        rec = self._store._get_job(self._uid, name)
+        if rec is None:
+            raise KeyError(name)
+        return rec
+
+    def __setitem__(self, name: str, rec):
+        self._store._put_job(self._uid, name, JobRecord.from_dict(rec))
+
+    def __delitem__(self, name: str):
+        if not self._store._del_job(self._uid, name):
+            raise KeyError(name)
+
+    def rename(self, old: str, new: str, rec):
+        """Store ``rec`` under ``new`` and drop ``old`` in one write."""
+        self._store._rename_job(self._uid, old, new, JobRecord.from_dict(rec))
+
+    def __contains__(self, name) -> bool:
+        return self._store._has_job(self._uid, name)
+
+    def __iter__(self):
+        return iter(self._store._job_names(self._uid))
+
+    def __len__(self) -> int:
+        return self._store._count_jobs(self._uid)
+
+    def items(self):
+        # satu query untuk semua job, bukan N+1 lewat __getitem__
+        return self._store._all_jobs(self._uid).items()
+
+    def ordered_names(self) -> list[str]:
+        """Job names in execution order (needs an attached ``JobIndex``)."""
+        return self._store.index().names(self._uid)
+
+    def ordered_items(self) -> list[tuple[str, JobRecord]]:
+        recs = self._store._all_jobs(self._uid)
+        return [(name, recs[name]) for name in self.ordered_names() if name in recs]
+
+    # header: field record tanpa profile (+ .leader/.pax), tidak membaca profile dari file
+    def header(self, name: str) -> JobHeader | None:
+        return self._store._get_header(self._uid, name)
+
+    def headers(self) -> dict[str, JobHeader]:
+        return self._store._all_headers(self._uid)
+
+    def ordered_headers(self) -> list[tuple[str, JobHeader]]:
+        hdrs = self._store._all_headers(self._uid)
+        return [(name, hdrs[name]) for name in self.ordered_names() if name in hdrs]
+
+
+class _LRU:
+    """Small LRU map; callers hold the owning store's lock."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._d: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._d)
+
+    def get(self, key):
+        v = self._d.get(key)
+        if v is None:
+            self.misses += 1
+            return None
+        self._d.move_to_end(key)
+        self.hits += 1
+        return v
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        self._d[key] = value
+        self._d.move_to_end(key)
+        if len(self._d) > self.maxsize:
+            self._d.popitem(last=False)
+
+    def pop(self, key):
+        self._d.pop(key, None)
+
+    def clear(self):
+        self._d.clear()
+
+
+class SqliteStore:
+    """Job & session store on SQLite (WAL mode).
+
+    Every write commits (or rolls back) on its own, so no write lock is held
+    between calls; ``transaction()`` groups several writes, e.g. a rename
+    (delete old name + insert new one), into one. Several processes (the
+    Semeru and Bromo bots) can share one file: reads never hold a snapshot,
+    and writers wait up to ``busy_timeout`` seconds for each other.
+
+    Only job headers (``models.JobHeader``) stay in memory; a profile is read
+    from the file when the full record is asked for, and the last
+    ``profile_cache`` of them are kept in an LRU. Headers, the LRU and the
+    attached index are reloaded whenever another process has committed.
+    """
+
+    def __init__(self, path: str, busy_timeout: float = 10, profile_cache: int = 256):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, timeout=busy_timeout, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(_SCHEMA)
+        self._migrate_header_columns()
+        self._index = None
+        self._headers: dict[str, dict[str, JobHeader]] = {}
+        self._version = None  # data_version saat header terakhir dimuat
+        self._profiles = _LRU(profile_cache)
+        self._tx_depth = 0  # >0: write ikut transaksi luar, commit di sana
+
+    @contextmanager
+    def transaction(self):
+        """Commit the enclosed writes together, or roll all of them back on error."""
+        with self._lock:
+            if self._tx_depth:
+                yield
+                return
+            self._tx_depth = 1
+            try:
+                with self._conn:
+                    yield
+            except BaseException:
+                self._version = None  # header di memori ikut dibatalkan: muat ulang
+                raise
+            finally:
+                self._tx_depth = 0
+
+    def _migrate_header_columns(self):
+        # file dari versi sebelum kolom leader/pax: tambah kolom & isi sekali dari profile
+        if "leader" in {r[1] for r in self._conn.execute("PRAGMA table_info(jobs)")}:
+            return
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            if "leader" not in {r[1] for r in self._conn.execute("PRAGMA table_info(jobs)")}:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN leader TEXT NOT NULL DEFAULT ''")
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN pax INTEGER NOT NULL DEFAULT 1")
+                rows = self._conn.execute("SELECT user_id, name, profile FROM jobs").fetchall()
+                updates = []
+                for uid, name, profile in rows:
+                    prof = make_profile(json.loads(profile))
+                    updates.append((leader_name(prof), participant_count(prof), uid, name))
+                self._conn.executemany("UPDATE jobs SET leader=?, pax=? WHERE user_id=? AND name=?", updates)
+                log.info("Kolom header job ditambahkan di %s (%d job)", self.path, len(updates))
+            self._conn.commit()
+        except Exception:
+            self._conn.rollback()
+            raise
+
+    # ---------- headers & index ----------
+    def _data_version(self) -> int:
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _sync(self):
+        # dipanggil di bawah self._lock
+        v = self._data_version()
+        if v == self._version:
+            return
+        self._version = v
+        self._headers = self._load_headers()
+        self._profiles.clear()
+        if self._index is not None:
+            self._index.rebuild(self._iter_headers())
+
+    def _load_headers(self) -> dict[str, dict[str, JobHeader]]:
+        rows = self._conn.execute(
+            "SELECT user_id, name, booking_iso, exec_iso, time, reminder_minutes, created_at, chat_id, extra, "
+            "leader, pax FROM jobs ORDER BY user_id, exec_iso, time"
+        ).fetchall()
+        ck_rows = self._conn.execute("SELECT user_id, job_name, name, value FROM cookies ORDER BY rowid").fetchall()
+        cookies: dict[tuple[str, str], dict] = {}
+        for uid, job_name, ck, val in ck_rows:
+            cookies.setdefault((uid, job_name), {})[ck] = val
+        headers: dict[str, dict[str, JobHeader]] = {}
+        for r in rows:
+            headers.setdefault(r[0], {})[r[1]] = self._row_to_header(r[2:], cookies.get((r[0], r[1]), {}))
+        return headers
+
+    def _iter_headers(self):
+        for uid, user in self._headers.items():
+            for name, h in user.items():
+                yield uid, name, h
+
+    def _user_headers(self, uid: str) -> dict[str, JobHeader]:
+        # dipanggil di bawah self._lock
+        self._sync()
+        return self._headers.get(uid, {})
+
+    def attach_index(self, index):
+        """Keep ``index`` (a ``job_index.JobIndex``) in sync with every job write."""
+        with self._lock:
+            self._sync()
+            self._index = index
+            index.rebuild(self._iter_headers())
+
+    def index(self):
+        """The attached index, rebuilt first if another process committed since."""
+        with self._lock:
+            self._sync()
+            return self._index
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            return {"headers": sum(len(u) for u in self._headers.values()), "profiles_cached": len(self._profiles),
+                    "profile_hits": self._profiles.hits, "profile_misses": self._profiles.misses}
+
+    # ---------- meta ----------
+    def get_meta(self, key: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str):
+        with self.transaction():
+            self._conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+                (key, value),
+            )
+
+    # ---------- users ----------
+    def get_ci(self, uid: str) -> str:
+        with self._lock:
+            row = self._conn.execute("SELECT ci_session FROM users WHERE user_id=?", (uid,)).fetchone()
+        return row[0] if row else ""
+
+    def set_ci(self, uid: str, ci: str):
+        with self.transaction():
+            self._conn.execute(
+                "INSERT INTO users (user_id, ci_session) VALUES (?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET ci_session=excluded.ci_session",
+                (uid, ci),
+            )
+
+    # ---------- jobs ----------
+    def jobs(self, uid: str) -> JobsView:
+        return JobsView(self, uid)
+
+    def _job_names(self, uid: str) -> list[str]:
+        with self._lock:
+            return list(self._user_headers(uid))
+
+    def _count_jobs(self, uid: str) -> int:
+        with self._lock:
+            return len(self._user_headers(uid))
+
+    def _has_job(self, uid: str, name: str) -> bool:
+        with self._lock:
+            return name in self._user_headers(uid)
+
+    def _get_header(self, uid: str, name: str) -> JobHeader | None:
+        with self._lock:
+            return self._user_headers(uid).get(name)
+
+    def _all_headers(self, uid: str) -> dict[str, JobHeader]:
+        with self._lock:
+            return dict(self._user_headers(uid))
+
+    def _get_job(self, uid: str, name: str) -> JobRecord | None:
+        with self._lock:
+            h = self._user_headers(uid).get(name)
+            if h is None:
+                return None
+            prof = self._profiles.get((uid, name))
+            if prof is None:
+                row = self._conn.execute(
+                    "SELECT profile FROM jobs WHERE user_id=? AND name=?", (uid, name)
+                ).fetchone()
+                prof = make_profile(json.loads(row[0]))
+                self._profiles.put((uid, name), prof)
+        return h.with_profile(prof)
+
+    def _all_jobs(self, uid: str) -> dict[str, JobRecord]:
+        with self._lock:
+            headers = self._user_headers(uid)
+            profiles = dict(self._conn.execute("SELECT name, profile FROM jobs WHERE user_id=?", (uid,)).fetchall())
+        return {name: h.with_profile(json.loads(profiles[name])) for name, h in headers.items() if name in profiles}
+
+    def iter_all_jobs(self):
+        """Yield ``(user_id, name, record)`` for every stored job, profiles included."""
+        with self._lock:
+            self._sync()
+            headers = list(self._iter_headers())
+            profiles = {(u, n): p for u, n, p in self._conn.execute("SELECT user_id, name, profile FROM jobs")}
+        for uid, name, h in headers:
+            if (uid, name) in profiles:
+                yield uid, name, h.with_profile(json.loads(profiles[(uid, name)]))
+
+    def _put_job(self, uid: str, name: str, rec: JobRecord):
+        leader, pax = rec.leader, rec.pax
+        cols = [rec.get(k) for k in JOB_COLUMNS]
+        extra = {k: v for k, v in rec.items() if k not in JOB_COLUMNS and k not in ("profile", "cookies")}
+        with self.transaction():
+            self._conn.execute(
+                "INSERT INTO jobs (user_id, name, booking_iso, exec_iso, time, reminder_minutes, created_at, "
+                "chat_id, profile, extra, leader, pax) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(user_id, name) DO UPDATE SET booking_iso=excluded.booking_iso, "
+                "exec_iso=excluded.exec_iso, time=excluded.time, reminder_minutes=excluded.reminder_minutes, "
+                "created_at=excluded.created_at, chat_id=excluded.chat_id, profile=excluded.profile, "
+                "extra=excluded.extra, leader=excluded.leader, pax=excluded.pax",
+                (uid, name, *cols, _dumps(rec.get("profile") or {}), _dumps(extra) if extra else None,
+                 leader, pax),
+            )
+            self._conn.execute("DELETE FROM cookies WHERE user_id=? AND job_name=?", (uid, name))
+            self._conn.executemany(
+                "INSERT INTO cookies (user_id, job_name, name, value) VALUES (?, ?, ?, ?)",
+                [(uid, name, k, v or "") for k, v in (rec.get("cookies") or {}).items()],
+            )
+            # header dibentuk persis seperti saat dimuat ulang dari file
+            h = self._row_to_header((*cols, _dumps(extra) if extra else None, leader, pax),
+                                    {k: v or "" for k, v in (rec.get("cookies") or {}).items()})
+            self._headers.setdefault(uid, {})[name] = h
+            self._profiles.pop((uid, name))
+            if self._index is not None:
+                self._index.put(uid, name, h)
+
+    def _del_job(self, uid: str, name: str) -> bool:
+        with self.transaction():
+            cur = self._conn.execute("DELETE FROM jobs WHERE user_id=? AND name=?", (uid, name))
+            user = self._headers.get(uid)
+            if user is not None:
+                user.pop(name, None)
+            self._profiles.pop((uid, name))
+            if cur.rowcount and self._index is not None:
+                self._index.remove(uid, name)
+        return cur.rowcount > 0
+
+    @staticmethod
+    def _row_to_header(row, cookies: dict) -> JobHeader:
+        booking_iso, exec_iso, time_, reminder_minutes, created_at, chat_id, extra, leader, pax = row
+        rec = {
+            "booking_iso": booking_iso,
+            "exec_iso": exec_iso,
+            "time": time_,
+            "cookies": cookies,
+            "reminder_minutes": reminder_minutes,
+            "created_at": created_at,
+            "chat_id": chat_id,
+        }
+        if extra:
+            rec.update(json.loads(extra))
+        return JobHeader.from_dict(rec, leader=sys.intern(leader), pax=pax)
+
+    def _rename_job(self, uid: str, old: str, new: str, rec: JobRecord):
+        with self.transaction():
+            if old != new:
+                self._del_job(uid, old)
+            self._put_job(uid, new, rec)
+
+    # ---------- lifecycle ----------
+    def commit(self):
+        # tiap write sudah commit sendiri; dipertahankan agar setara JsonStore
+        with self._lock:
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
+
+    def import_legacy(self, data: dict, source: str) -> int:
+        """One-shot import of the old ``storage.json`` dict; returns number of jobs."""
+        n = 0
+        with self._lock:
+            # BEGIN IMMEDIATE: kalau dua bot start bersamaan, hanya satu yang mengimpor
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._tx_depth = 1
+            try:
+                if self.get_meta("json_migrated"):
+                    self._conn.rollback()
+                    return 0
+                for uid, user in data.items():
+                    if "ci_session" in user:
+                        self.set_ci(uid, user["ci_session"] or "")
+                    for name, rec in (user.get("jobs") or {}).items():
+                        self._put_job(uid, name, JobRecord.from_dict(rec))
+                        n += 1
+                self.set_meta("json_migrated", source)
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                self._version = None  # header di memori ikut dibatalkan: muat ulang
+                raise
+            finally:
+                self._tx_depth = 0
+        log.info("Migrasi %s → %s: %d user, %d job", source, self.path, len(data), n)
+        return n
+
+
+class WriteBehindPersister:
+    """Debounced background writer: ``mark_dirty()`` is O(1), the file is
+    rewritten at most once per ``interval`` seconds from a daemon thread.
+
+    Each flush is atomic (temp file + fsync + rename).
+    """
+
+    def __init__(self, path: str, render, interval: float = 0.5, on_flushed=None):
+        self.path = path
+        self.interval = interval
+        self._render = render  # () -> bytes
+        self._on_flushed = on_flushed  # dipanggil setelah rename sukses
+        self._dirty = threading.Event()
+        self._stop = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._last_flush = 0.0
+        self.stats = {"flushes": 0, "bytes_written": 0, "last_ms": 0.0, "max_ms": 0.0, "total_ms": 0.0}
+        self._thread = threading.Thread(target=self._run, name="storage-persister", daemon=True)
+        self._thread.start()
+
+    def mark_dirty(self):
+        self._dirty.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._dirty.wait()
+            if self._stop.is_set():
+                break
+            wait = self.interval - (time.monotonic() - self._last_flush)
+            if wait > 0:
+                self._stop.wait(wait)
+            try:
+                self.flush()
+            except Exception as e:
+                log.warning("Persist %s gagal: %s", self.path, e)
+                self._stop.wait(self.interval)
+
+    def flush(self, force: bool = False):
+        with self._flush_lock:
+            if not (self._dirty.is_set() or force):
+                return
+            self._dirty.clear()
+            t0 = time.perf_counter()
+            payload = self._render()
+            d = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp = tempfile.mkstemp(prefix=".storage-", suffix=".tmp", dir=d)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, self.path)
+            except BaseException:
+                self._dirty.set()
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+                raise
+            if self._on_flushed:
+                self._on_flushed()
+            ms = (time.perf_counter() - t0) * 1000
+            self._last_flush = time.monotonic()
+            st = self.stats
+            st["flushes"] += 1
+            st["bytes_written"] += len(payload)
+            st["last_ms"] = ms
+            st["max_ms"] = max(st["max_ms"], ms)
+            st["total_ms"] += ms
+        log.info("persist %s: %d bytes in %.1f ms", self.path, len(payload), ms)
+
+    def close(self):
+        """Stop the thread and force a final flush of pending changes."""
+        self._stop.set()
+        self._dirty.set()
+        self._thread.join(timeout=5)
+        self.flush()
+
+
+def apply_op(data: dict, op: dict):
+    """Apply one journal mutation to a ``storage.json``-shaped dict."""
+    kind = op["op"]
+    if kind == "put":
+        data.setdefault(op["uid"], {}).setdefault("jobs", {})[op["name"]] = op["rec"]
+    elif kind == "del":
+        data.get(op["uid"], {}).get("jobs", {}).pop(op["name"], None)
+    elif kind == "session":
+        data.setdefault(op["uid"], {})["ci_session"] = op["ci"]
+    else:
+        raise ValueError(f"op journal tidak dikenal: {kind!r}")
+
+
+def replay_journal(data: dict, path: str) -> int:
+    """Replay a JSONL journal onto ``data`` in place; returns ops applied.
+
+    A torn last line (crash mid-append) is skipped.
+    """
+    if not os.path.exists(path):
+        return 0
+    n = 0
+    with open(path, "rb") as f:
+        for lineno, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                op = json.loads(line)
+            except ValueError:
+                log.warning("Journal %s baris %d rusak, dilewati", path, lineno)
+                continue
+            apply_op(data, op)
+            n += 1
+    return n
+
+
+def load_snapshot(path: str, journal_path: str | None = None) -> dict:
+    """Snapshot + journal (``.old`` first, then the live one) → storage dict."""
+    data = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    if journal_path:
+        replay_journal(data, journal_path + ".old")
+        replay_journal(data, journal_path)
+    return data
+
+
+def _acquire_owner_lock(path: str):
+    if fcntl is None:
+        return None
+    f = open(path, "a")
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        f.close()
+        raise RuntimeError(
+            f"{path} dipegang proses lain; backend json hanya untuk satu proses, "
+            "pakai STORAGE_BACKEND=sqlite untuk menjalankan beberapa bot"
+        ) from None
+    return f
+
+
+class JsonStore:
+    """The original ``storage.json`` layout, persisted write-behind.
+
+    The whole document lives in this process, so only one process may own
+    it: opening takes an exclusive lock on ``<path>.lock`` and fails fast if
+    another bot already holds it (use :class:`SqliteStore` to share).
+
+    With ``journal_path`` every mutation becomes one appended JSONL line on
+    ``commit()``; the full snapshot is only rewritten when the journal grows
+    past ``journal_max_bytes`` (and once at startup/shutdown). Without it,
+    ``commit()`` just marks the document dirty for the persister thread.
+    Replaying an op twice is harmless (put/del/session are idempotent), so a
+    crash between snapshot rename and journal cleanup loses nothing.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 0.5,
+                 journal_path: str | None = None, journal_max_bytes: int = 4 << 20):
+        self.path = path
+        self.journal_path = journal_path
+        self.journal_max_bytes = journal_max_bytes
+        self._lockfile = _acquire_owner_lock(path + ".lock")
+        self._lock = threading.RLock()
+        self._pending: list[bytes] = []
+        self._index = None
+        self._journal = None
+        self._journal_size = 0
+        self._data: dict = load_snapshot(path, journal_path)
+        for user in self._data.values():
+            jobs = user.get("jobs")
+            if jobs:
+                user["jobs"] = {name: JobRecord.from_dict(rec) for name, rec in jobs.items()}
+        self._persister = WriteBehindPersister(path, self._render, flush_interval, on_flushed=self._drop_old_journal)
+        if journal_path:
+            needs_compact = os.path.exists(journal_path + ".old") or (
+                os.path.exists(journal_path) and os.path.getsize(journal_path) > 0)
+            self._open_journal()
+            if needs_compact:
+                self._persister.flush(force=True)  # lipat journal ke snapshot saat start
+
+    @property
+    def stats(self) -> dict:
+        st = dict(self._persister.stats)
+        st["journal_bytes"] = self._journal_size
+        return st
+
+    # ---------- index ----------
+    def attach_index(self, index):
+        """Keep ``index`` (a ``job_index.JobIndex``) in sync with every job write."""
+        with self._lock:
+            self._index = index
+            index.rebuild(self.iter_all_jobs())
+
+    def index(self):
+        return self._index
+
+    # ---------- journal ----------
+    def _open_journal(self):
+        self._journal = open(self.journal_path, "ab")
+        self._journal_size = self._journal.tell()
+
+    def _log(self, op: dict):
+        if self.journal_path:
+            self._pending.append(_dumps(op).encode("utf-8") + b"\n")
+
+    def _rotate_journal(self):
+        # dipanggil di bawah self._lock; op sesudah titik ini masuk journal baru
+        if not self._journal_size or os.path.exists(self.journal_path + ".old"):
+            return
+        self._journal.close()
+        os.replace(self.journal_path, self.journal_path + ".old")
+        self._open_journal()
+
+    def _drop_old_journal(self):
+        if self.journal_path:
+            try:
+                os.unlink(self.journal_path + ".old")
+            except FileNotFoundError:
+                pass
+
+    def _render(self) -> bytes:
+        # salinan struktural murah di bawah lock; encode di luar lock
+        with self._lock:
+            if self.journal_path:
+                self._write_pending()
+                self._rotate_journal()
+            snap = {}
+            for uid, user in self._data.items():
+                u = dict(user)
+                if "jobs" in u:
+                    u["jobs"] = dict(u["jobs"])
+                snap[uid] = u
+        return json.dumps(snap, ensure_ascii=False, indent=2, default=to_plain).encode("utf-8")
+
+    def _write_pending(self):
+        if not self._pending:
+            return
+        buf = b"".join(self._pending)
+        self._pending.clear()
+        self._journal.write(buf)
+        self._journal.flush()
+        self._journal_size += len(buf)
+
+    def _user_jobs(self, uid: str) -> dict:
+        return self._data.setdefault(uid, {}).setdefault("jobs", {})
+
+    # ---------- users ----------
+    def get_ci(self, uid: str) -> str:
+        with self._lock:
+            return self._data.get(uid, {}).get("ci_session", "")
+
+    def set_ci(self, uid: str, ci: str):
+        with self._lock:
+            self._data.setdefault(uid, {})["ci_session"] = ci
+            self._log({"op": "session", "uid": uid, "ci": ci})
+
+    # ---------- jobs ----------
+    def jobs(self, uid: str) -> JobsView:
+        return JobsView(self, uid)
+
+    def _job_names(self, uid: str) -> list[str]:
+        with self._lock:
+            return list(self._data.get(uid, {}).get("jobs", {}))
+
+    def _count_jobs(self, uid: str) -> int:
+        with self._lock:
+            return len(self._data.get(uid, {}).get("jobs", {}))
+
+    def _has_job(self, uid: str, name: str) -> bool:
+        with self._lock:
+            return name in self._data.get(uid, {}).get("jobs", {})
+
+    # record immutable: dikembalikan apa adanya, tanpa salinan
+    def _get_job(self, uid: str, name: str) -> JobRecord | None:
+        with self._lock:
+            return self._data.get(uid, {}).get("jobs", {}).get(name)
+
+    def _all_jobs(self, uid: str) -> dict[str, JobRecord]:
+        with self._lock:
+            return dict(self._data.get(uid, {}).get("jobs", {}))
+
+    # seluruh dokumen memang resident; record (punya .leader/.pax) dipakai sebagai header
+    _get_header = _get_job
+    _all_headers = _all_jobs
+
+    def iter_all_jobs(self):
+        """Yield ``(user_id, name, record)`` for every stored job (startup rehydration)."""
+        with self._lock:
+            items = [(uid, name, rec) for uid, user in self._data.items()
+                     for name, rec in (user.get("jobs") or {}).items()]
+        yield from items
+
+    def _put_job(self, uid: str, name: str, rec: JobRecord):
+        with self._lock:
+            self._user_jobs(uid)[name] = rec
+            self._log({"op": "put", "uid": uid, "name": name, "rec": rec})
+            if self._index is not None:
+                self._index.put(uid, name, rec)
+
+    def _del_job(self, uid: str, name: str) -> bool:
+        with self._lock:
+            found = self._data.get(uid, {}).get("jobs", {}).pop(name, None) is not None
+            if found:
+                self._log({"op": "del", "uid": uid, "name": name})
+                if self._index is not None:
+                    self._index.remove(uid, name)
+            return found
+
+    def _rename_job(self, uid: str, old: str, new: str, rec: JobRecord):
+        with self._lock:
+            if old != new:
+                self._del_job(uid, old)
+            self._put_job(uid, new, rec)
+
+    # ---------- lifecycle ----------
+    def commit(self):
+        if not self.journal_path:
+            self._persister.mark_dirty()
+            return
+        with self._lock:
+            self._write_pending()
+            if self._journal_size > self.journal_max_bytes:
+                self._persister.mark_dirty()
+
+    def close(self):
+        if self.journal_path:
+            with self._lock:
+                self._write_pending()
+                os.fsync(self._journal.fileno())
+        self._persister.close()
+        if self._journal:
+            self._journal.close()
+        if self._lockfile:
+            self._lockfile.close()  # melepas flock
+
+
+def open_store(backend: str = "sqlite", db_path: str = "storage.db", json_path: str = "storage.json",
+               flush_interval: float = 0.5, journal_max_bytes: int = 4 << 20, profile_cache: int = 256):
+    """Open the store shared by both bots; ``storage.json`` is migrated once into SQLite."""
+    if backend == "json":
+        return JsonStore(
+            json_path,
+            flush_interval=flush_interval,
+            journal_path=json_path + ".journal" if journal_max_bytes > 0 else None,
+            journal_max_bytes=journal_max_bytes,
+        )
+    if backend != "sqlite":
+        raise ValueError(f"STORAGE_BACKEND tidak dikenal: {backend!r}")
+    store = SqliteStore(db_path, profile_cache=profile_cache)
+    if os.path.exists(json_path) and not store.get_meta("json_migrated"):
+        with open(json_path, "r", encoding="utf-8") as f:
+            store.import_legacy(json.load(f), source=json_path)
+    return store
@@ -0,0 +1,27 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+# modul bot berada di root repo (tanpa paket)
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope="session")
+def bot_semeru(tmp_path_factory):
+    """``bot-semeru.py`` loaded as a module, with its store and output files in a temp dir."""
+    tmp = tmp_path_factory.mktemp("bot-semeru")
+    with pytest.MonkeyPatch.context() as mp:
+        mp.chdir(tmp)
+        mp.setenv("STORAGE_DB", str(tmp / "storage.db"))
+        mp.setenv("CLOCK_OFFSET_FILE", str(tmp / "clock_offset.json"))
+        mp.setenv("BOOKING_TIMELINE_FILE", "")
+        spec = importlib.util.spec_from_file_location("bot_semeru", os.path.join(ROOT, "bot-semeru.py"))
+        bot = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(bot)
+    yield bot
+    bot.HTTP.close()
+    bot.SERVER_CLOCK.close()
+    bot.storage.close()
@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta
+
+from cadence import Cadence, RateBudget
+
+
+def _cadence(**kw):
+    kw.setdefault("budget", None)
+    return Cadence(hot=10, far=300, before=timedelta(minutes=5), after=timedelta(minutes=15), jitter=0, **kw)
+
+
+def test_prompt_delay_is_immediate_while_healthy():
+    assert _cadence().prompt_delay() == 0.5
+
+
+def test_prompt_delay_respects_retry_after_and_backoff():
+    c = _cadence()
+    c.observe(status=429, retry_after=30)
+    assert c.prompt_delay() == 30
+    c.observe(status=503)
+    c.observe(status=503)
+    assert c.backoff == 8
+    assert c.prompt_delay() == 70  # hot * (backoff - 1)
+
+
+def test_prompt_delay_goes_through_the_budget():
+    budget = RateBudget(per_minute=6, burst=1)
+    c = _cadence(budget=budget)
+    assert c.prompt_delay() == 0.5
+    assert c.prompt_delay() > 9  # slot berikutnya baru 10 s kemudian
+    assert budget.delayed == 1
+
+
+def test_base_delay_ramps_towards_the_release_window():
+    c = _cadence()
+    release = datetime(2025, 9, 30, 16, 0)
+    assert c.base_delay(release, None) == 300
+    assert c.base_delay(release - timedelta(hours=3), release) == 300
+    # jarak ke awal jendela / ramp, dibatasi far
+    assert c.base_delay(release - timedelta(minutes=35), release) == 300
+    assert c.base_delay(release - timedelta(minutes=11), release) == 60
+    # tidak melewati awal jendela
+    assert c.base_delay(release - timedelta(minutes=5, seconds=20), release) == 10
+    assert c.base_delay(release - timedelta(minutes=5, seconds=2), release) == 2
+    assert c.base_delay(release, release) == 10
+    assert c.base_delay(release + timedelta(minutes=15), release) == 10
+    assert c.base_delay(release + timedelta(minutes=45), release) == 300
+
+
+def test_backoff_grows_on_errors_and_decays_when_healthy():
+    c = _cadence()
+    c.observe(error=True)
+    c.observe(status=500)
+    assert c.backoff == 4
+    c.observe(status=200, elapsed=5.0)  # lambat
+    assert c.backoff == 6
+    for _ in range(5):
+        c.observe(status=200, elapsed=0.2)
+    assert c.backoff == 1
+
+
+def test_next_delay_applies_backoff_retry_after_and_far_cap():
+    c = _cadence()
+    now = datetime(2025, 9, 30, 16, 0)
+    c.observe(status=429)
+    assert c.next_delay(now, now) == 20
+    c.observe(status=429, retry_after=900)
+    assert c.next_delay(now, None) == 900  # Retry-After boleh melebihi far
+    c.observe(status=200)
+    assert c.next_delay(now, None) == 300
+
+
+def test_rate_budget_allows_a_burst_then_spaces_requests():
+    budget = RateBudget(per_minute=60, burst=3)
+    t = 1000.0
+    granted = [budget.reserve(t) for _ in range(5)]
+    assert granted[:3] == [t, t, t]
+    assert granted[3:] == [t + 1, t + 2]
+    assert budget.delayed == 2
+    # setelah diam cukup lama burst tersedia lagi
+    assert budget.reserve(t + 100) == t + 100
@@ -0,0 +1,54 @@
+from urllib.parse import parse_qs
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+MONTHS = {"2025-09": "September", "2025-10": "Oktober"}
+
+
+class FakeCapacity(BaseAdapter):
+    """Capacity endpoint: POST ``kapasitas`` answers the requested month, a plain GET only the default one."""
+
+    def __init__(self):
+        super().__init__()
+        self.quota = {"2025-09": 0, "2025-10": 0}
+        self.forms: list[dict] = []
+
+    def send(self, request, **kwargs):
+        month = "2025-09"
+        if request.method == "POST":
+            form = {k: v[0] for k, v in parse_qs(request.body).items()}
+            self.forms.append(form)
+            month = form["year_month"]
+        html = (f'<table class="table"><tbody><tr><td>Rabu, 1 {MONTHS[month]} 2025</td>'
+                f'<td>{self.quota[month]}</td></tr></tbody></table>')
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.headers = CaseInsensitiveDict({"Content-Type": "text/html"})
+        resp._content = html.encode()
+        resp.encoding = "utf-8"
+        resp.url, resp.request = request.url, request
+        return resp
+
+    def close(self):
+        pass
+
+
+def test_watcher_fetches_the_month_of_the_job(bot_semeru):
+    site = FakeCapacity()
+    sess = requests.Session()
+    sess.mount("https://", site)
+    sess.mount("http://", site)
+
+    digest, changed, _ = bot_semeru._fetch_view(sess, "semeru", "2025-10-01", None)
+    assert site.forms == [{"action": "kapasitas", "id_site": bot_semeru.SEMERU_SITE_ID, "year_month": "2025-10"}]
+    assert digest is not None and not changed
+
+    site.quota["2025-09"] = 5  # bulan lain tidak memicu booking
+    digest, changed, _ = bot_semeru._fetch_view(sess, "semeru", "2025-10-01", digest)
+    assert not changed
+
+    site.quota["2025-10"] = 5
+    _, changed, _ = bot_semeru._fetch_view(sess, "semeru", "2025-10-01", digest)
+    assert changed
@@ -0,0 +1,64 @@
+import math
+from datetime import datetime, timedelta, timezone
+from email.utils import formatdate
+
+from clock_sync import ClockSync
+
+URL = "https://booking.example/kapasitas"
+T = 1_759_000_000.0
+
+
+def _feed(clock, offset, phases, rtt=0.04):
+    """One response per sub-second phase from a server whose clock runs ``offset`` s ahead."""
+    for i, phase in enumerate(phases):
+        sent = T + 10 * i + phase
+        server = sent + rtt / 2 + offset
+        clock.observe(URL, formatdate(math.floor(server), usegmt=True), sent, sent + rtt)
+
+
+def test_offset_narrows_below_one_second():
+    clock = ClockSync("booking.example")
+    _feed(clock, 2.3, [0.1])
+    offset, err = clock.estimate()
+    assert abs(offset - 2.3) <= err and err > 0.4
+    _feed(clock, 2.3, [i / 20 for i in range(20)])
+    offset, err = clock.estimate()
+    assert abs(offset - 2.3) <= err < 0.1
+
+
+def test_other_hosts_and_bad_dates_are_ignored():
+    clock = ClockSync("booking.example")
+    assert not clock.observe("https://other.example/", formatdate(T, usegmt=True), T, T + 0.1)
+    assert not clock.observe(URL, "bukan tanggal", T, T + 0.1)
+    assert not clock.observe(URL, None, T, T + 0.1)
+    assert clock.estimate() is None
+
+
+def test_step_of_the_server_clock_drops_old_samples():
+    clock = ClockSync("booking.example")
+    _feed(clock, 2.3, [i / 10 for i in range(10)])
+    _feed(clock, -1.7, [i / 10 for i in range(10)])
+    offset, err = clock.estimate()
+    assert abs(offset + 1.7) <= err
+    assert clock.resets > 0
+
+
+def test_to_local_only_shifts_with_a_confident_estimate():
+    clock = ClockSync("booking.example")
+    at = datetime(2025, 9, 30, 16, 0, tzinfo=timezone.utc)
+    assert clock.to_local(at) == at
+    _feed(clock, 2.3, [0.1])
+    assert clock.to_local(at, max_uncertainty=0.05) == at
+    _feed(clock, 2.3, [i / 20 for i in range(20)])
+    shifted = clock.to_local(at, max_uncertainty=0.1)
+    assert abs((at - shifted) - timedelta(seconds=2.3)) < timedelta(seconds=0.1)
+
+
+def test_history_is_saved_and_reloaded(tmp_path):
+    path = str(tmp_path / "clock.json")
+    clock = ClockSync("booking.example", history_path=path)
+    _feed(clock, 2.3, [i / 10 for i in range(10)])
+    clock.close()
+    (day, summary), = ClockSync("booking.example", history_path=path).history()
+    assert summary["samples"] == 10
+    assert abs(summary["last"] - 2.3) < 0.1
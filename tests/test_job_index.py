@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta, timezone
+
+from job_index import JobIndex, cookie_fingerprint
+
+T0 = datetime(2025, 9, 30, 16, 0, tzinfo=timezone.utc)
+
+
+def _index(*jobs):
+    """``jobs``: (user_id, name, minutes after T0, cookies)."""
+    idx = JobIndex(lambda rec: rec["run_at"])
+    idx.rebuild((uid, name, {"run_at": T0 + timedelta(minutes=m), "cookies": ck}) for uid, name, m, ck in jobs)
+    return idx
+
+
+def test_fingerprint_ignores_order_and_empty_values():
+    assert cookie_fingerprint({"a": "1", "b": "2"}) == cookie_fingerprint({"b": "2", "a": "1"})
+    assert cookie_fingerprint({"a": "1", "_ga": ""}) == cookie_fingerprint({"a": "1"})
+    assert cookie_fingerprint({"a": "1"}) != cookie_fingerprint({"a": "2"})
+
+
+def test_same_cookies_returns_later_jobs_of_the_group_in_order():
+    ck = {"ci_session": "abc"}
+    idx = _index(("u", "j3", 30, ck), ("u", "j1", 10, ck), ("u", "j2", 20, {"ci_session": "other"}),
+                 ("u", "j4", 40, dict(ck)), ("v", "j5", 50, ck))
+    assert idx.same_cookies("u", ck, T0) == ["j1", "j3", "j4"]
+    assert idx.same_cookies("u", ck, T0 + timedelta(minutes=10)) == ["j3", "j4"]
+    assert idx.same_cookies("v", ck, T0) == ["j5"]
+
+
+def test_empty_cookie_jobs_chain_to_each_other():
+    # job tanpa cookie sendiri (ci_session global / take-over) tetap satu grup, seperti {} == {} dulu
+    empty = {"_ga": "", "_ga_TMVP85FKW9": "", "ci_session": ""}
+    idx = _index(("u", "a", 10, empty), ("u", "b", 20, {}), ("u", "c", 30, None), ("u", "d", 40, {"ci_session": "x"}))
+    assert idx.same_cookies("u", empty, T0 + timedelta(minutes=10)) == ["b", "c"]
+
+
+def test_put_moves_job_between_groups_and_remove_drops_it():
+    idx = _index(("u", "a", 10, {"ci_session": "x"}), ("u", "b", 20, {"ci_session": "x"}))
+    idx.put("u", "b", {"run_at": T0 + timedelta(minutes=5), "cookies": {"ci_session": "y"}})
+    assert idx.same_cookies("u", {"ci_session": "x"}, T0) == ["a"]
+    assert idx.same_cookies("u", {"ci_session": "y"}, T0) == ["b"]
+    assert idx.names("u") == ["b", "a"]
+    idx.remove("u", "b")
+    assert idx.same_cookies("u", {"ci_session": "y"}, T0) == []
+    assert len(idx) == 1
+
+
+def test_due_between_and_next_after_use_global_order():
+    idx = _index(("u", "a", 10, None), ("v", "b", 20, None), ("u", "c", 30, None))
+    due = idx.due_between(T0 + timedelta(minutes=10), T0 + timedelta(minutes=30))
+    assert [(uid, name) for _, uid, name in due] == [("v", "b"), ("u", "c")]
+    assert idx.next_after(T0 + timedelta(minutes=20))[1:] == ("u", "c")
+    assert idx.next_after(T0 + timedelta(minutes=30)) is None
+    assert idx.nth("u", 2) == "c" and idx.nth("u", 3) is None
+    assert idx.upcoming("u", T0 + timedelta(minutes=10)) == ["c"]
@@ -0,0 +1,51 @@
+import json
+
+from models import BromoProfile, JobHeader, JobRecord, SemeruProfile, to_plain
+
+SEMERU = {
+    "booking_iso": "2025-10-01",
+    "exec_iso": "2025-09-30",
+    "time": "23:00",
+    "profile": {
+        "_leader": {"name": "Budi", "hp": "0812", "hobi": "mendaki"},
+        "_members": [{"nama": "Ani", "identity_no": "3500000000000001"}, {"nama": "Cici"}],
+    },
+    "cookies": {"ci_session": "abc", "_ga": "", "lain": "x"},
+    "reminder_minutes": None,
+    "chat_id": 42,
+    "payloads": {"grid": "v2"},
+}
+
+
+def test_round_trip_keeps_known_absent_and_unknown_keys():
+    rec = JobRecord.from_dict(SEMERU)
+    assert rec.to_dict() == SEMERU
+    assert json.loads(json.dumps(rec, default=to_plain)) == SEMERU
+    assert "created_at" not in rec and rec.get("created_at") is None
+    assert rec["payloads"] == {"grid": "v2"}
+    assert rec["reminder_minutes"] is None  # None tersimpan, berbeda dengan key yang tidak ada
+    assert rec.profile["_leader"]["hobi"] == "mendaki"
+    assert rec.cookies["lain"] == "x"
+
+
+def test_profile_kind_and_derived_fields():
+    rec = JobRecord.from_dict(SEMERU)
+    assert isinstance(rec.profile, SemeruProfile)
+    assert (rec.leader, rec.pax) == ("Budi", 3)
+    bromo = JobRecord.from_dict({"profile": {"name": "Dodi", "male": "2", "female": ""}})
+    assert isinstance(bromo.profile, BromoProfile)
+    assert (bromo.leader, bromo.pax) == ("Dodi", 3)
+    assert JobRecord.from_dict({}).to_dict() == {}
+    assert JobRecord.from_dict(None).pax == 1
+
+
+def test_replace_and_header_keep_the_rest_of_the_record():
+    rec = JobRecord.from_dict(SEMERU)
+    moved = rec.replace(time="23:30", cookies={"ci_session": "def"})
+    assert moved["time"] == "23:30" and moved["cookies"].to_dict() == {"ci_session": "def"}
+    assert moved.to_dict() == {**SEMERU, "time": "23:30", "cookies": {"ci_session": "def"}}
+    assert rec["time"] == "23:00"
+
+    header = JobHeader.from_dict({k: v for k, v in SEMERU.items() if k != "profile"}, leader="Budi", pax=3)
+    assert "leader" not in header.to_dict()
+    assert header.with_profile(SEMERU["profile"]).to_dict() == SEMERU
@@ -0,0 +1,86 @@
+import asyncio
+import threading
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from network_opt import CoalescingCache, retry_after_seconds
+
+
+@pytest.fixture
+def bridge():
+    """Second event loop on its own thread, like ``AsyncTransport``'s sync bridge."""
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield loop
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout=2)
+    loop.close()
+
+
+def test_same_loop_callers_share_one_load():
+    cache = CoalescingCache(ttl=0)
+    loads = []
+
+    async def load():
+        loads.append(1)
+        await asyncio.sleep(0.05)
+        return "v"
+
+    async def main():
+        return await asyncio.gather(*(cache.get("k", load) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["v"] * 5
+    assert len(loads) == 1
+    assert cache.stats["coalesced"] == 4
+
+
+def test_blocking_bridge_call_does_not_join_load_of_blocked_loop(bridge):
+    # check_capacity dipanggil di thread loop bot saat fetch kapasitas loop itu sedang berjalan:
+    # bila panggilan jembatan ikut menunggu load milik loop bot, keduanya saling menunggu selamanya
+    cache = CoalescingCache(ttl=5)
+    loaded_on = []
+
+    async def load():
+        loaded_on.append(asyncio.get_running_loop())
+        await asyncio.sleep(0.05)
+        return "v"
+
+    async def main():
+        owner = asyncio.ensure_future(cache.get("k", load))
+        await asyncio.sleep(0)  # load milik loop ini sekarang in-flight
+        fut = asyncio.run_coroutine_threadsafe(cache.get("k", load, max_age=0), bridge)
+        assert fut.result(timeout=2) == "v"  # memblokir loop ini, seperti HTTP.run_sync
+        assert await owner == "v"
+
+    asyncio.run(main())
+    assert len(loaded_on) == 2 and loaded_on[1] is bridge
+
+
+def test_failed_load_reaches_waiters_and_is_not_cached():
+    cache = CoalescingCache(ttl=5)
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise ConnectionError("down")
+
+    async def main():
+        return await asyncio.gather(cache.get("k", load), cache.get("k", load), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, ConnectionError) for r in results)
+    assert len(calls) == 1
+    assert cache.stats["entries"] == 0
+
+
+def test_retry_after_accepts_seconds_and_http_dates():
+    assert retry_after_seconds("120") == 120
+    assert retry_after_seconds(None) is None
+    assert retry_after_seconds("soon") is None
+    later = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=90), usegmt=True)
+    assert 85 <= retry_after_seconds(later) <= 90
+    assert retry_after_seconds("Wed, 21 Oct 2015 07:28:00 GMT") == 0
@@ -0,0 +1,175 @@
+import json
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+from timeline import Timeline
+
+ISO = "2025-09-30"
+LEADER = {"name": "Ketua", "hp": "0812"}
+PEOPLE = [{"nama": f"Anggota {i}", "identity_no": f"35{i:014d}"} for i in range(1, 4)]
+
+
+class FakeSemeru(BaseAdapter):
+    """In-process stand-in for the booking site: one secret per token page, members kept per secret.
+
+    ``replies[action]`` queues canned JSON answers that take precedence over the default behaviour.
+    """
+
+    def __init__(self, secrets=("s1",)):
+        super().__init__()
+        self.secrets = list(secrets)
+        self.secret = None
+        self.members: dict[str, dict[str, str]] = {}
+        self.replies: dict[str, list[dict]] = {}
+        self.calls: list[str] = []
+        self.booked: list[str] | None = None
+        self.grid_error = False
+
+    def session(self) -> requests.Session:
+        sess = requests.Session()
+        sess.mount("https://", self)
+        return sess
+
+    def _reply(self, request, body, ctype="application/json"):
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.headers = CaseInsensitiveDict({"Content-Type": ctype})
+        resp._content = (json.dumps(body) if isinstance(body, dict) else body).encode()
+        resp.encoding = "utf-8"
+        resp.url, resp.request = request.url, request
+        return resp
+
+    def send(self, request, **kwargs):
+        path = urlsplit(request.url).path
+        if request.method == "GET":
+            self.calls.append(path)
+            if path.startswith("/booking/site/semeru"):
+                self.secret = self.secrets.pop(0) if len(self.secrets) > 1 else self.secrets[0]
+                tokens = json.dumps({"booking": {"secret": self.secret, "form_hash": "fh"}})
+                return self._reply(request, f"<div class='cnt-page'>{tokens}</div>", "text/html")
+            return self._reply(request, "<html></html>", "text/html")
+        body = request.body.decode() if isinstance(request.body, bytes) else (request.body or "")
+        form = {k: v[0] for k, v in parse_qs(body).items()}
+        members = self.members.setdefault(self.secret, {})
+        if path.endswith("/grid"):
+            self.calls.append("grid")
+            if self.grid_error:
+                resp = self._reply(request, "maintenance", "text/html")
+                resp.status_code = 503
+                return resp
+            return self._reply(request, {"data": [
+                {"id": k, "identity_no": k, "nama": v, "secret": self.secret, "date_depart": ISO}
+                for k, v in members.items()]})
+        action = form.get("action", "")
+        self.calls.append(action)
+        if self.replies.get(action):
+            return self._reply(request, self.replies[action].pop(0))
+        if action == "member_update":
+            if form["identity_no"] in members:
+                return self._reply(request, {"status": False, "message": "Nomor identitas ganda"})
+            members[form["identity_no"]] = form["nama"]
+        elif action == "member_delete":
+            members.pop(form["id"], None)
+        elif action == "do_booking":
+            self.booked = sorted(members)
+            return self._reply(request, {"status": True, "message": "Booking berhasil",
+                                         "booking_link": "https://example.invalid/booking/1"})
+        return self._reply(request, {"status": True, "message": "-"})
+
+
+@pytest.fixture
+def site(bot_semeru, monkeypatch):
+    fake = FakeSemeru()
+    monkeypatch.setattr(bot_semeru, "semeru_flow_session", lambda ci, cookies: fake.session())
+    monkeypatch.setattr(bot_semeru, "check_capacity",
+                        lambda iso, site, timeline=None: {"quota": 5, "tanggal_cell": "Selasa, 30 September 2025"})
+    monkeypatch.setattr(bot_semeru.time, "sleep", lambda s: None)
+    bot_semeru.SEMERU_SECRET_MEMBERS.clear()
+    return fake
+
+
+def book(bot, people=PEOPLE):
+    tl = Timeline("semeru")
+    ok, msg, _, _ = bot.do_booking_flow_semeru("", ISO, LEADER, people, timeline=tl)
+    return ok, msg, tl.meta["states"]
+
+
+def ids(people=PEOPLE):
+    return sorted(p["identity_no"] for p in people)
+
+
+def test_fresh_secret_reads_the_grid_before_adding_members(bot_semeru, site):
+    ok, _, states = book(bot_semeru)
+    assert ok
+    assert states == ["capacity", "prime", "cleanup", "first_member", "members", "book"]
+    assert site.calls.count("grid") == 1
+    assert "validate_booking" not in site.calls
+    assert site.booked == ids()
+
+
+def test_stranger_members_under_the_secret_are_removed_before_booking(bot_semeru, site):
+    site.members["s1"] = {"9900000000000001": "Lain 1", "9900000000000002": "Lain 2"}
+    ok, _, states = book(bot_semeru)
+    assert ok and "cleanup" in states
+    assert site.calls.count("member_delete") == 2
+    assert site.booked == ids()
+
+
+def test_leftover_members_with_our_identities_do_not_trip_identitas_ganda(bot_semeru, site):
+    site.members["s1"] = {p["identity_no"]: p["nama"] for p in PEOPLE}
+    ok, _, states = book(bot_semeru)
+    assert ok
+    assert states == ["capacity", "prime", "cleanup", "first_member", "members", "book"]
+    assert site.booked == ids()
+
+
+def test_retry_on_same_secret_cleans_up_what_the_first_attempt_added(bot_semeru, site):
+    site.replies["do_booking"] = [{"status": False, "message": "Sistem sibuk"}]
+    assert not book(bot_semeru)[0]
+    ok, _, states = book(bot_semeru)
+    assert ok and "cleanup" in states
+    assert site.booked == ids()
+
+
+def test_cleanup_skipped_only_for_a_grid_proven_empty(bot_semeru, site):
+    bot_semeru._remember_secret_members("s1", 0)
+    ok, _, states = book(bot_semeru)
+    assert ok
+    assert states == ["capacity", "prime", "first_member", "members", "book"]
+    assert "grid" not in site.calls
+
+
+def test_unreadable_grid_is_not_taken_as_empty(bot_semeru, site):
+    site.grid_error = True
+    book(bot_semeru)
+    assert "s1" not in bot_semeru.SEMERU_SECRET_MEMBERS
+    site.calls.clear()
+    book(bot_semeru)
+    assert "grid" in site.calls
+
+
+def test_failed_member_in_the_middle_still_validates_before_booking(bot_semeru, site):
+    site.replies["member_update"] = [{"status": True, "message": "ok"}, {"status": False, "message": "Data tidak valid"}]
+    ok, _, _ = book(bot_semeru)
+    assert ok
+    assert site.calls.index("validate_booking") < site.calls.index("do_booking")
+
+
+def test_full_secret_reprimes_once(bot_semeru, site):
+    site.secrets = ["s1", "s2"]
+    site.replies["member_update"] = [{"status": False, "message": "Maksimal 9 anggota"}]
+    ok, _, states = book(bot_semeru)
+    assert ok
+    assert states[:5] == ["capacity", "prime", "cleanup", "first_member", "reprime"]
+    assert site.members["s2"] and site.booked == ids()
+
+
+def test_duplicate_identity_on_booking_dedupes_and_retries_once(bot_semeru, site):
+    site.replies["do_booking"] = [{"status": False, "message": "Nomor identitas ganda"}]
+    ok, _, states = book(bot_semeru)
+    assert ok
+    assert states[-2:] == ["dedupe", "book"]
@@ -0,0 +1,117 @@
+import json
+import sqlite3
+
+import pytest
+
+from store import JsonStore, SqliteStore, open_store
+
+REC = {
+    "booking_iso": "2025-10-01",
+    "exec_iso": "2025-09-30",
+    "time": "23:00",
+    "profile": {"_leader": {"nama": "Budi"}, "_members": [{"nama": "Ani"}]},
+    "cookies": {"ci_session": "abc"},
+    "reminder_minutes": 10,
+    "chat_id": 42,
+}
+
+
+@pytest.fixture
+def db(tmp_path):
+    store = SqliteStore(str(tmp_path / "storage.db"), busy_timeout=0.2)
+    yield store
+    store.close()
+
+
+def _other(store):
+    """A second connection, like the other bot process."""
+    return sqlite3.connect(store.path, timeout=0.2)
+
+
+def test_each_write_is_committed_without_commit_call(db):
+    db.set_ci("u", "ci-1")
+    db.jobs("u")["j1"] = REC
+    other = _other(db)
+    assert other.execute("SELECT ci_session FROM users").fetchall() == [("ci-1",)]
+    assert other.execute("SELECT name FROM jobs").fetchall() == [("j1",)]
+    # tidak ada transaksi terbuka: proses lain bisa langsung menulis
+    other.execute("INSERT INTO meta (key, value) VALUES ('x', '1')")
+    other.commit()
+    other.close()
+
+
+def test_failed_write_rolls_back_and_releases_the_lock(db):
+    jobs = db.jobs("u")
+    jobs["j1"] = REC
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            del jobs["j1"]
+            jobs["j2"] = REC
+            raise RuntimeError("boom")
+    assert list(jobs) == ["j1"]
+    other = _other(db)
+    other.execute("DELETE FROM jobs")
+    other.commit()
+    other.close()
+    assert list(jobs) == []
+
+
+def test_rename_is_one_write(db):
+    jobs = db.jobs("u")
+    jobs["old"] = REC
+    jobs.rename("old", "new", jobs["old"].replace(time="23:30"))
+    assert list(jobs) == ["new"]
+    assert jobs["new"]["time"] == "23:30"
+    assert jobs["new"]["cookies"] == {"ci_session": "abc"}
+    jobs.rename("new", "new", jobs["new"].replace(time="23:45"))
+    assert list(jobs) == ["new"] and jobs["new"]["time"] == "23:45"
+
+
+def test_json_rename(tmp_path):
+    store = JsonStore(str(tmp_path / "storage.json"), journal_path=None)
+    try:
+        jobs = store.jobs("u")
+        jobs["old"] = REC
+        jobs.rename("old", "new", jobs["old"])
+        assert list(jobs) == ["new"]
+    finally:
+        store.close()
+
+
+def test_open_store_migrates_json_once(tmp_path):
+    json_path = tmp_path / "storage.json"
+    db_path = str(tmp_path / "storage.db")
+    json_path.write_text(json.dumps({
+        "u1": {"ci_session": "ci-1", "jobs": {"j1": REC, "j2": {**REC, "time": "23:30", "unknown": 1}}},
+        "u2": {"ci_session": None},
+    }))
+    store = open_store("sqlite", db_path=db_path, json_path=str(json_path))
+    try:
+        assert store.get_meta("json_migrated") == str(json_path)
+        assert store.get_ci("u1") == "ci-1" and store.get_ci("u2") == ""
+        jobs = store.jobs("u1")
+        assert sorted(jobs) == ["j1", "j2"]
+        assert jobs["j2"]["unknown"] == 1
+        assert jobs["j1"]["profile"]["_leader"]["nama"] == "Budi"
+        jobs.pop("j1")
+    finally:
+        store.close()
+
+    # start berikutnya: storage.json masih ada tapi tidak diimpor ulang
+    store = open_store("sqlite", db_path=db_path, json_path=str(json_path))
+    try:
+        assert list(store.jobs("u1")) == ["j2"]
+        assert store.import_legacy({"u3": {"jobs": {"j": REC}}}, source="lain") == 0
+        assert list(store.jobs("u3")) == []
+    finally:
+        store.close()
+
+
+def test_import_legacy_rolls_back_as_a_whole(db):
+    bad = {"u1": {"ci_session": "ci-1", "jobs": {"j1": REC, "j2": {**REC, "profile": object()}}}}
+    with pytest.raises(TypeError):
+        db.import_legacy(bad, source="storage.json")
+    assert db.get_meta("json_migrated") is None
+    assert db.get_ci("u1") == "" and list(db.jobs("u1")) == []
+    assert db.import_legacy({"u1": {"jobs": {"j1": REC}}}, source="storage.json") == 1
+    assert list(db.jobs("u1")) == ["j1"]
@@ -0,0 +1,163 @@
+"""Per-stage timing of one booking attempt.
+
+A ``Timeline`` is the ordered list of stages of a flow (capacity check, token
+page, each ``member_update``, ``do_booking``...). ``with tl.stage(name):``
+measures the stage's wall time; every HTTP response inside it adds to the
+stage's request count, connect time (TCP+TLS of sockets opened for it, 0 on a
+reused connection) and TTFB (request sent → response headers, connect
+excluded). ``requests`` sessions report through a response hook
+(``watch(sess)``); anything else calls ``add_request`` itself.
+
+``TimelineLog`` appends finished timelines to a JSON-lines file.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+from network_opt import take_connect_time
+
+log = logging.getLogger(__name__)
+
+
+class Timeline:
+    """Stages of one flow run; ``meta`` (job, iso, ...) is stored with the record."""
+
+    def __init__(self, flow: str, **meta):
+        self.flow = flow
+        self.meta = meta
+        self.started_at = time.time()
+        self.stages: list[dict] = []
+        self.total_ms: float | None = None
+        self.outcome: dict = {}
+        self._t0 = time.perf_counter()
+        self._open: list[dict] = []
+        self._sessions: list = []
+        self._thread: int | None = None
+
+    def _ms(self, seconds: float) -> float:
+        return round(seconds * 1000, 1)
+
+    @contextmanager
+    def stage(self, name: str):
+        entry = {"stage": name, "start_ms": self._ms(time.perf_counter() - self._t0), "requests": 0,
+                 "connect_ms": 0.0, "ttfb_ms": 0.0, "total_ms": None}
+        if self._open:
+            entry["in"] = self._open[-1]["stage"]
+        self.stages.append(entry)
+        self._open.append(entry)
+        take_connect_time()  # socket yang dibuka sebelum stage ini bukan miliknya
+        start = time.perf_counter()
+        try:
+            yield entry
+        except BaseException as e:
+            entry["error"] = f"{type(e).__name__}: {e}"[:160]
+            raise
+        finally:
+            entry["total_ms"] = self._ms(time.perf_counter() - start)
+            self._open.remove(entry)
+
+    def add_request(self, connect_s: float = 0.0, ttfb_s: float = 0.0, status: int | None = None):
+        """Attribute one response to the innermost open stage (ignored outside any stage)."""
+        if not self._open:
+            return
+        entry = self._open[-1]
+        entry["requests"] += 1
+        entry["connect_ms"] = round(entry["connect_ms"] + connect_s * 1000, 1)
+        entry["ttfb_ms"] = round(entry["ttfb_ms"] + ttfb_s * 1000, 1)
+        if status is not None:
+            entry["status"] = status
+
+    def _on_response(self, resp, *args, **kwargs):
+        if threading.get_ident() != self._thread:
+            return None  # session yang sama sedang dipakai thread lain
+        connect = take_connect_time()
+        self.add_request(connect, max(0.0, resp.elapsed.total_seconds() - connect), resp.status_code)
+        return None
+
+    def watch(self, sess):
+        """Record responses of ``sess`` made on the calling thread until ``close()``."""
+        self._thread = threading.get_ident()
+        hooks = sess.hooks["response"]
+        if self._on_response not in hooks:
+            hooks.append(self._on_response)
+            self._sessions.append(sess)
+        return sess
+
+    def close(self, ok: bool | None = None, message: str = ""):
+        """Detach from watched sessions and fix the total (and the outcome, if given)."""
+        for sess in self._sessions:
+            try:
+                sess.hooks["response"].remove(self._on_response)
+            except ValueError:
+                pass
+        self._sessions.clear()
+        self.total_ms = self._ms(time.perf_counter() - self._t0)
+        if ok is not None:
+            self.outcome = {"ok": ok, "message": message[:200]}
+
+    @property
+    def untracked_ms(self) -> float:
+        """Total minus top-level stages (pauses between requests, work outside any stage)."""
+        total = self.total_ms if self.total_ms is not None else self._ms(time.perf_counter() - self._t0)
+        return round(total - sum(e["total_ms"] or 0.0 for e in self.stages if "in" not in e), 1)
+
+    def as_dict(self) -> dict:
+        return {
+            "flow": self.flow,
+            "at": datetime.fromtimestamp(self.started_at).isoformat(timespec="milliseconds"),
+            **self.meta,
+            **self.outcome,
+            "total_ms": self.total_ms,
+            "untracked_ms": self.untracked_ms,
+            "stages": self.stages,
+        }
+
+    def summary(self) -> str:
+        """Compact one-liner: ``stage total (c connect/t ttfb)`` in ms, repeats (``member_update#3``) merged."""
+        groups: dict[str, list] = {}
+        for e in self.stages:
+            g = groups.setdefault(e["stage"].split("#", 1)[0], [0, 0.0, 0.0, 0.0])
+            g[0] += 1
+            g[1] += e["total_ms"] or 0.0
+            g[2] += e["connect_ms"]
+            g[3] += e["ttfb_ms"]
+        parts = []
+        for name, (n, total, connect, ttfb) in groups.items():
+            label = f"{name}×{n}" if n > 1 else name
+            wire = f" (c{connect:.0f}/t{ttfb:.0f})" if connect or ttfb else ""
+            parts.append(f"{label} {total:.0f}{wire}")
+        rest = self.untracked_ms
+        if rest >= 1:
+            parts.append(f"lain {rest:.0f}")
+        return " · ".join(parts) + " ms"
+
+
+def stage(timeline: Timeline | None, name: str):
+    """``timeline.stage(name)``, or a no-op when there is no timeline."""
+    return timeline.stage(name) if timeline is not None else nullcontext()
+
+
+class TimelineLog:
+    """Append-only JSON-lines file of finished timelines; rotated to ``<path>.old`` past ``max_bytes``."""
+
+    def __init__(self, path: str | None, max_bytes: int = 5 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def append(self, timeline: Timeline):
+        if not self.path:
+            return
+        line = json.dumps(timeline.as_dict(), ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            try:
+                if self.max_bytes and os.path.exists(self.path) and os.path.getsize(self.path) > self.max_bytes:
+                    os.replace(self.path, self.path + ".old")
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line)
+            except OSError as e:
+                log.warning("gagal menyimpan timeline booking (%s): %s", self.path, e)